@@ -12,15 +12,19 @@ from typing import List, Dict, Any
 from pathlib import Path
 import tempfile
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-import threading
 from validators import PDFValidator
+from pdf_processor.pdf.cache import get_global_cache
+from pdf_processor.pdf.operations import PDFOperations
+from pdf_processor.utils.config import ProcessingConfig
 
 class PDFCreator:
     def __init__(self):
         self.temp_files = []
-        self.jokbo_pdfs = {}  # Cache for opened jokbo PDFs
-        self.pdf_lock = threading.Lock()  # Thread-safe lock for PDF cache
+        self.pdf_cache = get_global_cache()  # Shared, thread-safe cache of opened PDFs
         self.debug_log_path = Path("output/debug/pdf_creator_debug.log")
         self.debug_log_path.parent.mkdir(parents=True, exist_ok=True)
         
@@ -28,9 +32,6 @@ class PDFCreator:
         for temp_file in self.temp_files:
             if os.path.exists(temp_file):
                 os.remove(temp_file)
-        # Close all cached PDFs
-        for pdf in self.jokbo_pdfs.values():
-            pdf.close()
     
     def log_debug(self, message: str):
         """Write debug message to file"""
@@ -39,13 +40,6 @@ class PDFCreator:
             f.write(f"[{timestamp}] {message}\n")
             f.flush()  # Ensure the message is written immediately
     
-    def get_jokbo_pdf(self, jokbo_path: str) -> fitz.Document:
-        """Get or open a jokbo PDF (thread-safe cached)"""
-        with self.pdf_lock:
-            if jokbo_path not in self.jokbo_pdfs:
-                self.jokbo_pdfs[jokbo_path] = fitz.open(jokbo_path)
-            return self.jokbo_pdfs[jokbo_path]
-    
     def extract_jokbo_question(self, jokbo_filename: str, jokbo_page: int, question_number, question_text: str, jokbo_dir: str = "jokbo", jokbo_end_page: int = None, is_last_question_on_page: bool = False, question_numbers_on_page = None):
         """Extract full page containing the question from jokbo PDF"""
         self.log_debug(f"extract_jokbo_question called for Q{question_number} on page {jokbo_page}")
@@ -59,8 +53,7 @@ class PDFCreator:
             return None
             
         # Check page validity
-        jokbo_pdf = self.get_jokbo_pdf(str(jokbo_path))  # get_jokbo_pdf already handles locking
-        pdf_page_count = len(jokbo_pdf)
+        pdf_page_count = self.pdf_cache.get_page_count(str(jokbo_path))
         
         if jokbo_page > pdf_page_count or jokbo_page < 1:
             print(f"Warning: Page {jokbo_page} does not exist in {jokbo_filename}")
@@ -72,8 +65,18 @@ class PDFCreator:
             question_num_str = str(question_number)
             self.log_debug(f"  question_num_str: {repr(question_num_str)}")
             
-            # First, try to use question_numbers_on_page for more accurate detection
-            if question_numbers_on_page and question_num_str in question_numbers_on_page:
+            # Prefer the question layout indexed at ingest: the question ends where the next one starts
+            layout_start = None
+            try:
+                layout = PDFOperations.get_question_layout(str(jokbo_path))
+                layout_start = layout.find(question_number, near_page=jokbo_page)
+            except Exception as e:
+                self.log_debug(f"  Question layout unavailable: {str(e)}")
+            if layout_start is not None and layout_start.page == jokbo_page:
+                jokbo_end_page = layout.end_page(layout_start)
+                self.log_debug(f"  LAYOUT INDEX: Q{layout_start.number} spans pages {jokbo_page}-{jokbo_end_page}")
+            # Next, try to use question_numbers_on_page for more accurate detection
+            elif question_numbers_on_page and question_num_str in question_numbers_on_page:
                 self.log_debug(f"  Found in question_numbers_on_page")
                 # Check if current question is the last one on the page
                 if question_num_str == question_numbers_on_page[-1] and jokbo_page < pdf_page_count:
@@ -106,8 +109,8 @@ class PDFCreator:
         question_doc = fitz.open()
         
         # Extract pages
-        jokbo_pdf = self.get_jokbo_pdf(str(jokbo_path))  # get_jokbo_pdf already handles locking
-        question_doc.insert_pdf(jokbo_pdf, from_page=jokbo_page-1, to_page=jokbo_end_page-1)
+        with self.pdf_cache.borrow(str(jokbo_path)) as jokbo_pdf:
+            question_doc.insert_pdf(jokbo_pdf, from_page=jokbo_page-1, to_page=jokbo_end_page-1)
         
         self.log_debug(f"  Extracted document has {len(question_doc)} pages")
         
@@ -123,7 +126,6 @@ class PDFCreator:
             return
         
         doc = fitz.open()
-        lesson_pdf = fitz.open(lesson_path)
 
         # Build an index of related questions by lesson page
         related_by_page: Dict[int, List[Dict[str, Any]]] = {}
@@ -135,64 +137,11 @@ class PDFCreator:
             for q in slide_info.get("related_jokbo_questions", []) or []:
                 related_by_page[page_num].append(q)
 
-        total_pages = len(lesson_pdf)
-        # Iterate through every slide to ensure none are skipped
-        for page_num in range(1, total_pages + 1):
-            # Always insert the lesson slide
-            doc.insert_pdf(lesson_pdf, from_page=page_num-1, to_page=page_num-1)
-
-            # If there are related questions, append them after the slide
-            for question in related_by_page.get(page_num, []):
-                # Determine if this is the last question on the page
-                is_last_question = False
-                question_numbers = question.get("question_numbers_on_page", [])
-                if question_numbers and str(question.get("question_number")) == str(question_numbers[-1]):
-                    is_last_question = True
-
-                # Extract and insert the question from jokbo (handles next-page inclusion)
-                question_doc = self.extract_jokbo_question(
-                    question.get("jokbo_filename"), 
-                    int(question.get("jokbo_page", 0)),
-                    question.get("question_number"),
-                    question.get("question_text", ""),
-                    jokbo_dir,
-                    question.get("jokbo_end_page"),
-                    is_last_question,
-                    question_numbers
-                )
-                if question_doc:
-                    doc.insert_pdf(question_doc)
-                    question_doc.close()
-
-                # Add explanation page
-                explanation_page = doc.new_page()
-                text_content = f"=== 문제 {question.get('question_number')} 해설 ===\n\n"
-                text_content += f"※ 앞 페이지의 문제 {question.get('question_number')}번을 참고하세요\n\n"
-                text_content += f"[출처: {question.get('jokbo_filename')} - {question.get('jokbo_page')}페이지]\n\n"
-                text_content += f"정답: {question.get('answer')}\n\n"
-                if question.get('explanation'):
-                    text_content += f"해설:\n{question['explanation']}\n\n"
-                if question.get('wrong_answer_explanations'):
-                    text_content += "오답 설명:\n"
-                    for choice, explanation in question['wrong_answer_explanations'].items():
-                        text_content += f"  {choice}: {explanation}\n"
-                    text_content += "\n"
-                if question.get('relevance_reason'):
-                    text_content += f"관련성:\n{question['relevance_reason']}\n\n"
-                text_content += f"관련 강의 페이지: {page_num}\n\n"
-                text_content += f"💡 이 문제는 강의자료 {page_num}페이지의 내용과 관련이 있습니다."
-
-                font = fitz.Font("cjk")
-                fontname = "F1"
-                explanation_page.insert_font(fontname=fontname, fontbuffer=font.buffer)
-                text_rect = fitz.Rect(50, 50, explanation_page.rect.width - 50, explanation_page.rect.height - 50)
-                explanation_page.insert_textbox(
-                    text_rect,
-                    text_content,
-                    fontsize=11,
-                    fontname=fontname,
-                    align=fitz.TEXT_ALIGN_LEFT
-                )
+        total_pages = self.pdf_cache.get_page_count(lesson_path)
+        # Every slide of the lesson is a segment (none are skipped), with its related questions
+        segments = [(str(lesson_path), page_num, related_by_page.get(page_num, []), str(jokbo_dir))
+                    for page_num in range(1, total_pages + 1)]
+        merged = self._assemble_segments(doc, "_append_lesson_slide_segment", segments)
         
         if analysis_result.get("summary"):
             summary_page = doc.new_page()
@@ -219,12 +168,110 @@ class PDFCreator:
                 align=fitz.TEXT_ALIGN_LEFT
             )
         
-        doc.save(output_path)
+        # Batches built in worker processes each embed their own copy of the CJK font; merge them
+        doc.save(output_path, garbage=4 if merged else 0, deflate=merged)
         doc.close()
-        lesson_pdf.close()
         
         print(f"Filtered PDF created: {output_path}")
     
+    def _append_lesson_slide_segment(self, doc, lesson_path: str, page_num: int, questions: List[Dict[str, Any]], jokbo_dir: str):
+        """Append a lesson slide followed by its related questions and their explanations"""
+        # Always insert the lesson slide
+        with self.pdf_cache.borrow(lesson_path) as lesson_pdf:
+            doc.insert_pdf(lesson_pdf, from_page=page_num-1, to_page=page_num-1)
+
+        # If there are related questions, append them after the slide
+        for question in questions:
+            # Determine if this is the last question on the page
+            is_last_question = False
+            question_numbers = question.get("question_numbers_on_page", [])
+            if question_numbers and str(question.get("question_number")) == str(question_numbers[-1]):
+                is_last_question = True
+
+            # Extract and insert the question from jokbo (handles next-page inclusion)
+            question_doc = self.extract_jokbo_question(
+                question.get("jokbo_filename"), 
+                int(question.get("jokbo_page", 0)),
+                question.get("question_number"),
+                question.get("question_text", ""),
+                jokbo_dir,
+                question.get("jokbo_end_page"),
+                is_last_question,
+                question_numbers
+            )
+            if question_doc:
+                doc.insert_pdf(question_doc)
+                question_doc.close()
+
+            # Add explanation page
+            explanation_page = doc.new_page()
+            text_content = f"=== 문제 {question.get('question_number')} 해설 ===\n\n"
+            text_content += f"※ 앞 페이지의 문제 {question.get('question_number')}번을 참고하세요\n\n"
+            text_content += f"[출처: {question.get('jokbo_filename')} - {question.get('jokbo_page')}페이지]\n\n"
+            text_content += f"정답: {question.get('answer')}\n\n"
+            if question.get('explanation'):
+                text_content += f"해설:\n{question['explanation']}\n\n"
+            if question.get('wrong_answer_explanations'):
+                text_content += "오답 설명:\n"
+                for choice, explanation in question['wrong_answer_explanations'].items():
+                    text_content += f"  {choice}: {explanation}\n"
+                text_content += "\n"
+            if question.get('relevance_reason'):
+                text_content += f"관련성:\n{question['relevance_reason']}\n\n"
+            text_content += f"관련 강의 페이지: {page_num}\n\n"
+            text_content += f"💡 이 문제는 강의자료 {page_num}페이지의 내용과 관련이 있습니다."
+
+            font = fitz.Font("cjk")
+            fontname = "F1"
+            explanation_page.insert_font(fontname=fontname, fontbuffer=font.buffer)
+            text_rect = fitz.Rect(50, 50, explanation_page.rect.width - 50, explanation_page.rect.height - 50)
+            explanation_page.insert_textbox(
+                text_rect,
+                text_content,
+                fontsize=11,
+                fontname=fontname,
+                align=fitz.TEXT_ALIGN_LEFT
+            )
+    
+    def _assemble_segments(self, doc, segment_method: str, segments: List[tuple]) -> bool:
+        """Append segments to doc in order, building them in a process pool when enabled.
+        
+        With PDF_ASSEMBLY_PARALLEL each worker process opens the sources itself and
+        builds a contiguous batch of segments, returned as PDF bytes; the batches
+        are then concatenated in order. Small jobs, or a pool that can't start (e.g. inside a daemonic
+        worker process), fall back to building the segments here one at a time.
+        
+        Returns:
+            True if the segments were built in worker processes
+        """
+        # CPUs this process may run on (can be fewer than the machine has, e.g. in containers)
+        cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+        workers = min(len(segments), ProcessingConfig.PDF_ASSEMBLY_PROCESSES or cpus)
+        if (ProcessingConfig.PDF_ASSEMBLY_PARALLEL and workers > 1
+                and len(segments) >= ProcessingConfig.PDF_ASSEMBLY_MIN_SEGMENTS):
+            # Contiguous batches, each built into one document (one embedded font copy per batch)
+            batch_count = min(len(segments), workers * 2)
+            bounds = [len(segments) * i // batch_count for i in range(batch_count + 1)]
+            batches = [segments[bounds[i]:bounds[i + 1]] for i in range(batch_count)]
+            try:
+                # Spawned (not forked) workers don't inherit this process's threads or open documents
+                with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+                    for data in executor.map(_render_segments, [segment_method] * batch_count, batches):
+                        with fitz.open(stream=data, filetype="pdf") as batch_doc:
+                            doc.insert_pdf(batch_doc)
+                self.log_debug(f"Assembled {len(segments)} segments in {batch_count} batches on {workers} processes")
+                return True
+            except (OSError, AssertionError, BrokenProcessPool) as e:
+                print(f"Warning: Parallel PDF assembly unavailable ({e}), assembling sequentially")
+                self.log_debug(f"Parallel assembly failed: {e}")
+                # Drop any segments appended before the failure
+                if len(doc) > 0:
+                    doc.delete_pages(0, len(doc) - 1)
+        
+        for segment in segments:
+            getattr(self, segment_method)(doc, *segment)
+        return False
+    
     def extract_lesson_slide(self, lesson_filename: str, lesson_page: int, lesson_dir: str = "lesson") -> fitz.Document:
         """Extract a single page from lesson PDF"""
         lesson_path = Path(lesson_dir) / lesson_filename
@@ -232,17 +279,14 @@ class PDFCreator:
             print(f"Warning: Lesson file not found: {lesson_path}")
             return None
             
-        lesson_pdf = fitz.open(str(lesson_path))
-        
-        if lesson_page > len(lesson_pdf) or lesson_page < 1:
+        if lesson_page > self.pdf_cache.get_page_count(str(lesson_path)) or lesson_page < 1:
             print(f"Warning: Page {lesson_page} does not exist in {lesson_filename}")
-            lesson_pdf.close()
             return None
         
         # Extract the page
         slide_doc = fitz.open()
-        slide_doc.insert_pdf(lesson_pdf, from_page=lesson_page-1, to_page=lesson_page-1)
-        lesson_pdf.close()
+        with self.pdf_cache.borrow(str(lesson_path)) as lesson_pdf:
+            slide_doc.insert_pdf(lesson_pdf, from_page=lesson_page-1, to_page=lesson_page-1)
         
         return slide_doc
     
@@ -263,11 +307,9 @@ class PDFCreator:
             return
         
         doc = fitz.open()
-        jokbo_filename = Path(jokbo_path).name
         
         # Get PDF page count thread-safely
-        jokbo_pdf = self.get_jokbo_pdf(jokbo_path)  # get_jokbo_pdf already handles locking
-        jokbo_page_count = len(jokbo_pdf)
+        jokbo_page_count = self.pdf_cache.get_page_count(jokbo_path)
         
         # Collect all questions with their page info
         all_questions = []
@@ -305,115 +347,16 @@ class PDFCreator:
         # Track which questions have been processed to avoid duplicates
         processed_questions = set()
         
-        # Process questions in sorted order
+        # Each question (in sorted order) is a segment: its pages, related slides and explanation
+        segments = []
         for question in all_questions:
             question_num = question.get("question_number", "Unknown")
-            jokbo_page_num = question["_jokbo_page_num"]
-            related_slides = question.get("related_lesson_slides", [])
             
             # Only process questions that haven't been processed
             if question_num not in processed_questions:
                 processed_questions.add(question_num)
-                
-                # Determine if this is the last question on the page
-                is_last_question = False
-                question_numbers = question.get("question_numbers_on_page", [])
-                self.log_debug(f"Processing Q{question_num}: question_numbers = {question_numbers}")
-                if question_numbers and str(question_num) == question_numbers[-1]:
-                    is_last_question = True
-                    print(f"DEBUG: Question {question_num} is last on page {jokbo_page_num}, questions: {question_numbers}")
-                    self.log_debug(f"  Q{question_num} is LAST on page {jokbo_page_num}")
-                else:
-                    self.log_debug(f"  Q{question_num} is NOT last on page {jokbo_page_num}")
-                
-                # Extract the question pages (handles multi-page questions)
-                question_doc = self.extract_jokbo_question(
-                    jokbo_filename,
-                    jokbo_page_num,
-                    question_num,
-                    question.get("question_text", ""),
-                    str(Path(jokbo_path).parent),
-                    None,  # jokbo_end_page not available in jokbo-centric mode yet
-                    is_last_question,
-                    question_numbers
-                )
-                if question_doc:
-                    doc.insert_pdf(question_doc)
-                    question_doc.close()
-                
-                # Add related lesson slides for this specific question
-                for slide_info in related_slides:
-                    lesson_page = slide_info["lesson_page"]
-                    lesson_filename = slide_info["lesson_filename"]
-                    
-                    # Validate page number
-                    lesson_path = Path(lesson_dir) / lesson_filename
-                    if lesson_path.exists():
-                        max_pages = PDFValidator.get_pdf_page_count(str(lesson_path))
-                        if not PDFValidator.validate_page_number(lesson_page, max_pages, lesson_filename):
-                            self.log_debug(f"  WARNING: Page {lesson_page} > max {max_pages} in {lesson_filename}")
-                            continue
-                    
-                    slide_doc = self.extract_lesson_slide(
-                        lesson_filename,
-                        lesson_page,
-                        lesson_dir
-                    )
-                    if slide_doc:
-                        doc.insert_pdf(slide_doc)
-                        slide_doc.close()
-                
-                # Add explanation page
-                explanation_page = doc.new_page()
-                
-                # Create text content
-                text_content = f"=== 문제 {question['question_number']} 해설 ===\n\n"
-                text_content += f"[출처: {jokbo_filename} - {jokbo_page_num}페이지]\n\n"
-                text_content += f"정답: {question['answer']}\n\n"
-                
-                if question.get('explanation'):
-                    text_content += f"해설:\n{question['explanation']}\n\n"
-                
-                # 오답 설명 추가
-                if question.get('wrong_answer_explanations'):
-                    text_content += "오답 설명:\n"
-                    for choice, explanation in question['wrong_answer_explanations'].items():
-                        text_content += f"  {choice}: {explanation}\n"
-                    text_content += "\n"
-                
-                text_content += "관련 강의 슬라이드:\n"
-                for i, slide_info in enumerate(related_slides, 1):
-                    score = slide_info.get('relevance_score', 0)
-                    if score >= 95:
-                        score_text = f"{score}/100 ⭐"
-                    elif score >= 90:
-                        score_text = f"{score}/100 🎯"
-                    else:
-                        score_text = f"{score}/100"
-                    text_content += f"{i}. {slide_info['lesson_filename']} - {slide_info['lesson_page']}페이지 (관련성 점수: {score_text})\n"
-                    text_content += f"   관련성 이유: {slide_info['relevance_reason']}\n"
-                text_content += "\n"
-                
-                # 선택된 연결 개수에 따른 메시지
-                if len(related_slides) == 1:
-                    text_content += "💡 이 문제와 가장 관련성이 높은 강의자료입니다."
-                else:
-                    text_content += "💡 이 문제와 가장 관련성이 높은 상위 2개의 강의자료입니다."
-                
-                # Use CJK font for Korean text
-                font = fitz.Font("cjk")
-                fontname = "F1"
-                explanation_page.insert_font(fontname=fontname, fontbuffer=font.buffer)
-                
-                # Insert text into the page
-                text_rect = fitz.Rect(50, 50, explanation_page.rect.width - 50, explanation_page.rect.height - 50)
-                explanation_page.insert_textbox(
-                    text_rect,
-                    text_content,
-                    fontsize=11,
-                    fontname=fontname,
-                    align=fitz.TEXT_ALIGN_LEFT
-                )
+                segments.append((str(jokbo_path), question, str(lesson_dir)))
+        merged = self._assemble_segments(doc, "_append_jokbo_question_segment", segments)
         
         if analysis_result.get("summary"):
             summary_page = doc.new_page()
@@ -440,8 +383,133 @@ class PDFCreator:
                 align=fitz.TEXT_ALIGN_LEFT
             )
         
-        doc.save(output_path)
+        # Batches built in worker processes each embed their own copy of the CJK font; merge them
+        doc.save(output_path, garbage=4 if merged else 0, deflate=merged)
         doc.close()
-        # Don't close jokbo_pdf since it's cached
         
-        print(f"Filtered PDF created: {output_path}")
\ No newline at end of file
+        print(f"Filtered PDF created: {output_path}")
+    
+    def _append_jokbo_question_segment(self, doc, jokbo_path: str, question: Dict[str, Any], lesson_dir: str):
+        """Append a jokbo question followed by its related lesson slides and explanation"""
+        jokbo_filename = Path(jokbo_path).name
+        question_num = question.get("question_number", "Unknown")
+        jokbo_page_num = question["_jokbo_page_num"]
+        related_slides = question.get("related_lesson_slides", [])
+        
+        # Determine if this is the last question on the page
+        is_last_question = False
+        question_numbers = question.get("question_numbers_on_page", [])
+        self.log_debug(f"Processing Q{question_num}: question_numbers = {question_numbers}")
+        if question_numbers and str(question_num) == question_numbers[-1]:
+            is_last_question = True
+            print(f"DEBUG: Question {question_num} is last on page {jokbo_page_num}, questions: {question_numbers}")
+            self.log_debug(f"  Q{question_num} is LAST on page {jokbo_page_num}")
+        else:
+            self.log_debug(f"  Q{question_num} is NOT last on page {jokbo_page_num}")
+        
+        # Extract the question pages (handles multi-page questions)
+        question_doc = self.extract_jokbo_question(
+            jokbo_filename,
+            jokbo_page_num,
+            question_num,
+            question.get("question_text", ""),
+            str(Path(jokbo_path).parent),
+            None,  # jokbo_end_page not available in jokbo-centric mode yet
+            is_last_question,
+            question_numbers
+        )
+        if question_doc:
+            doc.insert_pdf(question_doc)
+            question_doc.close()
+        
+        # Add related lesson slides for this specific question
+        for slide_info in related_slides:
+            lesson_page = slide_info["lesson_page"]
+            lesson_filename = slide_info["lesson_filename"]
+            
+            # Validate page number
+            lesson_path = Path(lesson_dir) / lesson_filename
+            if lesson_path.exists():
+                max_pages = PDFValidator.get_pdf_page_count(str(lesson_path))
+                if not PDFValidator.validate_page_number(lesson_page, max_pages, lesson_filename):
+                    self.log_debug(f"  WARNING: Page {lesson_page} > max {max_pages} in {lesson_filename}")
+                    continue
+            
+            slide_doc = self.extract_lesson_slide(
+                lesson_filename,
+                lesson_page,
+                lesson_dir
+            )
+            if slide_doc:
+                doc.insert_pdf(slide_doc)
+                slide_doc.close()
+        
+        # Add explanation page
+        explanation_page = doc.new_page()
+        
+        # Create text content
+        text_content = f"=== 문제 {question['question_number']} 해설 ===\n\n"
+        text_content += f"[출처: {jokbo_filename} - {jokbo_page_num}페이지]\n\n"
+        text_content += f"정답: {question['answer']}\n\n"
+        
+        if question.get('explanation'):
+            text_content += f"해설:\n{question['explanation']}\n\n"
+        
+        # 오답 설명 추가
+        if question.get('wrong_answer_explanations'):
+            text_content += "오답 설명:\n"
+            for choice, explanation in question['wrong_answer_explanations'].items():
+                text_content += f"  {choice}: {explanation}\n"
+            text_content += "\n"
+        
+        text_content += "관련 강의 슬라이드:\n"
+        for i, slide_info in enumerate(related_slides, 1):
+            score = slide_info.get('relevance_score', 0)
+            if score >= 95:
+                score_text = f"{score}/100 ⭐"
+            elif score >= 90:
+                score_text = f"{score}/100 🎯"
+            else:
+                score_text = f"{score}/100"
+            text_content += f"{i}. {slide_info['lesson_filename']} - {slide_info['lesson_page']}페이지 (관련성 점수: {score_text})\n"
+            text_content += f"   관련성 이유: {slide_info['relevance_reason']}\n"
+        text_content += "\n"
+        
+        # 선택된 연결 개수에 따른 메시지
+        if len(related_slides) == 1:
+            text_content += "💡 이 문제와 가장 관련성이 높은 강의자료입니다."
+        else:
+            text_content += "💡 이 문제와 가장 관련성이 높은 상위 2개의 강의자료입니다."
+        
+        # Use CJK font for Korean text
+        font = fitz.Font("cjk")
+        fontname = "F1"
+        explanation_page.insert_font(fontname=fontname, fontbuffer=font.buffer)
+        
+        # Insert text into the page
+        text_rect = fitz.Rect(50, 50, explanation_page.rect.width - 50, explanation_page.rect.height - 50)
+        explanation_page.insert_textbox(
+            text_rect,
+            text_content,
+            fontsize=11,
+            fontname=fontname,
+            align=fitz.TEXT_ALIGN_LEFT
+        )
+
+
+_segment_creator = None
+
+
+def _render_segments(segment_method: str, segments: List[tuple]) -> bytes:
+    """Build a batch of output segments in a worker process and return them as PDF bytes."""
+    global _segment_creator
+    if _segment_creator is None:
+        # One creator (and PDF cache) per worker process, reused across its batches
+        _segment_creator = PDFCreator()
+    doc = fitz.open()
+    try:
+        for segment in segments:
+            getattr(_segment_creator, segment_method)(doc, *segment)
+        return doc.tobytes(deflate=True)
+    finally:
+        doc.close()
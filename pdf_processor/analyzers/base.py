@@ -4,18 +4,23 @@ Provides common functionality for different analysis modes.
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional, Tuple
+from functools import partial
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from pathlib import Path
 import json
 from datetime import datetime
 
 from ..api.client import GeminiAPIClient
 from ..api.file_manager import FileManager
+from ..api.upload_pipeline import UploadPipeline
 from ..pdf.operations import PDFOperations
 from ..parsers.response_parser import ResponseParser
 from ..parsers.result_merger import ResultMerger
+from ..parsers.stream_parser import StreamedText, StreamingJSONParser
+from ..utils.config import ProcessingConfig
+from ..utils.executor import BoundedExecutor
 from ..utils.logging import get_logger
-from ..utils.exceptions import PDFProcessorError
+from ..utils.exceptions import APIError, ContentGenerationError, PDFProcessorError
 
 logger = get_logger(__name__)
 
@@ -24,7 +29,9 @@ class BaseAnalyzer(ABC):
     """Abstract base class for PDF analyzers."""
     
     def __init__(self, api_client: GeminiAPIClient, file_manager: FileManager, 
-                 session_id: str, debug_dir: Path):
+                 session_id: str, debug_dir: Path,
+                 upload_pipeline: Optional[UploadPipeline] = None,
+                 on_stream_element: Optional[Callable[[str, Dict[str, Any]], None]] = None):
         """
         Initialize the analyzer.
         
@@ -33,12 +40,20 @@ class BaseAnalyzer(ABC):
             file_manager: File manager instance
             session_id: Session identifier
             debug_dir: Directory for debug outputs
+            upload_pipeline: Optional upload pipeline (created per analyzer if omitted)
+            on_stream_element: Optional callback receiving (key, element) for each
+                jokbo_pages / related_slides element as it is streamed (STREAM_RESPONSES)
         """
         self.api_client = api_client
         self.file_manager = file_manager
         self.session_id = session_id
         self.debug_dir = debug_dir
         self.debug_dir.mkdir(parents=True, exist_ok=True)
+        self.upload_pipeline = upload_pipeline or UploadPipeline(api_client, file_manager)
+        self.on_stream_element = on_stream_element
+        
+        # Cached-context clients keyed by the remote name of the center file they hold
+        self._center_contexts: Dict[str, GeminiAPIClient] = {}
         
     @abstractmethod
     def get_mode(self) -> str:
@@ -55,6 +70,75 @@ class BaseAnalyzer(ABC):
         """Perform the analysis."""
         pass
     
+    def build_system_instruction(self) -> str:
+        """Build the file-independent part of the prompt (cached with the center file)."""
+        raise NotImplementedError(f"{self.get_mode()} mode does not support context caching")
+    
+    def build_request_prompt(self, filename: str) -> str:
+        """Build the per-request prompt sent on top of a cached context."""
+        raise NotImplementedError(f"{self.get_mode()} mode does not support context caching")
+    
+    def open_center_context(self, center_file: Any, display_name: str) -> bool:
+        """
+        Cache the system prompt and a pre-uploaded center file server-side.
+        
+        Does nothing unless CONTEXT_CACHE_ENABLED is set. If the context can't be
+        created (e.g. the file is below the model's minimum cacheable size), requests
+        keep sending the full prompt.
+        
+        Args:
+            center_file: Uploaded center file shared by every request of the job
+            display_name: Display name of the context
+            
+        Returns:
+            True if a cached context is in use
+        """
+        if not ProcessingConfig.CONTEXT_CACHE_ENABLED:
+            return False
+        try:
+            self._center_contexts[center_file.name] = self.api_client.create_context_client(
+                self.build_system_instruction(), [center_file], display_name=display_name
+            )
+            return True
+        except APIError as e:
+            logger.warning(f"Context caching unavailable, sending the full prompt: {str(e)}")
+            return False
+    
+    def close_center_context(self, center_file: Any) -> None:
+        """Delete the cached context holding a center file, if any."""
+        context_client = self._center_contexts.pop(center_file.name, None)
+        if context_client is not None:
+            context_client.release_context()
+    
+    def generate_with_center_file(self, prompt: str, center_file: Any,
+                                  filename: str, file: Any) -> str:
+        """
+        Generate a response for a pre-uploaded center file and one other file.
+        
+        Runs on the center file's cached context when one is open, falling back
+        to the full prompt if the context has become unusable.
+        
+        Args:
+            prompt: Full analysis prompt
+            center_file: Pre-uploaded center file
+            filename: Name of the other file (used in the per-request prompt)
+            file: Uploaded other file
+            
+        Returns:
+            API response text
+        """
+        context_client = self._center_contexts.get(center_file.name)
+        if context_client is not None:
+            try:
+                return self.generate_response_text(
+                    [self.build_request_prompt(filename), file], context_client
+                )
+            except ContentGenerationError as e:
+                logger.warning(f"Cached context failed, sending the full prompt: {str(e)}")
+                self.close_center_context(center_file)
+        
+        return self.generate_response_text([prompt, center_file, file])
+    
     def save_debug_response(self, response_text: str, *file_identifiers: str) -> None:
         """
         Save API response for debugging.
@@ -88,20 +172,35 @@ class BaseAnalyzer(ABC):
         except Exception as e:
             logger.error(f"Failed to save debug response: {str(e)}")
     
+    def plan_chunks(self, pdf_path: str, max_pages: Optional[int] = None) -> List[Tuple[str, int, int]]:
+        """
+        Split a PDF into the chunks this analyzer's model can handle.
+        
+        Args:
+            pdf_path: Path to the PDF
+            max_pages: Fixed maximum pages per chunk (token-aware planning if omitted)
+            
+        Returns:
+            List of (pdf_path, start_page, end_page) tuples
+        """
+        return PDFOperations.split_pdf_for_chunks(
+            pdf_path, max_pages, model_name=getattr(self.api_client.model, "model_name", None)
+        )
+    
     def process_with_chunks(self, pdf_path: str, analysis_func: callable, 
-                          max_pages: int = 40) -> Dict[str, Any]:
+                          max_pages: Optional[int] = None) -> Dict[str, Any]:
         """
         Process a PDF in chunks if necessary.
         
         Args:
             pdf_path: Path to the PDF
             analysis_func: Function to call for analysis
-            max_pages: Maximum pages per chunk
+            max_pages: Fixed maximum pages per chunk (token-aware planning if omitted)
             
         Returns:
             Merged analysis results
         """
-        chunks = PDFOperations.split_pdf_for_chunks(pdf_path, max_pages)
+        chunks = self.plan_chunks(pdf_path, max_pages)
         
         if len(chunks) == 1:
             # Single chunk, process normally
@@ -109,30 +208,64 @@ class BaseAnalyzer(ABC):
         
         # Process multiple chunks
         logger.info(f"Processing {len(chunks)} chunks for {Path(pdf_path).name}")
-        chunk_results = []
-        
-        for i, (path, start_page, end_page) in enumerate(chunks):
-            logger.info(f"Processing chunk {i+1}/{len(chunks)}: pages {start_page}-{end_page}")
-            
-            # Extract chunk to temporary file
-            chunk_path = PDFOperations.extract_pages(path, start_page, end_page)
-            
-            try:
-                # Analyze chunk
-                result = analysis_func(chunk_path, chunk_info=(start_page, end_page))
-                chunk_results.append(result)
-            finally:
-                # Clean up temporary file
-                Path(chunk_path).unlink(missing_ok=True)
+        chunk_results = self.analyze_chunks(
+            chunks, lambda chunk_path, chunk_info: analysis_func(chunk_path, chunk_info=chunk_info)
+        )
         
         # Merge results
         return ResultMerger.merge_chunk_results(chunk_results, self.get_mode())
     
+    def get_chunk_display_name(self, chunk_path: str) -> str:
+        """Get the upload display name for a chunk file (chunks are always lessons)."""
+        return f"강의자료_{Path(chunk_path).name}"
+    
+    def analyze_chunks(self, chunks: List[Tuple[str, int, int]],
+                       analyze_chunk: Callable[[str, Tuple[int, int]], Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Analyze chunks concurrently on this analyzer's key.
+        
+        All chunk files are materialized in one pass over the source (reusing any
+        already in the chunk store). Up to MAX_IN_FLIGHT_PER_KEY chunks are then
+        analyzed at once, each chunk's upload starting just before it gets a slot.
+        
+        Args:
+            chunks: List of (pdf_path, start_page, end_page) tuples
+            analyze_chunk: Function taking (chunk_path, (start_page, end_page))
+            
+        Returns:
+            Chunk results in chunk order, ready for merging
+        """
+        if not chunks:
+            return []
+        chunk_files = PDFOperations.materialize_chunks(chunks[0][0], chunks)
+        started: List[str] = []
+        
+        def _analyze(idx: int, chunk_path: str, start_page: int, end_page: int) -> Dict[str, Any]:
+            logger.info(f"Processing chunk {idx+1}/{len(chunks)}: pages {start_page}-{end_page}")
+            return analyze_chunk(chunk_path, (start_page, end_page))
+        
+        def _tasks():
+            for idx, (chunk_path, start_page, end_page) in enumerate(chunk_files):
+                started.append(chunk_path)
+                self.upload_pipeline.prefetch(chunk_path, self.get_chunk_display_name(chunk_path))
+                yield partial(_analyze, idx, chunk_path, start_page, end_page)
+        
+        executor = BoundedExecutor(min(len(chunks), ProcessingConfig.MAX_IN_FLIGHT_PER_KEY), "chunk")
+        try:
+            return executor.run(_tasks())
+        finally:
+            # Drop prefetches that were never used (chunk files stay in the store)
+            for chunk_path in started:
+                self.upload_pipeline.discard(chunk_path, self.get_chunk_display_name(chunk_path))
+    
     def upload_and_analyze(self, files_to_upload: List[Tuple[str, str]], 
                           prompt: str) -> str:
         """
         Upload files and perform analysis.
         
+        Uploads run concurrently on the upload pipeline (reusing any prefetch
+        already in flight) and deletes are deferred to the file garbage collector.
+        
         Args:
             files_to_upload: List of (file_path, display_name) tuples
             prompt: Analysis prompt
@@ -143,23 +276,54 @@ class BaseAnalyzer(ABC):
         uploaded_files = []
         
         try:
-            # Upload all files
+            # Start all uploads, then wait for each in order
+            for file_path, display_name in files_to_upload:
+                self.upload_pipeline.prefetch(file_path, display_name)
             for file_path, display_name in files_to_upload:
-                uploaded_file = self.api_client.upload_file(file_path, display_name)
-                uploaded_files.append(uploaded_file)
-                self.file_manager.track_file(uploaded_file)
+                uploaded_files.append(self.upload_pipeline.acquire(file_path, display_name))
             
             # Prepare content
             content = [prompt] + uploaded_files
             
             # Generate response
-            response = self.api_client.generate_content(content)
-            return response.text
+            return self.generate_response_text(content)
             
         finally:
-            # Clean up uploaded files
+            # Drop uploads that never completed and defer deletes of the rest
+            for file_path, display_name in files_to_upload[len(uploaded_files):]:
+                self.upload_pipeline.discard(file_path, display_name)
             for file in uploaded_files:
-                self.file_manager.delete_file_safe(file)
+                self.upload_pipeline.release(file)
+    
+    def generate_response_text(self, content: List[Any],
+                               api_client: Optional[GeminiAPIClient] = None) -> str:
+        """
+        Generate a response, streaming it when STREAM_RESPONSES is enabled.
+        
+        In streaming mode each completed result element is passed to
+        on_stream_element while the rest of the response is still arriving,
+        and parse_and_validate_response reuses the elements parsed meanwhile.
+        
+        Args:
+            content: Prompt and uploaded files
+            api_client: Client to send the request with (defaults to the analyzer's client)
+            
+        Returns:
+            API response text (a StreamedText carrying its parser when streamed)
+        """
+        api_client = api_client or self.api_client
+        if not ProcessingConfig.STREAM_RESPONSES:
+            response = api_client.generate_content(content)
+            return response.text
+        
+        parser = StreamingJSONParser(on_element=self._handle_stream_element)
+        return StreamedText(api_client.generate_content_stream(content, parser.feed), parser)
+    
+    def _handle_stream_element(self, key: str, element: Dict[str, Any]) -> None:
+        """Forward a streamed result element to the registered consumer."""
+        logger.debug(f"Streamed {key} element")
+        if self.on_stream_element is not None:
+            self.on_stream_element(key, element)
     
     def parse_and_validate_response(self, response_text: str) -> Dict[str, Any]:
         """
@@ -171,8 +335,13 @@ class BaseAnalyzer(ABC):
         Returns:
             Parsed response dictionary
         """
-        # Parse response
-        result = ResponseParser.parse_response(response_text, self.get_mode())
+        # Streamed responses were parsed element by element as they arrived
+        parser = getattr(response_text, "parser", None)
+        result = parser.finish() if parser is not None else None
+        if (result is None or result.get("error")
+                or not ResponseParser.validate_response_structure(result, self.get_mode())):
+            # Not streamed, or unusable as streamed: full parse with partial-recovery fallbacks
+            result = ResponseParser.parse_response(response_text, self.get_mode())
         
         # Validate structure
         if not ResponseParser.validate_response_structure(result, self.get_mode()):
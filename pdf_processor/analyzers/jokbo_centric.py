@@ -5,11 +5,14 @@ Analyzes jokbo (exam) files against lessons to find source material.
 
 from typing import Dict, Any, List, Tuple, Optional
 from pathlib import Path
+from functools import partial
 import json
 from datetime import datetime
 import pymupdf as fitz
 
 from .base import BaseAnalyzer
+from ..utils.config import ProcessingConfig
+from ..utils.executor import BoundedExecutor
 from ..utils.logging import get_logger
 from ..utils.exceptions import PDFProcessorError
 
@@ -54,6 +57,30 @@ class JokboCentricAnalyzer(BaseAnalyzer):
 """
         return prompt.strip()
     
+    def build_system_instruction(self) -> str:
+        """Build the jokbo-centric prompt without the per-lesson file line."""
+        from constants import (
+            COMMON_PROMPT_INTRO, COMMON_WARNINGS, RELEVANCE_CRITERIA,
+            JOKBO_CENTRIC_TASK, JOKBO_CENTRIC_OUTPUT_FORMAT
+        )
+        
+        prompt = f"""
+{COMMON_PROMPT_INTRO}
+
+{JOKBO_CENTRIC_TASK}
+
+{COMMON_WARNINGS}
+
+{RELEVANCE_CRITERIA}
+
+{JOKBO_CENTRIC_OUTPUT_FORMAT}
+"""
+        return prompt.strip()
+    
+    def build_request_prompt(self, lesson_filename: str) -> str:
+        """Build the per-lesson prompt sent on top of the cached jokbo context."""
+        return f"강의자료 파일: {lesson_filename}"
+    
     def analyze(self, lesson_path: str, jokbo_path: str,
                 preloaded_jokbo_file: Optional[Any] = None,
                 chunk_info: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
@@ -77,8 +104,8 @@ class JokboCentricAnalyzer(BaseAnalyzer):
         # Build prompt
         prompt = self.build_prompt(lesson_filename)
         
-        # Handle chunked processing
-        if self._should_chunk_lesson(lesson_path):
+        # Handle chunked processing (chunks themselves are never split again)
+        if chunk_info is None and self._should_chunk_lesson(lesson_path):
             return self._analyze_with_chunks(
                 lesson_path, jokbo_path, preloaded_jokbo_file
             )
@@ -93,8 +120,24 @@ class JokboCentricAnalyzer(BaseAnalyzer):
                 prompt, lesson_path, jokbo_path, lesson_filename, jokbo_filename
             )
         
+        return self.process_response(response_text, lesson_path, jokbo_path, chunk_info)
+    
+    def process_response(self, response_text: str, lesson_path: str, jokbo_path: str,
+                         chunk_info: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+        """
+        Turn a raw response for a lesson/jokbo pair into validated results.
+        
+        Args:
+            response_text: Raw API response text
+            lesson_path: Path to the lesson PDF (or chunk) that was analyzed
+            jokbo_path: Path to jokbo PDF
+            chunk_info: Optional (start_page, end_page) of the lesson chunk
+            
+        Returns:
+            Analysis results
+        """
         # Save debug response
-        self.save_debug_response(response_text, lesson_filename, jokbo_filename)
+        self.save_debug_response(response_text, Path(lesson_path).name, Path(jokbo_path).name)
         
         # Parse response
         result = self.parse_and_validate_response(response_text)
@@ -104,38 +147,22 @@ class JokboCentricAnalyzer(BaseAnalyzer):
         
         return result
     
-    def _should_chunk_lesson(self, lesson_path: str, max_pages: int = 40) -> bool:
+    def _should_chunk_lesson(self, lesson_path: str) -> bool:
         """Check if lesson PDF needs chunking."""
-        from ..pdf.operations import PDFOperations
-        page_count = PDFOperations.get_page_count(lesson_path)
-        return page_count > max_pages
+        return len(self.plan_chunks(lesson_path)) > 1
     
     def _analyze_with_chunks(self, lesson_path: str, jokbo_path: str,
                            preloaded_jokbo_file: Optional[Any] = None) -> Dict[str, Any]:
         """Analyze lesson in chunks."""
-        from ..pdf.operations import PDFOperations
-        
-        chunks = PDFOperations.split_pdf_for_chunks(lesson_path)
+        chunks = self.plan_chunks(lesson_path)
         logger.info(f"Processing {len(chunks)} chunks for {Path(lesson_path).name}")
         
-        chunk_results = []
-        
-        for i, (path, start_page, end_page) in enumerate(chunks):
-            logger.info(f"Processing chunk {i+1}/{len(chunks)}: pages {start_page}-{end_page}")
-            
-            # Extract chunk
-            chunk_path = PDFOperations.extract_pages(path, start_page, end_page)
-            
-            try:
-                # Analyze chunk
-                result = self.analyze(
-                    chunk_path, jokbo_path, preloaded_jokbo_file,
-                    chunk_info=(start_page, end_page)
-                )
-                chunk_results.append(result)
-            finally:
-                # Clean up
-                Path(chunk_path).unlink(missing_ok=True)
+        # Analyze chunks concurrently
+        chunk_results = self.analyze_chunks(
+            chunks, lambda chunk_path, chunk_info: self.analyze(
+                chunk_path, jokbo_path, preloaded_jokbo_file, chunk_info=chunk_info
+            )
+        )
         
         # Merge results
         from ..parsers.result_merger import ResultMerger
@@ -144,23 +171,14 @@ class JokboCentricAnalyzer(BaseAnalyzer):
     def _analyze_with_uploads(self, prompt: str, lesson_path: str, jokbo_path: str,
                              lesson_filename: str, jokbo_filename: str) -> str:
         """Analyze with uploading both files."""
-        # Delete existing files first
-        logger.info("Cleaning up existing uploaded files...")
-        self.file_manager.delete_all_uploaded_files()
-        
-        # Upload and analyze
+        # Upload (or reuse cached uploads) and analyze
         files_to_upload = [
             (jokbo_path, f"족보_{jokbo_filename}"),
             (lesson_path, f"강의자료_{lesson_filename}")
         ]
         
         try:
-            response_text = self.upload_and_analyze(files_to_upload, prompt)
-            
-            # Clean up except center file
-            self.file_manager.cleanup_except_center_file(f"족보_{jokbo_filename}")
-            
-            return response_text
+            return self.upload_and_analyze(files_to_upload, prompt)
             
         except Exception as e:
             logger.error(f"Analysis failed: {str(e)}")
@@ -170,20 +188,15 @@ class JokboCentricAnalyzer(BaseAnalyzer):
                                      jokbo_file: Any, lesson_filename: str) -> str:
         """Analyze with pre-uploaded jokbo file."""
         # Upload only lesson
-        lesson_file = self.api_client.upload_file(lesson_path, f"강의자료_{lesson_filename}")
-        self.file_manager.track_file(lesson_file)
+        lesson_file = self.upload_pipeline.acquire(lesson_path, f"강의자료_{lesson_filename}")
         
         try:
-            # Prepare content
-            content = [prompt, jokbo_file, lesson_file]
-            
-            # Generate response
-            response = self.api_client.generate_content(content)
-            return response.text
+            # Generate response (on the cached jokbo context if one is open)
+            return self.generate_with_center_file(prompt, jokbo_file, lesson_filename, lesson_file)
             
         finally:
-            # Delete lesson file
-            self.file_manager.delete_file_safe(lesson_file)
+            # Delete lesson file in the background
+            self.upload_pipeline.release(lesson_file)
     
     def _post_process_results(self, result: Dict[str, Any],
                             chunk_info: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
@@ -230,38 +243,42 @@ class JokboCentricAnalyzer(BaseAnalyzer):
         
         # Pre-upload jokbo file for efficiency
         logger.info(f"Pre-uploading jokbo file: {jokbo_filename}")
-        jokbo_file = self.api_client.upload_file(jokbo_path, f"족보_{jokbo_filename}")
-        self.file_manager.track_file(jokbo_file)
+        jokbo_file = self.upload_pipeline.acquire(jokbo_path, f"족보_{jokbo_filename}")
+        self.open_center_context(jokbo_file, f"족보_{jokbo_filename}")
         
         all_connections = {}  # {question_id: {question_data, connections}}
-        lesson_results = []
         
-        try:
-            for idx, lesson_path in enumerate(lesson_paths):
-                logger.info(f"Analyzing lesson {idx+1}/{len(lesson_paths)}: {Path(lesson_path).name}")
+        def _analyze_lesson(idx: int, lesson_path: str) -> Dict[str, Any]:
+            logger.info(f"Analyzing lesson {idx+1}/{len(lesson_paths)}: {Path(lesson_path).name}")
+            try:
+                result = self.analyze(lesson_path, jokbo_path, jokbo_file)
+                
+                if save_intermediate:
+                    # Save intermediate result
+                    self._save_intermediate_result(idx, lesson_path, result)
                 
-                try:
-                    result = self.analyze(lesson_path, jokbo_path, jokbo_file)
-                    
-                    if save_intermediate:
-                        # Save intermediate result
-                        self._save_intermediate_result(idx, lesson_path, result)
-                    
-                    lesson_results.append(result)
-                    
-                    # Update session info
-                    session_info['processed_lessons'] = idx + 1
-                    
-                except Exception as e:
-                    logger.error(f"Failed to analyze {lesson_path}: {str(e)}")
-                    lesson_results.append({"error": str(e), "lesson_path": lesson_path})
-                    
+                return result
+            except Exception as e:
+                logger.error(f"Failed to analyze {lesson_path}: {str(e)}")
+                return {"error": str(e), "lesson_path": lesson_path}
+        
+        def _merge_as_completed(idx: int, result: Dict[str, Any]) -> None:
+            self._collect_connections(all_connections, idx, result)
+            session_info['processed_lessons'] += 1
+        
+        executor = BoundedExecutor(min(len(lesson_paths), ProcessingConfig.MAX_IN_FLIGHT_PER_KEY), "lesson")
+        try:
+            executor.run(
+                (partial(_analyze_lesson, idx, lesson_path) for idx, lesson_path in enumerate(lesson_paths)),
+                on_result=_merge_as_completed
+            )
         finally:
-            # Clean up jokbo file
-            self.file_manager.delete_file_safe(jokbo_file)
+            # Clean up the cached context and the jokbo file in the background
+            self.close_center_context(jokbo_file)
+            self.upload_pipeline.release(jokbo_file)
         
-        # Merge all results
-        return self._merge_lesson_results(lesson_results, jokbo_path)
+        # Build the final result from the merged connections
+        return self._build_merged_result(all_connections)
     
     def _save_intermediate_result(self, idx: int, lesson_path: str, result: Dict[str, Any]) -> None:
         """Save intermediate analysis result."""
@@ -286,41 +303,67 @@ class JokboCentricAnalyzer(BaseAnalyzer):
         all_connections = {}  # {question_id: {question_data, connections}}
         
         # Collect all connections
-        for result in results:
-            if "error" in result:
-                continue
+        for idx, result in enumerate(results):
+            self._collect_connections(all_connections, idx, result)
+        
+        return self._build_merged_result(all_connections)
+    
+    def _collect_connections(self, all_connections: Dict[str, Any], lesson_idx: int,
+                             result: Dict[str, Any]) -> None:
+        """
+        Merge one lesson's result into the per-question connections.
+        
+        Lessons may arrive in any order; question data and ordering come from
+        the earliest lesson mentioning the question and connections keep their
+        lesson index, so the merged result does not depend on completion order.
+        
+        Args:
+            all_connections: {question_id: {question_data, connections}} being built
+            lesson_idx: Index of the lesson the result belongs to
+            result: Analysis result of the lesson
+        """
+        if "error" in result:
+            return
+        
+        position = 0
+        for page_info in result.get("jokbo_pages", []):
+            jokbo_page = page_info["jokbo_page"]
+            
+            for question in page_info.get("questions", []):
+                question_id = f"{jokbo_page}_{question['question_number']}"
+                entry = all_connections.get(question_id)
                 
-            for page_info in result.get("jokbo_pages", []):
-                jokbo_page = page_info["jokbo_page"]
+                # Initialize question data if first time (or from an earlier lesson)
+                if entry is None or (lesson_idx, position) < entry["order"]:
+                    entry = all_connections[question_id] = {
+                        "order": (lesson_idx, position),
+                        "question_data": {
+                            "jokbo_page": jokbo_page,
+                            "question_number": question["question_number"],
+                            "question_text": question["question_text"],
+                            "answer": question["answer"],
+                            "explanation": question["explanation"],
+                            "wrong_answer_explanations": question.get("wrong_answer_explanations", {}),
+                            "question_numbers_on_page": question.get("question_numbers_on_page", [])
+                        },
+                        "connections": entry["connections"] if entry else []
+                    }
                 
-                for question in page_info.get("questions", []):
-                    question_id = f"{jokbo_page}_{question['question_number']}"
-                    
-                    # Initialize question data if first time
-                    if question_id not in all_connections:
-                        all_connections[question_id] = {
-                            "question_data": {
-                                "jokbo_page": jokbo_page,
-                                "question_number": question["question_number"],
-                                "question_text": question["question_text"],
-                                "answer": question["answer"],
-                                "explanation": question["explanation"],
-                                "wrong_answer_explanations": question.get("wrong_answer_explanations", {}),
-                                "question_numbers_on_page": question.get("question_numbers_on_page", [])
-                            },
-                            "connections": []
-                        }
-                    
-                    # Add related slides
-                    for slide in question.get("related_lesson_slides", []):
-                        all_connections[question_id]["connections"].append(slide)
-        
+                position += 1
+                
+                # Add related slides
+                for slide in question.get("related_lesson_slides", []):
+                    entry["connections"].append((lesson_idx, slide))
+    
+    def _build_merged_result(self, all_connections: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the final jokbo-centric result from the collected connections."""
         # Build final result with filtered connections
         final_pages = {}
         
-        for question_id, data in all_connections.items():
+        for data in sorted(all_connections.values(), key=lambda d: d["order"]):
             question_data = data["question_data"]
-            connections = data["connections"]
+            # Lesson order, so ties in relevance resolve as in a sequential run
+            connections = [slide for _, slide in sorted(data["connections"], key=lambda c: c[0])]
             jokbo_page = question_data["jokbo_page"]
             
             # Initialize page if needed
@@ -5,9 +5,12 @@ Analyzes lessons against jokbo (exam) files to find relevant content.
 
 from typing import Dict, Any, List, Tuple, Optional
 from pathlib import Path
-import pymupdf as fitz
+from functools import partial
 
 from .base import BaseAnalyzer
+from ..pdf.metadata_index import get_metadata_index
+from ..utils.config import ProcessingConfig
+from ..utils.executor import BoundedExecutor
 from ..utils.logging import get_logger
 from ..utils.exceptions import PDFProcessorError
 
@@ -52,6 +55,30 @@ class LessonCentricAnalyzer(BaseAnalyzer):
 """
         return prompt.strip()
     
+    def build_system_instruction(self) -> str:
+        """Build the lesson-centric prompt without the per-jokbo file line."""
+        from constants import (
+            COMMON_PROMPT_INTRO, COMMON_WARNINGS, RELEVANCE_CRITERIA,
+            LESSON_CENTRIC_TASK, LESSON_CENTRIC_OUTPUT_FORMAT
+        )
+        
+        prompt = f"""
+{COMMON_PROMPT_INTRO}
+
+{LESSON_CENTRIC_TASK}
+
+{COMMON_WARNINGS}
+
+{RELEVANCE_CRITERIA}
+
+{LESSON_CENTRIC_OUTPUT_FORMAT}
+"""
+        return prompt.strip()
+    
+    def build_request_prompt(self, jokbo_filename: str) -> str:
+        """Build the per-jokbo prompt sent on top of the cached lesson context."""
+        return f"족보 파일: {jokbo_filename}"
+    
     def analyze(self, jokbo_path: str, lesson_path: str, 
                 preloaded_lesson_file: Optional[Any] = None,
                 chunk_info: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
@@ -89,8 +116,24 @@ class LessonCentricAnalyzer(BaseAnalyzer):
                 prompt, jokbo_path, lesson_path, jokbo_filename, lesson_filename
             )
         
+        return self.process_response(response_text, jokbo_path, lesson_path, chunk_info)
+    
+    def process_response(self, response_text: str, jokbo_path: str, lesson_path: str,
+                         chunk_info: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+        """
+        Turn a raw response for a jokbo/lesson pair into validated results.
+        
+        Args:
+            response_text: Raw API response text
+            jokbo_path: Path to jokbo PDF
+            lesson_path: Path to the lesson PDF (or chunk) that was analyzed
+            chunk_info: Optional (start_page, end_page) of the lesson chunk
+            
+        Returns:
+            Analysis results
+        """
         # Save debug response
-        self.save_debug_response(response_text, jokbo_filename, lesson_filename)
+        self.save_debug_response(response_text, Path(jokbo_path).name, Path(lesson_path).name)
         
         # Parse response
         result = self.parse_and_validate_response(response_text)
@@ -103,36 +146,21 @@ class LessonCentricAnalyzer(BaseAnalyzer):
         
         return result
 
-    def _should_chunk_lesson(self, lesson_path: str, max_pages: int = 40) -> bool:
+    def _should_chunk_lesson(self, lesson_path: str) -> bool:
         """Check if lesson PDF needs chunking."""
-        from ..pdf.operations import PDFOperations
-        page_count = PDFOperations.get_page_count(lesson_path)
-        return page_count > max_pages
+        return len(self.plan_chunks(lesson_path)) > 1
 
     def _analyze_with_chunks(self, jokbo_path: str, lesson_path: str) -> Dict[str, Any]:
         """Analyze lesson in chunks for lesson-centric mode."""
-        from ..pdf.operations import PDFOperations
-        
-        chunks = PDFOperations.split_pdf_for_chunks(lesson_path)
+        chunks = self.plan_chunks(lesson_path)
         logger.info(f"Processing {len(chunks)} chunks for {Path(lesson_path).name}")
         
-        chunk_results: List[Dict[str, Any]] = []
-        
-        for i, (path, start_page, end_page) in enumerate(chunks):
-            logger.info(f"Processing chunk {i+1}/{len(chunks)}: pages {start_page}-{end_page}")
-            
-            # Extract chunk
-            chunk_path = PDFOperations.extract_pages(path, start_page, end_page)
-            
-            try:
-                # Analyze chunk with chunk info for page offset correction
-                result = self.analyze(
-                    jokbo_path, chunk_path, None, chunk_info=(start_page, end_page)
-                )
-                chunk_results.append(result)
-            finally:
-                # Clean up chunk file
-                Path(chunk_path).unlink(missing_ok=True)
+        # Analyze chunks concurrently, with chunk info for page offset correction
+        chunk_results = self.analyze_chunks(
+            chunks, lambda chunk_path, chunk_info: self.analyze(
+                jokbo_path, chunk_path, None, chunk_info=chunk_info
+            )
+        )
         
         # Merge results across chunks
         from ..parsers.result_merger import ResultMerger
@@ -141,23 +169,14 @@ class LessonCentricAnalyzer(BaseAnalyzer):
     def _analyze_with_uploads(self, prompt: str, jokbo_path: str, lesson_path: str,
                              jokbo_filename: str, lesson_filename: str) -> str:
         """Analyze with uploading both files."""
-        # Delete existing files first
-        logger.info("Cleaning up existing uploaded files...")
-        self.file_manager.delete_all_uploaded_files()
-        
-        # Upload and analyze
+        # Upload (or reuse cached uploads) and analyze
         files_to_upload = [
             (lesson_path, f"강의자료_{lesson_filename}"),
             (jokbo_path, f"족보_{jokbo_filename}")
         ]
         
         try:
-            response_text = self.upload_and_analyze(files_to_upload, prompt)
-            
-            # Clean up except center file
-            self.file_manager.cleanup_except_center_file(f"강의자료_{lesson_filename}")
-            
-            return response_text
+            return self.upload_and_analyze(files_to_upload, prompt)
             
         except Exception as e:
             logger.error(f"Analysis failed: {str(e)}")
@@ -167,27 +186,21 @@ class LessonCentricAnalyzer(BaseAnalyzer):
                                       lesson_file: Any, jokbo_filename: str) -> str:
         """Analyze with pre-uploaded lesson file."""
         # Upload only jokbo
-        jokbo_file = self.api_client.upload_file(jokbo_path, f"족보_{jokbo_filename}")
-        self.file_manager.track_file(jokbo_file)
+        jokbo_file = self.upload_pipeline.acquire(jokbo_path, f"족보_{jokbo_filename}")
         
         try:
-            # Prepare content
-            content = [prompt, lesson_file, jokbo_file]
-            
-            # Generate response
-            response = self.api_client.generate_content(content)
-            return response.text
+            # Generate response (on the cached lesson context if one is open)
+            return self.generate_with_center_file(prompt, lesson_file, jokbo_filename, jokbo_file)
             
         finally:
-            # Delete jokbo file
-            self.file_manager.delete_file_safe(jokbo_file)
+            # Delete jokbo file in the background
+            self.upload_pipeline.release(jokbo_file)
     
     def _validate_and_filter_results(self, result: Dict[str, Any], 
                                     jokbo_path: str) -> Dict[str, Any]:
         """Validate and filter analysis results."""
         # Get total pages in jokbo
-        with fitz.open(str(jokbo_path)) as pdf:
-            total_jokbo_pages = len(pdf)
+        total_jokbo_pages = get_metadata_index().get_page_count(jokbo_path)
         
         # Validate and filter results
         if "related_slides" in result:
@@ -238,24 +251,30 @@ class LessonCentricAnalyzer(BaseAnalyzer):
         
         # Pre-upload lesson file for efficiency
         logger.info(f"Pre-uploading lesson file: {lesson_filename}")
-        lesson_file = self.api_client.upload_file(
+        lesson_file = self.upload_pipeline.acquire(
             lesson_path, f"강의자료_{lesson_filename}"
         )
-        self.file_manager.track_file(lesson_file)
         
+        # Chunked lessons are analyzed chunk by chunk, so only cache whole lessons
+        if not self._should_chunk_lesson(lesson_path):
+            self.open_center_context(lesson_file, f"강의자료_{lesson_filename}")
+        
+        def _analyze_jokbo(jokbo_path: str) -> Dict[str, Any]:
+            logger.info(f"Analyzing jokbo: {Path(jokbo_path).name}")
+            try:
+                return self.analyze(jokbo_path, lesson_path, lesson_file)
+            except Exception as e:
+                logger.error(f"Failed to analyze {jokbo_path}: {str(e)}")
+                return {"error": str(e), "jokbo_path": jokbo_path}
+        
+        executor = BoundedExecutor(min(len(jokbo_paths), ProcessingConfig.MAX_IN_FLIGHT_PER_KEY), "jokbo")
         try:
-            for jokbo_path in jokbo_paths:
-                logger.info(f"Analyzing jokbo: {Path(jokbo_path).name}")
-                
-                try:
-                    result = self.analyze(jokbo_path, lesson_path, lesson_file)
-                    results.append(result)
-                except Exception as e:
-                    logger.error(f"Failed to analyze {jokbo_path}: {str(e)}")
-                    results.append({"error": str(e), "jokbo_path": jokbo_path})
+            # Jokbos run concurrently against the shared lesson upload, results in jokbo order
+            results = executor.run(partial(_analyze_jokbo, jokbo_path) for jokbo_path in jokbo_paths)
                     
         finally:
-            # Clean up lesson file
-            self.file_manager.delete_file_safe(lesson_file)
+            # Clean up the cached context and the lesson file in the background
+            self.close_center_context(lesson_file)
+            self.upload_pipeline.release(lesson_file)
         
         return results
\ No newline at end of file
@@ -10,6 +10,9 @@ from .lesson_centric import LessonCentricAnalyzer
 from .jokbo_centric import JokboCentricAnalyzer
 from ..api.multi_api_manager import MultiAPIManager
 from ..api.file_manager import FileManager
+from ..api.rate_limiter import estimate_request_tokens
+from ..pdf.operations import PDFOperations
+from ..utils.config import ProcessingConfig
 from ..utils.logging import get_logger
 from ..utils.exceptions import PDFProcessorError
 
@@ -32,6 +35,20 @@ class MultiAPIAnalyzer:
         self.session_id = session_id
         self.debug_dir = debug_dir
         self.file_manager = FileManager()
+    
+    @staticmethod
+    def estimate_tokens(*pdf_paths: str) -> Optional[int]:
+        """
+        Estimate the input tokens of a request attaching the given PDFs.
+        
+        Returns:
+            Estimated tokens, or None if a page count can't be read
+        """
+        try:
+            pages = sum(PDFOperations.get_page_count(p) for p in pdf_paths)
+        except Exception:
+            return None
+        return estimate_request_tokens(pages)
         
     def analyze_lesson_centric(self, jokbo_path: str, lesson_path: str) -> Dict[str, Any]:
         """
@@ -51,7 +68,9 @@ class MultiAPIAnalyzer:
             )
             return analyzer.analyze(jokbo_path, lesson_path)
         
-        return self.api_manager.execute_with_failover(operation)
+        return self.api_manager.execute_with_failover(
+            operation, estimated_tokens=self.estimate_tokens(jokbo_path, lesson_path)
+        )
     
     def analyze_jokbo_centric(self, lesson_path: str, jokbo_path: str) -> Dict[str, Any]:
         """
@@ -71,7 +90,9 @@ class MultiAPIAnalyzer:
             )
             return analyzer.analyze(lesson_path, jokbo_path)
         
-        return self.api_manager.execute_with_failover(operation)
+        return self.api_manager.execute_with_failover(
+            operation, estimated_tokens=self.estimate_tokens(lesson_path, jokbo_path)
+        )
     
     def analyze_multiple_with_distribution(self, mode: str, file_pairs: List[tuple],
                                          parallel: bool = True) -> List[Dict[str, Any]]:
@@ -103,7 +124,8 @@ class MultiAPIAnalyzer:
         
         # Distribute tasks across APIs
         results = self.api_manager.distribute_tasks(
-            file_pairs, task_operation, parallel=parallel
+            file_pairs, task_operation, parallel=parallel,
+            estimate_tokens=lambda pair: self.estimate_tokens(*pair)
         )
         
         return results
@@ -140,7 +162,10 @@ class MultiAPIAnalyzer:
                 analyzer = LessonCentricAnalyzer(
                     api_client, self.file_manager, self.session_id, self.debug_dir
                 )
-                result = analyzer.analyze(center_file_path, chunk_path)
+                # With chunk_info the analyzer neither re-plans the chunk nor misplaces its pages
+                result = analyzer.analyze(
+                    center_file_path, chunk_path, chunk_info=(start_page, end_page)
+                )
             else:
                 analyzer = JokboCentricAnalyzer(
                     api_client, self.file_manager, self.session_id, self.debug_dir
@@ -151,9 +176,16 @@ class MultiAPIAnalyzer:
                 )
             return (idx, result)
         
+        # Optionally hedge straggling chunks on idle keys
+        hedge_percentile = None
+        if ProcessingConfig.HEDGE_REQUESTS_ENABLED and len(self.api_manager.api_keys) > 1:
+            hedge_percentile = ProcessingConfig.HEDGE_LATENCY_PERCENTILE
+        
         # Distribute chunk tasks across APIs in parallel with failover
         results_raw = self.api_manager.distribute_tasks(
-            tasks, operation, parallel=True, max_workers=max_workers
+            tasks, operation, parallel=True, max_workers=max_workers,
+            estimate_tokens=lambda task: self.estimate_tokens(task[1][0], center_file_path),
+            hedge_percentile=hedge_percentile
         )
         
         # Collect results back into original order
@@ -3,12 +3,22 @@ Gemini API client for handling API interactions.
 Provides a clean interface for API operations with retry logic and error handling.
 """
 
+import json
+import os
 import time
-from typing import Any, Optional, List, Dict
-from datetime import datetime
-import google.generativeai as genai
+from typing import Any, Callable, Optional, List, Dict, Tuple, Union
+from datetime import datetime, timedelta
 from pathlib import Path
 
+from .transport import GenAITransport, create_transport
+from .upload_cache import UploadCache, get_global_upload_cache, hash_bytes, hash_file
+from .response_cache import CachedResponse, ResponseCache, get_global_response_cache
+from .rate_limiter import get_in_flight_slots
+from .status_watcher import get_status_watcher
+from ..pdf.chunk_planner import get_chunk_planner
+from ..pdf.chunk_store import get_chunk_store
+from ..parsers.response_parser import ResponseParser
+from ..utils.config import ProcessingConfig
 from ..utils.exceptions import APIError, FileUploadError, ContentGenerationError
 from ..utils.logging import get_logger
 
@@ -18,32 +28,50 @@ logger = get_logger(__name__)
 class GeminiAPIClient:
     """Client for interacting with Google Gemini API."""
     
-    def __init__(self, model, api_key: Optional[str] = None):
+    def __init__(self, model, api_key: Optional[str] = None,
+                 upload_cache: Optional[UploadCache] = None,
+                 transport: Optional[GenAITransport] = None,
+                 response_cache: Optional[ResponseCache] = None):
         """
         Initialize the Gemini API client.
         
         Args:
             model: The Gemini model instance to use
-            api_key: Optional API key (if not provided, uses environment variable)
+            api_key: Optional API key (if not provided, uses the globally configured key)
+            upload_cache: Optional upload cache (defaults to the global cache)
+            transport: Optional per-key transport (created from api_key if omitted)
+            response_cache: Optional response cache (defaults to the global cache)
         """
-        self.model = model
         self.api_key = api_key
-        self._configure_api(api_key)
+        self.transport = transport or create_transport(api_key)
+        self.model = self.transport.bind_model(model)
+        self.upload_cache = upload_cache if upload_cache is not None else get_global_upload_cache()
+        self.response_cache = response_cache if response_cache is not None else get_global_response_cache()
         
-    def _configure_api(self, api_key: Optional[str] = None):
-        """Configure the API with the provided or environment API key."""
-        if api_key:
-            genai.configure(api_key=api_key)
+        # Shared by every client of this key to cap concurrent requests on it
+        self._in_flight = get_in_flight_slots(api_key or os.getenv('GEMINI_API_KEY'))
+        
+        # Set on clients created by create_context_client
+        self.cached_content = None
+        self._context_key: Optional[str] = None
             
-    def upload_file(self, file_path: str, display_name: Optional[str] = None, 
-                   mime_type: str = "application/pdf") -> Any:
+    def upload_file(self, file_path: Union[str, bytes], display_name: Optional[str] = None, 
+                   mime_type: str = "application/pdf", use_cache: bool = True,
+                   cache_margin: Optional[timedelta] = None) -> Any:
         """
         Upload a file to Gemini API.
         
+        Files with identical content that were already uploaded under the same
+        API key are reused while they are ACTIVE and not about to expire. Chunks
+        the chunk store holds in memory are uploaded straight from their buffer.
+        
         Args:
-            file_path: Path to the file to upload
+            file_path: Path to the file to upload, or the file's bytes
             display_name: Optional display name for the file
             mime_type: MIME type of the file
+            use_cache: Whether to consult the upload cache
+            cache_margin: Time a reused upload must still be kept for (defaults to
+                UPLOAD_CACHE_SAFETY_MARGIN_MINUTES)
             
         Returns:
             Uploaded file object
@@ -51,51 +79,107 @@ class GeminiAPIClient:
         Raises:
             FileUploadError: If file upload fails
         """
+        if isinstance(file_path, bytes):
+            data = file_path
+            file_path = display_name or "upload.pdf"
+        else:
+            data = get_chunk_store().get_buffer(file_path)
         if display_name is None:
             display_name = Path(file_path).name
+        
+        content_hash = None
+        cache_key = None
+        if use_cache and self.upload_cache is not None:
+            try:
+                content_hash = self._content_hash(file_path, data)
+                cache_key = self.upload_cache.make_key(file_path, self.api_key, content_hash)
+                cached_file = self._get_cached_upload(cache_key, cache_margin)
+                if cached_file is not None:
+                    logger.info(f"Reusing cached upload for {display_name}: {cached_file.name}")
+                    self._remember_content(cached_file, file_path, data, content_hash)
+                    return cached_file
+            except OSError as e:
+                logger.warning(f"Upload cache unavailable for {display_name}: {str(e)}")
+                cache_key = None
             
         try:
-            # Ensure correct API key context for this client
-            self._configure_api(self.api_key)
             logger.info(f"Uploading file: {display_name}")
-            uploaded_file = genai.upload_file(
-                path=file_path,
+            uploaded_file = self.transport.upload_file(
+                data if data is not None else file_path,
                 display_name=display_name,
                 mime_type=mime_type
             )
             
-            # Wait for file to be processed
-            while uploaded_file.state.name == "PROCESSING":
-                logger.debug(f"Processing {display_name}...")
-                time.sleep(2)
-                uploaded_file = genai.get_file(uploaded_file.name)
+            # Wait for file to be processed (shared adaptive poller for this key)
+            size_bytes = len(data) if data is not None else os.path.getsize(file_path)
+            if uploaded_file.state.name == "PROCESSING":
+                watcher = get_status_watcher(self.api_key, self._fetch_file)
+                uploaded_file = watcher.wait_until_active(uploaded_file, size_bytes=size_bytes)
             
             if uploaded_file.state.name == "FAILED":
                 raise FileUploadError(f"File processing failed: {display_name}")
                 
             logger.info(f"Successfully uploaded: {display_name}")
+            if cache_key is not None:
+                self.upload_cache.store(cache_key, uploaded_file, size_bytes)
+            self._remember_content(uploaded_file, file_path, data, content_hash)
             return uploaded_file
             
         except Exception as e:
             logger.error(f"Failed to upload file {display_name}: {str(e)}")
             raise FileUploadError(f"Failed to upload {display_name}: {str(e)}")
     
-    def delete_file(self, file: Any, max_retries: int = 3) -> bool:
+    @staticmethod
+    def _content_hash(file_path: str, data: Optional[bytes]) -> str:
+        """Hash an upload's content, from its buffer if it is in memory."""
+        return hash_bytes(data) if data is not None else hash_file(file_path)
+    
+    def _get_cached_upload(self, cache_key: str, cache_margin: Optional[timedelta] = None) -> Optional[Any]:
+        """
+        Resolve a cache entry to a remote file that is still usable.
+        
+        Args:
+            cache_key: Upload cache key
+            cache_margin: Time the file must still be kept for
+            
+        Returns:
+            ACTIVE file object, or None on miss
+        """
+        entry = self.upload_cache.lookup(cache_key, cache_margin)
+        if entry is None:
+            return None
+        
+        remote_file = self.get_file(entry["name"])
+        if remote_file is None or remote_file.state.name != "ACTIVE":
+            logger.debug(f"Cached upload {entry['name']} is no longer usable")
+            self.upload_cache.invalidate(cache_key)
+            return None
+        
+        return remote_file
+    
+    def delete_file(self, file: Any, max_retries: int = 3, force: bool = False) -> bool:
         """
         Delete a file from Gemini API with retry logic.
         
+        Files owned by the upload cache are retained unless force is set.
+        
         Args:
             file: File object to delete
             max_retries: Maximum number of retry attempts
+            force: Delete even if the file is in the upload cache
             
         Returns:
             True if deletion successful, False otherwise
         """
+        if self.upload_cache is not None:
+            if not force and self.upload_cache.is_cached_name(file.name):
+                logger.debug(f"Retaining cached upload: {file.display_name}")
+                return True
+            self.upload_cache.invalidate_name(file.name)
+        
         for attempt in range(max_retries):
             try:
-                # Ensure correct API key context for this client
-                self._configure_api(self.api_key)
-                genai.delete_file(file.name)
+                self.transport.delete_file(file.name)
                 logger.info(f"Deleted file: {file.display_name}")
                 return True
             except Exception as e:
@@ -112,13 +196,160 @@ class GeminiAPIClient:
             List of uploaded files
         """
         try:
-            # Ensure correct API key context for this client
-            self._configure_api(self.api_key)
-            return list(genai.list_files())
+            return self.transport.list_files()
         except Exception as e:
             logger.error(f"Failed to list files: {str(e)}")
             return []
     
+    def create_context_client(self, system_instruction: str, files: List[Any],
+                              display_name: Optional[str] = None,
+                              ttl_seconds: Optional[int] = None) -> "GeminiAPIClient":
+        """
+        Create a server-side cached context and a client whose requests run on it.
+        
+        Requests sent through the returned client only carry their own prompt and
+        files; the system instruction and context files are billed as cached tokens.
+        Release the context with release_context when the job is done.
+        
+        Args:
+            system_instruction: System instruction stored in the context
+            files: Uploaded files stored in the context (same API key as this client)
+            display_name: Optional display name of the context
+            ttl_seconds: Lifetime of the context (defaults to CONTEXT_CACHE_TTL_MINUTES)
+            
+        Returns:
+            GeminiAPIClient bound to the cached context
+            
+        Raises:
+            APIError: If the context cannot be created
+        """
+        if ttl_seconds is None:
+            ttl_seconds = ProcessingConfig.CONTEXT_CACHE_TTL_MINUTES * 60
+        
+        model_name = getattr(self.model, "model_name", "")
+        try:
+            cached_content = self.transport.create_cached_content(
+                model_name,
+                system_instruction=system_instruction,
+                contents=list(files),
+                ttl_seconds=ttl_seconds,
+                display_name=display_name
+            )
+            model = self.transport.create_cached_model(
+                cached_content,
+                generation_config=getattr(self.model, "_generation_config", None),
+                safety_settings=getattr(self.model, "_safety_settings", None)
+            )
+        except Exception as e:
+            raise APIError(f"Failed to create cached context {display_name or ''}: {str(e)}")
+        
+        logger.info(f"Created cached context {cached_content.name} ({display_name or 'unnamed'})")
+        context_client = GeminiAPIClient(
+            model, api_key=self.api_key, upload_cache=self.upload_cache,
+            transport=self.transport, response_cache=self.response_cache
+        )
+        context_client.cached_content = cached_content
+        if self.response_cache is not None:
+            # Responses depend on what the context holds, not on its server-side name
+            context_client._context_key = self.response_cache.make_key(
+                [system_instruction] + list(files), model_name
+            )
+        return context_client
+    
+    def release_context(self) -> bool:
+        """
+        Delete the cached context this client runs on.
+        
+        Returns:
+            True if deleted (or nothing to delete), False otherwise
+        """
+        if self.cached_content is None:
+            return True
+        try:
+            self.transport.delete_cached_content(self.cached_content.name)
+            logger.info(f"Deleted cached context {self.cached_content.name}")
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to delete cached context {self.cached_content.name}: {str(e)}")
+            return False
+    
+    def _remember_content(self, file: Any, file_path: str, data: Optional[bytes] = None,
+                          content_hash: Optional[str] = None) -> None:
+        """Record an uploaded file's content hash for response cache keys."""
+        if self.response_cache is None:
+            return
+        try:
+            self.response_cache.remember_file(file.name, content_hash or self._content_hash(file_path, data))
+        except OSError as e:
+            logger.debug(f"Could not hash {file_path} for the response cache: {str(e)}")
+    
+    def _response_cache_key(self, content: Any) -> Optional[str]:
+        """Build the response cache key for a request (None if it can't be cached)."""
+        if self.response_cache is None:
+            return None
+        if self.cached_content is not None and self._context_key is None:
+            return None
+        return self.response_cache.make_key(
+            content,
+            getattr(self.model, "model_name", ""),
+            getattr(self.model, "_generation_config", None),
+            context=self._context_key
+        )
+    
+    @staticmethod
+    def _is_usable_response(response_text: str) -> bool:
+        """Check that a response parses, without partial recovery, into a valid analysis result."""
+        try:
+            result = json.loads(response_text)
+        except ValueError:
+            return False
+        if not isinstance(result, dict) or result.get("error"):
+            return False
+        return any(ResponseParser.validate_response_structure(result, mode)
+                   for mode in ("jokbo-centric", "lesson-centric"))
+    
+    def _store_response(self, cache_key: Optional[str], response_text: str) -> None:
+        if cache_key is None or not response_text:
+            return
+        if not self._is_usable_response(response_text):
+            # Truncated, refused or malformed answers must not be replayed on retry
+            logger.debug("Not caching a response that doesn't parse into a valid result")
+            return
+        try:
+            self.response_cache.put(cache_key, response_text)
+        except Exception as e:
+            logger.warning(f"Failed to cache response: {str(e)}")
+    
+    def _record_outcome(self, truncated: bool) -> None:
+        """Let the chunk planner learn from whether a response hit MAX_TOKENS."""
+        if not ProcessingConfig.ADAPTIVE_CHUNKING:
+            return
+        model_name = getattr(self.model, "model_name", None)
+        if truncated:
+            get_chunk_planner().record_truncation(model_name)
+        else:
+            get_chunk_planner().record_complete(model_name)
+    
+    def _cached_response(self, cache_key: Optional[str]) -> Optional[str]:
+        if cache_key is None:
+            return None
+        try:
+            cached = self.response_cache.get(cache_key)
+        except Exception as e:
+            logger.warning(f"Response cache lookup failed: {str(e)}")
+            return None
+        if cached is not None and not self._is_usable_response(cached):
+            # Stored before responses were validated; drop it and ask the model again
+            logger.info("Discarding an unusable cached response")
+            try:
+                self.response_cache.delete(cache_key)
+            except Exception as e:
+                logger.warning(f"Failed to drop cached response: {str(e)}")
+            return None
+        if cached is not None:
+            logger.info(f"Response cache hit ({len(cached)} chars)")
+        return cached
+    
     def generate_content(self, content: Any, max_retries: int = 3, 
                         backoff_factor: int = 2) -> Any:
         """
@@ -135,9 +366,15 @@ class GeminiAPIClient:
         Raises:
             ContentGenerationError: If content generation fails
         """
+        cache_key = self._response_cache_key(content)
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            return CachedResponse(cached)
+        
         for attempt in range(max_retries):
             try:
-                response = self.model.generate_content(content)
+                with self._in_flight:
+                    response = self.model.generate_content(content)
                 
                 # Check for empty response
                 if not response.text or len(response.text) == 0:
@@ -151,17 +388,25 @@ class GeminiAPIClient:
                         raise ContentGenerationError("Empty response from API")
                 
                 # Check finish reason
+                complete = True
+                truncated = False
                 if response.candidates:
                     finish_reason = str(response.candidates[0].finish_reason)
                     if 'MAX_TOKENS' in finish_reason or finish_reason == '2':
                         logger.warning(f"Response truncated due to token limit (length: {len(response.text)})")
+                        complete = False
+                        truncated = True
                     elif 'SAFETY' in finish_reason or finish_reason == '3':
                         logger.warning("Response blocked due to safety concerns")
+                        complete = False
                         if attempt < max_retries - 1:
                             wait_time = backoff_factor ** attempt
                             time.sleep(wait_time)
                             continue
                 
+                if complete:
+                    self._store_response(cache_key, response.text)
+                self._record_outcome(truncated)
                 return response
                 
             except Exception as e:
@@ -175,6 +420,182 @@ class GeminiAPIClient:
         
         raise ContentGenerationError("Maximum retries exceeded")
     
+    def generate_content_stream(self, content: Any, on_text: Callable[[str], Any],
+                                max_retries: int = 3, backoff_factor: int = 2) -> str:
+        """
+        Generate content as a stream, handing each text chunk to a callback.
+        
+        Failures before any text arrives are retried like generate_content. Once
+        text has been delivered the request is not retried (the consumer has already
+        acted on it); an interrupted or truncated stream returns what was received.
+        
+        Args:
+            content: Content to send to the model
+            on_text: Callback invoked with each text chunk as it arrives
+            max_retries: Maximum number of retry attempts
+            backoff_factor: Exponential backoff factor
+            
+        Returns:
+            Full response text
+            
+        Raises:
+            ContentGenerationError: If content generation fails
+        """
+        cache_key = self._response_cache_key(content)
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            on_text(cached)
+            return cached
+        
+        for attempt in range(max_retries):
+            parts: List[str] = []
+            finish_reason = None
+            try:
+                with self._in_flight:
+                    response = self.model.generate_content(content, stream=True)
+                    for chunk in response:
+                        try:
+                            text = chunk.text
+                        except ValueError:
+                            # Chunks without text parts (e.g. the final finish-reason chunk)
+                            text = ""
+                        if chunk.candidates:
+                            finish_reason = str(chunk.candidates[0].finish_reason)
+                        if text:
+                            parts.append(text)
+                            on_text(text)
+            except Exception as e:
+                if parts:
+                    logger.warning(f"Response stream interrupted after {sum(map(len, parts))} chars: {str(e)}")
+                    return "".join(parts)
+                logger.error(f"Content generation failed (attempt {attempt + 1}/{max_retries}): {str(e)}")
+                if attempt < max_retries - 1:
+                    wait_time = backoff_factor ** attempt
+                    logger.info(f"Retrying in {wait_time} seconds...")
+                    time.sleep(wait_time)
+                    continue
+                raise ContentGenerationError(f"Failed to generate content after {max_retries} attempts: {str(e)}")
+            
+            response_text = "".join(parts)
+            if finish_reason and ('MAX_TOKENS' in finish_reason or finish_reason == '2'):
+                logger.warning(f"Response truncated due to token limit (length: {len(response_text)})")
+                self._record_outcome(truncated=True)
+                return response_text
+            elif not response_text:
+                blocked = finish_reason and ('SAFETY' in finish_reason or finish_reason == '3')
+                logger.warning(f"{'Blocked' if blocked else 'Empty'} response received "
+                               f"(attempt {attempt + 1}/{max_retries})")
+                if attempt < max_retries - 1:
+                    time.sleep(backoff_factor ** attempt)
+                    continue
+                raise ContentGenerationError("Empty response from API")
+            
+            if not (finish_reason and ('SAFETY' in finish_reason or finish_reason == '3')):
+                self._store_response(cache_key, response_text)
+            self._record_outcome(truncated=False)
+            return response_text
+        
+        raise ContentGenerationError("Maximum retries exceeded")
+    
+    def generate_batch(self, requests: List[Tuple[str, List[Any]]],
+                       display_name: Optional[str] = None,
+                       poll_interval: Optional[float] = None,
+                       timeout: Optional[float] = None) -> Dict[str, Union[str, Exception]]:
+        """
+        Run generation requests as one asynchronous batch job and wait for it.
+        
+        Batch jobs trade latency (up to a day) for lower cost and no per-minute
+        rate limits. Requests already in the response cache are not submitted.
+        
+        Args:
+            requests: (key, content) pairs with unique keys
+            display_name: Optional display name of the batch
+            poll_interval: Seconds between status checks (defaults to BATCH_POLL_INTERVAL)
+            timeout: Seconds to wait before cancelling (defaults to BATCH_TIMEOUT_HOURS)
+        
+        Returns:
+            Mapping of key to response text, or to a ContentGenerationError for
+            requests that failed, were blocked or were truncated
+        
+        Raises:
+            APIError: If the batch cannot be submitted, fails as a whole or times out
+        """
+        if poll_interval is None:
+            poll_interval = ProcessingConfig.BATCH_POLL_INTERVAL
+        if timeout is None:
+            timeout = ProcessingConfig.BATCH_TIMEOUT_HOURS * 3600
+        
+        outputs: Dict[str, Union[str, Exception]] = {}
+        cache_keys: Dict[str, Optional[str]] = {}
+        pending = []
+        for key, content in requests:
+            cache_keys[key] = self._response_cache_key(content)
+            cached = self._cached_response(cache_keys[key])
+            if cached is not None:
+                outputs[key] = cached
+            else:
+                pending.append((key, content))
+        
+        if not pending:
+            return outputs
+        
+        try:
+            batch_name = self.transport.create_batch(self.model, pending, display_name=display_name)
+        except Exception as e:
+            raise APIError(f"Failed to submit batch of {len(pending)} requests: {str(e)}")
+        logger.info(f"Submitted batch {batch_name} with {len(pending)} requests "
+                    f"({len(outputs)} served from cache)")
+        
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                status = self.transport.get_batch(batch_name)
+            except Exception as e:
+                # Transient polling errors don't affect the batch itself
+                logger.warning(f"Failed to poll batch {batch_name}: {str(e)}")
+                status = {"state": "BATCH_STATE_UNKNOWN", "done": False}
+        
+            if status["done"]:
+                break
+            if time.monotonic() >= deadline:
+                try:
+                    self.transport.cancel_batch(batch_name)
+                except Exception as e:
+                    logger.warning(f"Failed to cancel batch {batch_name}: {str(e)}")
+                raise APIError(f"Batch {batch_name} did not finish within {timeout:.0f}s")
+            logger.debug(f"Batch {batch_name} is {status['state']}")
+            time.sleep(poll_interval)
+        
+        if status["state"] != "BATCH_STATE_SUCCEEDED":
+            raise APIError(f"Batch {batch_name} ended in {status['state']}: {status.get('error') or ''}")
+        
+        for key, _ in pending:
+            result = status["results"].get(key)
+            if result is None:
+                outputs[key] = ContentGenerationError("No response in batch output")
+            elif "error" in result:
+                outputs[key] = ContentGenerationError(result["error"])
+            elif not result["text"]:
+                outputs[key] = ContentGenerationError(f"Empty response from API ({result['finish_reason']})")
+            elif 'MAX_TOKENS' in result["finish_reason"]:
+                # Keep truncated text for partial recovery, but never cache it
+                logger.warning(f"Batch response {key} truncated due to token limit")
+                outputs[key] = result["text"]
+                self._record_outcome(truncated=True)
+            else:
+                outputs[key] = result["text"]
+                self._record_outcome(truncated=False)
+                if 'SAFETY' not in result["finish_reason"]:
+                    self._store_response(cache_keys[key], result["text"])
+        
+        failed = sum(isinstance(v, Exception) for v in outputs.values())
+        logger.info(f"Batch {batch_name} finished: {len(outputs) - failed} responses, {failed} failed")
+        return outputs
+    
+    def _fetch_file(self, file_name: str) -> Any:
+        """Get a file by name, raising on failure (used by the status watcher)."""
+        return self.transport.get_file(file_name)
+    
     def get_file(self, file_name: str) -> Optional[Any]:
         """
         Get a file by name.
@@ -186,9 +607,7 @@ class GeminiAPIClient:
             File object if found, None otherwise
         """
         try:
-            # Ensure correct API key context for this client
-            self._configure_api(self.api_key)
-            return genai.get_file(file_name)
+            return self.transport.get_file(file_name)
         except Exception as e:
             logger.error(f"Failed to get file {file_name}: {str(e)}")
             return None
\ No newline at end of file
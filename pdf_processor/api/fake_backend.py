@@ -0,0 +1,593 @@
+"""
+Offline stand-in for the Gemini API.
+Implements the GenAITransport interface in-process so the pipeline can be
+load-tested without quota: uploads go through PROCESSING to ACTIVE, generation
+latency follows a log-normal distribution, 429/500 errors and MAX_TOKENS
+truncation are injected at configurable rates, cached contexts shorten
+generation latency, batch jobs complete after a fixed delay, and responses
+are replayed from saved debug dumps (output/debug/*_response.json).
+"""
+
+import hashlib
+import io
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from google.api_core import exceptions as api_exceptions
+from google.generativeai import protos
+
+from ..utils.config import ProcessingConfig
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+FinishReason = protos.Candidate.FinishReason
+
+# Latency multiplier for requests whose bulk of input comes from a cached context
+CACHED_CONTEXT_LATENCY_FACTOR = 0.6
+
+
+class FakeFile:
+    """Snapshot of an uploaded file, shaped like google.generativeai File objects."""
+
+    def __init__(self, name: str, display_name: str, mime_type: str, size_bytes: int,
+                 state: str, create_time: datetime, expiration_time: datetime):
+        self.name = name
+        self.display_name = display_name
+        self.mime_type = mime_type
+        self.size_bytes = size_bytes
+        self.state = SimpleNamespace(name=state)
+        self.create_time = create_time
+        self.expiration_time = expiration_time
+        self.uri = f"https://fake-gemini.local/v1beta/{name}"
+
+    def __repr__(self) -> str:
+        return f"FakeFile({self.name!r}, {self.display_name!r}, {self.state.name})"
+
+
+class _FileRecord:
+    def __init__(self, name: str, display_name: str, mime_type: str, size_bytes: int,
+                 ready_at: float):
+        self.name = name
+        self.display_name = display_name
+        self.mime_type = mime_type
+        self.size_bytes = size_bytes
+        self.ready_at = ready_at
+        self.create_time = datetime.now(timezone.utc)
+        self.expiration_time = self.create_time + timedelta(hours=48)
+
+    def snapshot(self) -> FakeFile:
+        state = "ACTIVE" if time.monotonic() >= self.ready_at else "PROCESSING"
+        return FakeFile(self.name, self.display_name, self.mime_type, self.size_bytes,
+                        state, self.create_time, self.expiration_time)
+
+
+class FakeCachedContent:
+    """Server-side cached context, shaped like google.generativeai CachedContent."""
+
+    def __init__(self, name: str, model: str, display_name: Optional[str],
+                 system_instruction: Optional[str], files: List[Any], expire_time: datetime):
+        self.name = name
+        self.model = model
+        self.display_name = display_name or ""
+        self.system_instruction = system_instruction or ""
+        self.files = list(files)
+        self.expire_time = expire_time
+
+    def __repr__(self) -> str:
+        return f"FakeCachedContent({self.name!r}, {self.display_name!r})"
+
+
+class FakeResponse:
+    """Generation response (or stream chunk) with text and finish reason."""
+
+    def __init__(self, text: str, finish_reason: Optional[Any] = None):
+        self._text = text
+        self.candidates = [SimpleNamespace(finish_reason=finish_reason)] if finish_reason is not None else []
+
+    @property
+    def text(self) -> str:
+        if not self._text:
+            raise ValueError("The response does not contain any text parts")
+        return self._text
+
+
+class FakeGeminiService:
+    """Shared state of the fake API: files per key, fault injection and stats."""
+
+    def __init__(self, seed: Optional[int] = None, replay_dir: Optional[str] = None,
+                 latency_median: Optional[float] = None, latency_sigma: Optional[float] = None,
+                 rate_limit_rate: Optional[float] = None, error_rate: Optional[float] = None,
+                 truncation_rate: Optional[float] = None, rpm: Optional[int] = None,
+                 processing_seconds_per_mb: Optional[float] = None,
+                 batch_seconds: Optional[float] = None):
+        """
+        Initialize the service (unset arguments come from ProcessingConfig).
+
+        Args:
+            seed: Seed making latencies and injected faults reproducible
+            replay_dir: Directory of saved *_response.json debug dumps to replay
+            latency_median: Median generation latency in seconds
+            latency_sigma: Log-normal sigma of the generation latency
+            rate_limit_rate: Probability of an injected 429 per request
+            error_rate: Probability of an injected 500 per request
+            truncation_rate: Probability of a MAX_TOKENS-truncated response
+            rpm: Requests per minute enforced per key (0 disables)
+            processing_seconds_per_mb: Time uploads stay in PROCESSING per MB
+            batch_seconds: Time a batch job takes to complete
+        """
+        cfg = ProcessingConfig
+        self.seed = cfg.FAKE_GEMINI_SEED if seed is None else seed
+        self.replay_dir = Path(replay_dir or cfg.FAKE_GEMINI_REPLAY_DIR)
+        self.latency_median = cfg.FAKE_GEMINI_LATENCY_MEDIAN if latency_median is None else latency_median
+        self.latency_sigma = cfg.FAKE_GEMINI_LATENCY_SIGMA if latency_sigma is None else latency_sigma
+        self.rate_limit_rate = cfg.FAKE_GEMINI_RATE_LIMIT_RATE if rate_limit_rate is None else rate_limit_rate
+        self.error_rate = cfg.FAKE_GEMINI_ERROR_RATE if error_rate is None else error_rate
+        self.truncation_rate = cfg.FAKE_GEMINI_TRUNCATION_RATE if truncation_rate is None else truncation_rate
+        self.rpm = cfg.FAKE_GEMINI_RPM if rpm is None else rpm
+        self.processing_seconds_per_mb = (cfg.FAKE_GEMINI_PROCESSING_SECONDS_PER_MB
+                                          if processing_seconds_per_mb is None
+                                          else processing_seconds_per_mb)
+        self.batch_seconds = cfg.FAKE_GEMINI_BATCH_SECONDS if batch_seconds is None else batch_seconds
+
+        self.stats: Counter = Counter()
+        self._files: Dict[str, Dict[str, _FileRecord]] = {}
+        self._contexts: Dict[str, Dict[str, FakeCachedContent]] = {}
+        self._batches: Dict[str, Dict[str, Any]] = {}
+        self._request_log: Dict[str, deque] = {}
+        self._seen: Counter = Counter()
+        self._replays: Optional[List[Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    # Determinism
+
+    def _rng(self, kind: str, key: str) -> random.Random:
+        """RNG for the n-th occurrence of a request, independent of thread interleaving."""
+        with self._lock:
+            self._seen[(kind, key)] += 1
+            occurrence = self._seen[(kind, key)]
+        return random.Random(f"{self.seed}:{kind}:{key}:{occurrence}")
+
+    # Files
+
+    def upload(self, key_fp: str, file_path: Any, display_name: str, mime_type: Optional[str]) -> FakeFile:
+        if isinstance(file_path, (bytes, bytearray, memoryview)):
+            size = len(file_path)
+        elif isinstance(file_path, io.IOBase):
+            size = len(file_path.read())
+        else:
+            path = Path(file_path)
+            if not path.exists():
+                raise FileNotFoundError(file_path)
+            size = path.stat().st_size
+        name = f"files/fake-{uuid.uuid4().hex[:12]}"
+        processing = 0.05 + size / (1024 * 1024) * self.processing_seconds_per_mb
+        record = _FileRecord(name, display_name, mime_type or "application/pdf", size,
+                             time.monotonic() + processing)
+        with self._lock:
+            self._files.setdefault(key_fp, {})[name] = record
+            self.stats["uploads"] += 1
+        return record.snapshot()
+
+    def get_file(self, key_fp: str, name: str) -> FakeFile:
+        with self._lock:
+            self.stats["get_file"] += 1
+            record = self._files.get(key_fp, {}).get(name)
+        if record is None:
+            raise api_exceptions.NotFound(f"File {name} not found")
+        return record.snapshot()
+
+    def delete_file(self, key_fp: str, name: str) -> None:
+        with self._lock:
+            self.stats["deletes"] += 1
+            record = self._files.get(key_fp, {}).pop(name, None)
+        if record is None:
+            raise api_exceptions.NotFound(f"File {name} not found")
+
+    def list_files(self, key_fp: str) -> List[FakeFile]:
+        with self._lock:
+            self.stats["list_files"] += 1
+            records = list(self._files.get(key_fp, {}).values())
+        return [r.snapshot() for r in records]
+
+    # Cached contexts
+
+    def create_cached_content(self, key_fp: str, model_name: str, system_instruction: Optional[str],
+                              contents: Optional[List[Any]], ttl_seconds: int,
+                              display_name: Optional[str]) -> FakeCachedContent:
+        files = [p for p in (contents or []) if not isinstance(p, str)]
+        self._check_files(key_fp, files)
+        context = FakeCachedContent(
+            f"cachedContents/fake-{uuid.uuid4().hex[:12]}", model_name, display_name,
+            system_instruction, files, datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+        )
+        with self._lock:
+            self._contexts.setdefault(key_fp, {})[context.name] = context
+            self.stats["context_caches"] += 1
+        return context
+
+    def delete_cached_content(self, key_fp: str, name: str) -> None:
+        with self._lock:
+            self.stats["context_deletes"] += 1
+            context = self._contexts.get(key_fp, {}).pop(name, None)
+        if context is None:
+            raise api_exceptions.NotFound(f"CachedContent {name} not found")
+
+    def _get_context(self, key_fp: str, name: str, model_name: str) -> FakeCachedContent:
+        """Resolve a cached context the way the real API validates it."""
+        with self._lock:
+            context = self._contexts.get(key_fp, {}).get(name)
+            foreign = any(name in other for fp, other in self._contexts.items() if fp != key_fp)
+        if context is None:
+            if foreign:
+                raise api_exceptions.PermissionDenied(
+                    "You do not have permission to access the CachedContent or it may not exist"
+                )
+            raise api_exceptions.NotFound(f"CachedContent {name} not found")
+        if datetime.now(timezone.utc) >= context.expire_time:
+            with self._lock:
+                self._contexts.get(key_fp, {}).pop(name, None)
+            raise api_exceptions.NotFound(f"CachedContent {name} has expired")
+        if context.model != model_name:
+            raise api_exceptions.InvalidArgument(
+                f"Model {model_name} does not match the model of CachedContent {name}"
+            )
+        return context
+
+    # Generation
+
+    def generate(self, key_fp: str, model_name: str, contents: Any,
+                 cached_content: Optional[str] = None, batch: bool = False) -> FakeResponse:
+        """
+        Run one generation request (blocking for the emulated latency).
+
+        Args:
+            key_fp: Fingerprint of the calling key
+            model_name: Model name
+            contents: Prompt and uploaded files
+            cached_content: Name of a cached context the request runs on
+            batch: Request is part of a batch job (no latency, RPM limit or 429s)
+
+        Raises:
+            google.api_core exceptions mirroring the real API (429, 500, 403, 404, 400)
+        """
+        parts = contents if isinstance(contents, (list, tuple)) else [contents]
+        prompt = "\n".join(p for p in parts if isinstance(p, str))
+        files = [p for p in parts if not isinstance(p, str)]
+        self._check_files(key_fp, files)
+
+        latency_factor = 1.0
+        if cached_content:
+            context = self._get_context(key_fp, cached_content, model_name)
+            prompt = "\n".join(p for p in (context.system_instruction, prompt) if p)
+            files = context.files + files
+            latency_factor = CACHED_CONTEXT_LATENCY_FACTOR
+            with self._lock:
+                self.stats["cached_context_requests"] += 1
+
+        request_key = hashlib.sha256(
+            (model_name + prompt + "|".join(getattr(f, "display_name", "") for f in files)).encode("utf-8")
+        ).hexdigest()
+        rng = self._rng("generate", request_key)
+
+        with self._lock:
+            self.stats["generate"] += 1
+        if not batch:
+            self._check_rpm(key_fp)
+
+        pause = (lambda seconds: None) if batch else time.sleep
+        latency = rng.lognormvariate(math.log(max(self.latency_median, 1e-3)), self.latency_sigma) * latency_factor
+        roll = rng.random()
+        if roll < self.rate_limit_rate and not batch:
+            pause(min(latency, 0.2))
+            with self._lock:
+                self.stats["rate_limited"] += 1
+            raise api_exceptions.ResourceExhausted(
+                "Resource has been exhausted (e.g. check quota). retry_delay { seconds: 5 }"
+            )
+        if self.rate_limit_rate <= roll < self.rate_limit_rate + self.error_rate:
+            pause(latency * rng.random())
+            with self._lock:
+                self.stats["errors"] += 1
+            raise api_exceptions.InternalServerError("An internal error has occurred")
+
+        pause(latency)
+        text = self._response_text(prompt, files, rng)
+        if rng.random() < self.truncation_rate and len(text) > 10:
+            with self._lock:
+                self.stats["truncated"] += 1
+            return FakeResponse(text[:int(len(text) * rng.uniform(0.3, 0.9))], FinishReason.MAX_TOKENS)
+        return FakeResponse(text, FinishReason.STOP)
+
+    # Batches
+
+    def create_batch(self, key_fp: str, model_name: str, requests: List[Any],
+                     display_name: Optional[str]) -> str:
+        name = f"batches/fake-{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self._batches[name] = {
+                "key_fp": key_fp,
+                "model": model_name,
+                "display_name": display_name,
+                "requests": list(requests),
+                "ready_at": time.monotonic() + self.batch_seconds,
+                "state": "BATCH_STATE_RUNNING",
+                "results": {}
+            }
+            self.stats["batches"] += 1
+        return name
+
+    def get_batch(self, key_fp: str, name: str) -> Dict[str, Any]:
+        with self._lock:
+            self.stats["get_batch"] += 1
+            record = self._batches.get(name)
+        if record is None or record["key_fp"] != key_fp:
+            raise api_exceptions.NotFound(f"Batch {name} not found")
+
+        if record["state"] == "BATCH_STATE_RUNNING" and time.monotonic() >= record["ready_at"]:
+            # Requests run when the batch completes, so files deleted meanwhile fail
+            results = {}
+            for key, content in record["requests"]:
+                try:
+                    response = self.generate(key_fp, record["model"], content, batch=True)
+                    results[key] = {"text": response._text,
+                                    "finish_reason": FinishReason(response.candidates[0].finish_reason).name}
+                except api_exceptions.GoogleAPICallError as e:
+                    results[key] = {"error": str(e)}
+            with self._lock:
+                record["results"] = results
+                record["state"] = "BATCH_STATE_SUCCEEDED"
+
+        done = record["state"] != "BATCH_STATE_RUNNING"
+        return {"state": record["state"], "done": done, "results": dict(record["results"]), "error": None}
+
+    def cancel_batch(self, key_fp: str, name: str) -> None:
+        with self._lock:
+            record = self._batches.get(name)
+            if record is None or record["key_fp"] != key_fp:
+                raise api_exceptions.NotFound(f"Batch {name} not found")
+            if record["state"] == "BATCH_STATE_RUNNING":
+                record["state"] = "BATCH_STATE_CANCELLED"
+
+    def _check_files(self, key_fp: str, files: List[Any]) -> None:
+        """Reject files that real Gemini would reject for this key."""
+        with self._lock:
+            own = self._files.get(key_fp, {})
+            foreign = any(f.name in other for fp, other in self._files.items() if fp != key_fp for f in files)
+            missing = [f for f in files if f.name not in own]
+        if missing:
+            if foreign:
+                raise api_exceptions.PermissionDenied(
+                    "You do not have permission to access the File or it may not exist"
+                )
+            raise api_exceptions.NotFound(f"File {missing[0].name} not found")
+        for f in files:
+            if own[f.name].snapshot().state.name != "ACTIVE":
+                raise api_exceptions.FailedPrecondition(
+                    f"The File {f.name} is not in an ACTIVE state and usage is not allowed"
+                )
+
+    def _check_rpm(self, key_fp: str) -> None:
+        if not self.rpm:
+            return
+        now = time.monotonic()
+        with self._lock:
+            log = self._request_log.setdefault(key_fp, deque())
+            while log and now - log[0] > 60:
+                log.popleft()
+            if len(log) >= self.rpm:
+                self.stats["rate_limited"] += 1
+                retry = max(1, int(60 - (now - log[0])))
+                raise api_exceptions.ResourceExhausted(
+                    f"Quota exceeded for requests per minute. retry_delay {{ seconds: {retry} }}"
+                )
+            log.append(now)
+
+    def _load_replays(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            if self._replays is not None:
+                return self._replays
+            replays = []
+            for path in sorted(self.replay_dir.glob("*_response.json")):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    if data.get("response"):
+                        replays.append(data)
+                except (OSError, json.JSONDecodeError):
+                    continue
+            logger.info(f"Fake Gemini backend loaded {len(replays)} replay responses from {self.replay_dir}")
+            self._replays = replays
+            return replays
+
+    def _response_text(self, prompt: str, files: List[Any], rng: random.Random) -> str:
+        """Pick a replayed response for the request, or synthesize an empty valid one."""
+        mode = "jokbo-centric" if "jokbo_pages" in prompt else "lesson-centric"
+        candidates = [r for r in self._load_replays() if r.get("mode") == mode]
+
+        # Prefer dumps recorded for the same files
+        names = {getattr(f, "display_name", "") for f in files}
+        matching = [r for r in candidates
+                    if r.get("files") and all(any(n.endswith(str(x)) for n in names) for x in r["files"])]
+        pool = matching or candidates
+        if pool:
+            return pool[rng.randrange(len(pool))]["response"]
+
+        key = "jokbo_pages" if mode == "jokbo-centric" else "related_slides"
+        return json.dumps({key: []})
+
+
+class FakeGenerativeModel:
+    """GenerativeModel stand-in bound to a fake transport."""
+
+    def __init__(self, transport: "FakeGenAITransport", model_name: Optional[str] = None,
+                 generation_config: Optional[Dict[str, Any]] = None,
+                 cached_content: Optional[str] = None, **_ignored):
+        self.transport = transport
+        self.model_name = model_name or "models/fake-gemini"
+        self._generation_config = generation_config or {}
+        self._cached_content = cached_content
+
+    def generate_content(self, contents: Any, stream: bool = False, **_ignored) -> Any:
+        """
+        Generate a response.
+
+        Args:
+            contents: Prompt and uploaded files
+            stream: Return an iterator of chunks instead of a single response
+        """
+        response = self.transport.service.generate(
+            self.transport.key_fp, self.model_name, contents, cached_content=self._cached_content
+        )
+        if not stream:
+            return response
+        return self._stream(response)
+
+    @staticmethod
+    def _stream(response: FakeResponse, chunk_size: int = 256):
+        text = response._text
+        finish_reason = response.candidates[0].finish_reason if response.candidates else None
+        for start in range(0, len(text), chunk_size):
+            # Pace chunks like a real stream
+            time.sleep(0.001)
+            yield FakeResponse(text[start:start + chunk_size])
+        yield FakeResponse("", finish_reason)
+
+
+class FakeGenAITransport:
+    """In-process replacement for GenAITransport (select with GEMINI_BACKEND=fake)."""
+
+    def __init__(self, api_key: Optional[str] = None, service: Optional[FakeGeminiService] = None):
+        """
+        Initialize the transport.
+
+        Args:
+            api_key: API key the transport acts as (files are scoped per key)
+            service: Fake service holding the shared state (defaults to the global one)
+        """
+        self.api_key = api_key
+        self.key_fp = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+        self.service = service or get_fake_service()
+
+    def bind_model(self, model: Any) -> Any:
+        """Replace a real GenerativeModel with a fake one that keeps its configuration."""
+        if isinstance(model, FakeGenerativeModel) and model.transport is self:
+            return model
+        return FakeGenerativeModel(
+            self,
+            model_name=getattr(model, "model_name", None),
+            generation_config=getattr(model, "_generation_config", None),
+            cached_content=getattr(model, "_cached_content", None)
+        )
+
+    def create_model(self, **model_config) -> Any:
+        """Create a fake model bound to this transport."""
+        model_name = model_config.pop("model_name", None) or model_config.pop("model", None)
+        return FakeGenerativeModel(self, model_name=model_name, **model_config)
+
+    def upload_file(self, file_path: Any, display_name: Optional[str] = None,
+                    mime_type: Optional[str] = None) -> Any:
+        """Upload a file, or bytes or a binary buffer (it starts in PROCESSING)."""
+        if display_name is None:
+            display_name = Path(file_path).name if isinstance(file_path, (str, Path)) else "upload"
+        return self.service.upload(self.key_fp, file_path, display_name, mime_type)
+
+    def get_file(self, file_name: str) -> Any:
+        """Get a file by name."""
+        if "/" not in file_name:
+            file_name = f"files/{file_name}"
+        return self.service.get_file(self.key_fp, file_name)
+
+    def delete_file(self, file_name: str) -> None:
+        """Delete a file by name."""
+        if "/" not in file_name:
+            file_name = f"files/{file_name}"
+        self.service.delete_file(self.key_fp, file_name)
+
+    def list_files(self, page_size: int = 100) -> List[Any]:
+        """List all files uploaded under this key."""
+        return self.service.list_files(self.key_fp)
+
+    def create_cached_content(self, model_name: str, system_instruction: Optional[str] = None,
+                              contents: Optional[List[Any]] = None, ttl_seconds: int = 3600,
+                              display_name: Optional[str] = None) -> Any:
+        """Create a cached context (the files must be ACTIVE uploads of this key)."""
+        return self.service.create_cached_content(
+            self.key_fp, model_name, system_instruction, contents, ttl_seconds, display_name
+        )
+
+    def delete_cached_content(self, name: str) -> None:
+        """Delete a cached context by name."""
+        self.service.delete_cached_content(self.key_fp, name)
+
+    def create_cached_model(self, cached_content: Any,
+                            generation_config: Optional[Dict[str, Any]] = None,
+                            safety_settings: Optional[Any] = None) -> Any:
+        """Create a fake model that runs on top of a cached context."""
+        return FakeGenerativeModel(
+            self,
+            model_name=cached_content.model,
+            generation_config=generation_config,
+            cached_content=cached_content.name
+        )
+
+    def create_batch(self, model: Any, requests: List[Any], display_name: Optional[str] = None) -> str:
+        """Submit (key, content) requests as a batch job."""
+        return self.service.create_batch(
+            self.key_fp, getattr(model, "model_name", "models/fake-gemini"), requests, display_name
+        )
+
+    def get_batch(self, batch_name: str) -> Dict[str, Any]:
+        """Get the state (and, once done, the results) of a batch job."""
+        return self.service.get_batch(self.key_fp, batch_name)
+
+    def cancel_batch(self, batch_name: str) -> None:
+        """Cancel a batch job."""
+        self.service.cancel_batch(self.key_fp, batch_name)
+
+
+# Global fake service instance
+_fake_service: Optional[FakeGeminiService] = None
+_fake_service_lock = threading.Lock()
+
+
+def get_fake_service() -> FakeGeminiService:
+    """
+    Get the global fake Gemini service.
+
+    Returns:
+        Global FakeGeminiService instance
+    """
+    global _fake_service
+
+    with _fake_service_lock:
+        if _fake_service is None:
+            _fake_service = FakeGeminiService()
+            logger.warning("Using the offline fake Gemini backend (GEMINI_BACKEND=fake)")
+    return _fake_service
+
+
+def reset_fake_service(**options) -> FakeGeminiService:
+    """
+    Replace the global fake service (e.g. between benchmark runs).
+
+    Args:
+        options: FakeGeminiService keyword arguments
+
+    Returns:
+        The new service
+    """
+    global _fake_service
+
+    with _fake_service_lock:
+        _fake_service = FakeGeminiService(**options)
+    return _fake_service
@@ -0,0 +1,494 @@
+"""
+Background garbage collector for files uploaded to the Gemini File API.
+Keeps a local index of every upload (name, key, expiry) and deletes files in
+parallel batches off the analysis path, so nothing has to list the account.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.api_core import exceptions as api_exceptions
+
+from .key_state import key_fingerprint
+from .upload_cache import DEFAULT_FILE_TTL, get_global_upload_cache
+from ..utils.config import ProcessingConfig
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def _expiry_timestamp(file: Any) -> float:
+    """Get a file's expiration as an epoch timestamp (48h from now if unknown)."""
+    expiration = getattr(file, "expiration_time", None)
+    if isinstance(expiration, datetime):
+        if expiration.tzinfo is None:
+            expiration = expiration.replace(tzinfo=timezone.utc)
+        return expiration.timestamp()
+    return time.time() + DEFAULT_FILE_TTL.total_seconds()
+
+
+class RemoteFileIndex:
+    """SQLite index of uploaded files, shared by every process on the host."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Initialize the index.
+
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = Path(db_path or ProcessingConfig.FILE_GC_INDEX_PATH)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS remote_files ("
+            "name TEXT PRIMARY KEY, key_fp TEXT NOT NULL, display_name TEXT, "
+            "expires_at REAL NOT NULL, uploaded_at REAL NOT NULL, "
+            "delete_requested INTEGER NOT NULL DEFAULT 0, attempts INTEGER NOT NULL DEFAULT 0, "
+            "released INTEGER NOT NULL DEFAULT 0)"
+        )
+        try:
+            # Indexes created before released uploads were tracked
+            conn.execute("ALTER TABLE remote_files ADD COLUMN released INTEGER NOT NULL DEFAULT 0")
+        except sqlite3.OperationalError:
+            pass
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS remote_files_pending ON remote_files (delete_requested, key_fp)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=10, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def add(self, name: str, key_fp: str, display_name: Optional[str], expires_at: float) -> None:
+        """Record an upload (re-recording an existing file, e.g. a cache hit, keeps its
+        delete state and refreshes its upload time so it isn't swept as an orphan)."""
+        self._connect().execute(
+            "INSERT INTO remote_files (name, key_fp, display_name, expires_at, uploaded_at) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT(name) DO UPDATE SET "
+            "expires_at = excluded.expires_at, uploaded_at = excluded.uploaded_at, released = 0",
+            (name, key_fp, display_name, expires_at, time.time())
+        )
+
+    def request_delete(self, name: str, key_fp: str, display_name: Optional[str] = None,
+                       expires_at: Optional[float] = None) -> None:
+        """Mark a file for deletion, adding it to the index if needed."""
+        self._connect().execute(
+            "INSERT INTO remote_files (name, key_fp, display_name, expires_at, uploaded_at, delete_requested) "
+            "VALUES (?, ?, ?, ?, ?, 1) ON CONFLICT(name) DO UPDATE SET delete_requested = 1",
+            (name, key_fp, display_name, expires_at or time.time() + DEFAULT_FILE_TTL.total_seconds(),
+             time.time())
+        )
+
+    def pending(self, key_fps: Optional[List[str]] = None, limit: int = 1000) -> List[Tuple[str, str, int]]:
+        """
+        Get files waiting to be deleted.
+
+        Args:
+            key_fps: Only return files of these key fingerprints
+            limit: Maximum number of files
+
+        Returns:
+            (name, key_fp, attempts) tuples, fewest attempts first
+        """
+        query = "SELECT name, key_fp, attempts FROM remote_files WHERE delete_requested = 1"
+        params: List[Any] = []
+        if key_fps is not None:
+            if not key_fps:
+                return []
+            query += f" AND key_fp IN ({','.join('?' * len(key_fps))})"
+            params.extend(key_fps)
+        query += " ORDER BY attempts LIMIT ?"
+        params.append(limit)
+        return [tuple(row) for row in self._connect().execute(query, params).fetchall()]
+
+    def mark_released(self, name: str) -> None:
+        """Record that a file kept on the server is no longer used by the run that uploaded it."""
+        self._connect().execute("UPDATE remote_files SET released = 1 WHERE name = ?", (name,))
+
+    def unreleased(self, key_fps: List[str], uploaded_before: float,
+                   limit: int = 1000) -> List[Tuple[str, str]]:
+        """
+        Get live files never marked for deletion that were released after use or
+        uploaded before a cutoff.
+
+        Args:
+            key_fps: Only return files of these key fingerprints
+            uploaded_before: Epoch timestamp files must have been uploaded before
+            limit: Maximum number of files
+
+        Returns:
+            (name, key_fp) tuples, oldest first
+        """
+        if not key_fps:
+            return []
+        query = (f"SELECT name, key_fp FROM remote_files WHERE delete_requested = 0 "
+                 f"AND (released = 1 OR uploaded_at <= ?) AND expires_at > ? "
+                 f"AND key_fp IN ({','.join('?' * len(key_fps))}) ORDER BY uploaded_at LIMIT ?")
+        params: List[Any] = [uploaded_before, time.time(), *key_fps, limit]
+        return [tuple(row) for row in self._connect().execute(query, params).fetchall()]
+
+    def remove(self, names: List[str]) -> None:
+        """Drop files from the index."""
+        if names:
+            self._connect().executemany("DELETE FROM remote_files WHERE name = ?", [(n,) for n in names])
+
+    def record_failure(self, name: str) -> int:
+        """Count a failed delete attempt and return the attempts so far."""
+        conn = self._connect()
+        conn.execute("UPDATE remote_files SET attempts = attempts + 1 WHERE name = ?", (name,))
+        row = conn.execute("SELECT attempts FROM remote_files WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def find_by_display_name(self, display_name: str, key_fp: Optional[str] = None) -> Optional[str]:
+        """Get the newest live file with a display name."""
+        query = ("SELECT name FROM remote_files WHERE display_name = ? AND delete_requested = 0 "
+                 "AND expires_at > ?")
+        params: List[Any] = [display_name, time.time()]
+        if key_fp is not None:
+            query += " AND key_fp = ?"
+            params.append(key_fp)
+        row = self._connect().execute(query + " ORDER BY uploaded_at DESC LIMIT 1", params).fetchone()
+        return row[0] if row else None
+
+    def purge_expired(self) -> int:
+        """Forget files the server has already expired; returns how many were dropped."""
+        cursor = self._connect().execute("DELETE FROM remote_files WHERE expires_at <= ?", (time.time(),))
+        return cursor.rowcount
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get index statistics."""
+        total, pending = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(delete_requested), 0) FROM remote_files"
+        ).fetchone()
+        return {"files": total, "pending_deletes": pending}
+
+
+class FileGarbageCollector:
+    """Owns the lifecycle of uploaded files and deletes them in the background."""
+
+    def __init__(self, index: RemoteFileIndex, workers: Optional[int] = None,
+                 batch_size: Optional[int] = None, max_attempts: Optional[int] = None,
+                 interval: Optional[float] = None):
+        """
+        Initialize the collector.
+
+        Args:
+            index: Index of uploaded files
+            workers: Parallel delete requests
+            batch_size: Files deleted per pass
+            max_attempts: Delete attempts before a file is left to expire on its own
+            interval: Seconds between idle passes (expired entries are purged then)
+        """
+        cfg = ProcessingConfig
+        self.index = index
+        self.workers = workers or cfg.FILE_GC_WORKERS
+        self.batch_size = batch_size or cfg.FILE_GC_BATCH_SIZE
+        self.max_attempts = max_attempts or cfg.FILE_GC_MAX_ATTEMPTS
+        self.interval = interval or cfg.FILE_GC_INTERVAL
+
+        # Raw keys never reach the index; deletes need a live transport for the key
+        self._transports: Dict[str, Any] = {}
+        # Scheduled deletes not yet finished: file name -> owner that scheduled it
+        self._outstanding: Dict[str, Any] = {}
+        self._deleted = 0
+        self._failed = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._wake = threading.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _key_fp(transport: Any) -> str:
+        """Fingerprint the key a transport acts as (the global key when it has none)."""
+        return key_fingerprint(getattr(transport, "api_key", None) or os.getenv('GEMINI_API_KEY') or "")
+
+    def register(self, file: Any, transport: Any) -> None:
+        """
+        Record an uploaded file and the transport (API key) it belongs to.
+
+        Args:
+            file: Uploaded file object
+            transport: Transport the file was uploaded with
+        """
+        key_fp = self._key_fp(transport)
+        with self._lock:
+            self._transports.setdefault(key_fp, transport)
+        try:
+            self.index.add(file.name, key_fp, getattr(file, "display_name", None), _expiry_timestamp(file))
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to index upload {file.name}: {str(e)}")
+        # Idle passes sweep what earlier runs with this key left behind
+        self._ensure_started()
+
+    def schedule(self, file: Any, transport: Any, owner: Any = None) -> None:
+        """
+        Queue a file for deletion without blocking.
+
+        Args:
+            file: Uploaded file object
+            transport: Transport the file was uploaded with
+            owner: Caller the delete belongs to, so flush(owner=...) waits only for its own
+        """
+        key_fp = self._key_fp(transport)
+        with self._lock:
+            self._transports.setdefault(key_fp, transport)
+        try:
+            self.index.request_delete(file.name, key_fp, getattr(file, "display_name", None),
+                                      _expiry_timestamp(file))
+        except sqlite3.Error as e:
+            # Without the index, delete inline rather than leak the file
+            logger.warning(f"Failed to queue delete of {file.name}, deleting inline: {str(e)}")
+            error = self._delete_one(transport, file.name)
+            if error is not None:
+                logger.warning(f"Failed to delete {file.name}: {error}")
+            return
+        # Only once indexed, so a pass that finds nothing pending can settle the set
+        with self._lock:
+            self._outstanding[file.name] = owner
+        logger.debug(f"Scheduled delete: {getattr(file, 'display_name', file.name)}")
+        self._ensure_started()
+        self._wake.set()
+
+    def release_retained(self, file: Any) -> None:
+        """
+        Record that a file the upload cache retains is no longer in use.
+
+        Idle passes delete it once the cache stops retaining it (eviction or expiry).
+
+        Args:
+            file: Uploaded file object
+        """
+        try:
+            self.index.mark_released(file.name)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to mark {file.name} released: {str(e)}")
+
+    def find_file_name(self, display_name: str, transport: Optional[Any] = None) -> Optional[str]:
+        """
+        Look up an indexed live upload by display name (no remote listing).
+
+        Args:
+            display_name: Display name to search for
+            transport: Restrict the search to this transport's key
+
+        Returns:
+            Remote file name, or None if not indexed
+        """
+        key_fp = self._key_fp(transport) if transport is not None else None
+        try:
+            return self.index.find_by_display_name(display_name, key_fp)
+        except sqlite3.Error as e:
+            logger.warning(f"File index lookup failed: {str(e)}")
+            return None
+
+    def flush(self, timeout: Optional[float] = None, owner: Any = None) -> bool:
+        """
+        Wait until scheduled deletes have been attempted to completion.
+
+        Args:
+            timeout: Maximum seconds to wait (None waits indefinitely)
+            owner: Only wait for deletes scheduled by this owner (None waits for
+                every delete scheduled by this process)
+
+        Returns:
+            True if nothing (of the owner's) is outstanding
+        """
+        def waiting() -> bool:
+            if owner is None:
+                return bool(self._outstanding)
+            return any(o is owner for o in self._outstanding.values())
+
+        with self._lock:
+            if waiting():
+                self._wake.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while waiting():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining if remaining is not None else 1.0)
+        return True
+
+    def pending_count(self) -> int:
+        """Get the number of deletes scheduled by this process that are still outstanding."""
+        with self._lock:
+            return len(self._outstanding)
+
+    def collect(self) -> int:
+        """
+        Run one deletion pass over files whose key has a live transport.
+
+        Returns:
+            Number of files deleted
+        """
+        with self._lock:
+            transports = dict(self._transports)
+        try:
+            batch = self.index.pending(list(transports), limit=self.batch_size)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read pending deletes: {str(e)}")
+            return 0
+        if not batch:
+            # Anything still outstanding was collected by another process
+            with self._idle:
+                if self._outstanding:
+                    self._outstanding.clear()
+                    self._idle.notify_all()
+            return 0
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="gemini-file-gc")
+        futures = [
+            (name, self._executor.submit(self._delete_one, transports[key_fp], name))
+            for name, key_fp, _ in batch
+        ]
+
+        done: List[str] = []
+        for name, future in futures:
+            error = future.result()
+            if error is None:
+                done.append(name)
+                continue
+            attempts = self.index.record_failure(name)
+            if attempts >= self.max_attempts:
+                logger.error(f"Giving up deleting {name} after {attempts} attempts "
+                             f"(it expires on its own): {error}")
+                done.append(name)
+                with self._lock:
+                    self._failed += 1
+            else:
+                logger.warning(f"Failed to delete {name} (attempt {attempts}/{self.max_attempts}): {error}")
+
+        self.index.remove(done)
+        deleted = len(done)
+        with self._idle:
+            for name in done:
+                self._outstanding.pop(name, None)
+            self._deleted += deleted
+            self._idle.notify_all()
+        logger.info(f"Deleted {deleted}/{len(batch)} uploaded files")
+        return deleted
+
+    def sweep_orphans(self) -> int:
+        """
+        Queue deletes for uploads nobody holds any more.
+
+        That is released files the upload cache no longer retains, and files
+        older than FILE_GC_ORPHAN_AGE_HOURS such as those of a crashed run. Only
+        files whose key has a live transport are considered; files retained by
+        the upload cache are kept.
+
+        Returns:
+            Number of files queued for deletion
+        """
+        with self._lock:
+            key_fps = list(self._transports)
+        cutoff = time.time() - ProcessingConfig.FILE_GC_ORPHAN_AGE_HOURS * 3600
+        try:
+            orphans = self.index.unreleased(key_fps, cutoff)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read unreleased uploads: {str(e)}")
+            return 0
+
+        upload_cache = get_global_upload_cache()
+        queued = 0
+        for name, key_fp in orphans:
+            if upload_cache is not None and upload_cache.is_cached_name(name):
+                continue
+            self.index.request_delete(name, key_fp)
+            with self._lock:
+                self._outstanding[name] = None
+            queued += 1
+        if queued:
+            logger.info(f"Queued {queued} orphaned uploads for deletion")
+        return queued
+
+    @staticmethod
+    def _delete_one(transport: Any, name: str) -> Optional[str]:
+        """Delete a file, returning an error message or None (already-gone files count as deleted)."""
+        try:
+            transport.delete_file(name)
+        except api_exceptions.NotFound:
+            pass
+        except Exception as e:
+            return str(e)
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get collector statistics."""
+        with self._lock:
+            stats = {"deleted": self._deleted, "gave_up": self._failed, "outstanding": len(self._outstanding)}
+        try:
+            stats.update(self.index.get_stats())
+        except sqlite3.Error:
+            pass
+        return stats
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="gemini-file-gc", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                deleted = self.collect()
+                if self.pending_count():
+                    # More queued (or retrying): keep going, backing off while nothing succeeds;
+                    # newly scheduled deletes cut the backoff short
+                    backoff = 1.0 if deleted else min(backoff * 2, self.interval)
+                    if not deleted:
+                        self._wake.wait(backoff)
+                    self._wake.set()
+                else:
+                    backoff = 1.0
+                    self.index.purge_expired()
+                    if self.sweep_orphans():
+                        self._wake.set()
+            except Exception as e:
+                logger.warning(f"File GC pass failed: {str(e)}")
+
+
+# Global collector instance
+_global_file_gc: Optional[FileGarbageCollector] = None
+_file_gc_lock = threading.Lock()
+
+
+def get_file_gc() -> FileGarbageCollector:
+    """
+    Get the global file garbage collector.
+
+    Returns:
+        Global FileGarbageCollector instance
+    """
+    global _global_file_gc
+
+    with _file_gc_lock:
+        if _global_file_gc is None:
+            db_path = Path(ProcessingConfig.FILE_GC_INDEX_PATH)
+            if ProcessingConfig.GEMINI_BACKEND == "fake":
+                # Fake uploads must never be deleted with real keys
+                db_path = db_path.with_name(f"{db_path.stem}.fake{db_path.suffix}")
+            _global_file_gc = FileGarbageCollector(RemoteFileIndex(str(db_path)))
+            logger.info(f"Created file GC with index at {db_path}")
+    return _global_file_gc
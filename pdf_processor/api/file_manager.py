@@ -4,10 +4,13 @@ Provides centralized file operations with proper cleanup and tracking.
 """
 
 import time
-from typing import List, Optional, Set, Any
+import threading
+from typing import List, Optional, Set, Any, Dict
 from datetime import datetime
-import google.generativeai as genai
 
+from .file_gc import FileGarbageCollector, get_file_gc
+from .transport import GenAITransport, create_transport
+from .upload_cache import get_global_upload_cache
 from ..utils.logging import get_logger
 
 logger = get_logger(__name__)
@@ -16,20 +19,37 @@ logger = get_logger(__name__)
 class FileManager:
     """Manages file uploads and cleanup for Gemini API."""
     
-    def __init__(self):
-        """Initialize the file manager."""
+    def __init__(self, api_client: Optional[Any] = None, file_gc: Optional[FileGarbageCollector] = None):
+        """
+        Initialize the file manager.
+        
+        Args:
+            api_client: Optional API client whose key is used for listing and
+                deleting files that were tracked without an explicit transport
+            file_gc: Garbage collector deleting the files (defaults to the global one)
+        """
         self.uploaded_files: List[Any] = []
         self._tracked_files: Set[str] = set()
+        self._file_transports: Dict[str, GenAITransport] = {}
+        self.transport = api_client.transport if api_client is not None else create_transport()
+        self.file_gc = file_gc or get_file_gc()
+        self._lock = threading.Lock()
         
-    def track_file(self, file: Any) -> None:
+    def track_file(self, file: Any, transport: Optional[GenAITransport] = None) -> None:
         """
         Track an uploaded file for cleanup.
         
         Args:
             file: File object to track
+            transport: Transport (API key) the file was uploaded with
         """
-        self.uploaded_files.append(file)
-        self._tracked_files.add(file.name)
+        with self._lock:
+            if file.name not in self._tracked_files:
+                self.uploaded_files.append(file)
+                self._tracked_files.add(file.name)
+            if transport is not None:
+                self._file_transports[file.name] = transport
+        self.file_gc.register(file, transport or self.transport)
         logger.debug(f"Tracking file: {file.display_name}")
         
     def untrack_file(self, file: Any) -> None:
@@ -39,40 +59,114 @@ class FileManager:
         Args:
             file: File object to untrack
         """
-        if file in self.uploaded_files:
-            self.uploaded_files.remove(file)
-        self._tracked_files.discard(file.name)
+        with self._lock:
+            self.uploaded_files = [f for f in self.uploaded_files if f.name != file.name]
+            self._tracked_files.discard(file.name)
+            self._file_transports.pop(file.name, None)
         logger.debug(f"Untracked file: {file.display_name}")
     
-    def list_uploaded_files(self) -> List[Any]:
+    def _transport_for(self, file: Any) -> GenAITransport:
+        """Get the transport a tracked file was uploaded with."""
+        with self._lock:
+            return self._file_transports.get(file.name, self.transport)
+    
+    def is_tracked(self, file: Any) -> bool:
+        """
+        Check whether a file is still tracked by this manager.
+        
+        Args:
+            file: File object to check
+            
+        Returns:
+            True if the file is tracked
+        """
+        with self._lock:
+            return file.name in self._tracked_files
+    
+    def schedule_delete(self, file: Any) -> bool:
+        """
+        Hand a file to the garbage collector instead of blocking the caller.
+        
+        Files owned by the upload cache are untracked but kept on the server
+        until they expire or the cache evicts them.
+        
+        Args:
+            file: File object to delete
+            
+        Returns:
+            True if the file was queued for deletion, False if it is retained
+        """
+        upload_cache = get_global_upload_cache()
+        if upload_cache is not None:
+            if upload_cache.is_cached_name(file.name):
+                logger.debug(f"Retaining cached upload: {file.display_name}")
+                self.untrack_file(file)
+                self.file_gc.release_retained(file)
+                return False
+            upload_cache.invalidate_name(file.name)
+        
+        transport = self._transport_for(file)
+        self.untrack_file(file)
+        self.file_gc.schedule(file, transport, owner=self)
+        return True
+    
+    def flush_deletes(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the background deletes scheduled by this manager to finish.
+        
+        Args:
+            timeout: Maximum seconds to wait (None waits until done)
+            
+        Returns:
+            True if no deletes are outstanding
+        """
+        return self.file_gc.flush(timeout, owner=self)
+    
+    def list_uploaded_files(self, transport: Optional[GenAITransport] = None) -> List[Any]:
         """
         List all uploaded files in the account.
         
+        Args:
+            transport: Transport (API key) to list with; defaults to this manager's
+            
         Returns:
             List of uploaded files
         """
         try:
-            files = list(genai.list_files())
+            files = (transport or self.transport).list_files()
             logger.info(f"Found {len(files)} uploaded files")
             return files
         except Exception as e:
             logger.error(f"Failed to list files: {str(e)}")
             return []
     
-    def delete_file_safe(self, file: Any, max_retries: int = 3) -> bool:
+    def delete_file_safe(self, file: Any, max_retries: int = 3, force: bool = False) -> bool:
         """
         Safely delete a file with retry logic.
         
+        Files owned by the upload cache are untracked but kept on the server
+        until they expire or the cache evicts them, unless force is set.
+        
         Args:
             file: File object to delete
             max_retries: Maximum number of retry attempts
+            force: Delete even if the file is in the upload cache
             
         Returns:
             True if deletion successful, False otherwise
         """
+        upload_cache = get_global_upload_cache()
+        if upload_cache is not None:
+            if not force and upload_cache.is_cached_name(file.name):
+                logger.debug(f"Retaining cached upload: {file.display_name}")
+                self.untrack_file(file)
+                self.file_gc.release_retained(file)
+                return True
+            upload_cache.invalidate_name(file.name)
+        
         for attempt in range(max_retries):
             try:
-                genai.delete_file(file.name)
+                self._transport_for(file).delete_file(file.name)
                 logger.info(f"Deleted file: {file.display_name}")
                 self.untrack_file(file)
                 return True
@@ -86,38 +180,42 @@ class FileManager:
     
     def delete_all_uploaded_files(self) -> int:
         """
-        Delete all uploaded files from the account.
+        Delete all files uploaded through this manager.
         
         Returns:
             Number of files deleted
         """
         # Only delete files that were tracked by this manager (uploaded by this client)
-        files = [f for f in self.list_uploaded_files() if f.name in self._tracked_files]
+        with self._lock:
+            files = list(self.uploaded_files)
         if not files:
             logger.info("No files to delete")
             return 0
             
-        deleted_count = 0
         logger.info(f"Deleting {len(files)} files...")
+        deleted_count = sum(1 for file in files if self.schedule_delete(file))
+        self.flush_deletes()
         
-        for file in files:
-            if self.delete_file_safe(file):
-                deleted_count += 1
-                
         logger.info(f"Deleted {deleted_count}/{len(files)} files")
         return deleted_count
     
-    def cleanup_tracked_files(self) -> None:
-        """Clean up all tracked files."""
-        if not self.uploaded_files:
+    def cleanup_tracked_files(self, wait: bool = True) -> None:
+        """
+        Clean up all tracked files.
+        
+        Args:
+            wait: Wait for the garbage collector to finish the deletes
+        """
+        with self._lock:
+            files = list(self.uploaded_files)
+        if not files:
             return
             
-        logger.info(f"Cleaning up {len(self.uploaded_files)} tracked files")
-        for file in self.uploaded_files[:]:  # Copy list to avoid modification during iteration
-            self.delete_file_safe(file)
-            
-        self.uploaded_files.clear()
-        self._tracked_files.clear()
+        logger.info(f"Cleaning up {len(files)} tracked files")
+        for file in files:
+            self.schedule_delete(file)
+        if wait:
+            self.flush_deletes()
     
     def cleanup_except_center_file(self, center_file_display_name: str) -> None:
         """
@@ -128,10 +226,11 @@ class FileManager:
         """
         try:
             # Only consider files uploaded by this FileManager instance
-            files = [f for f in self.list_uploaded_files() if f.name in self._tracked_files]
+            with self._lock:
+                files = list(self.uploaded_files)
             for file in files:
                 if file.display_name != center_file_display_name:
-                    self.delete_file_safe(file)
+                    self.schedule_delete(file)
                 else:
                     logger.info(f"Keeping center file: {center_file_display_name}")
         except Exception as e:
@@ -141,17 +240,28 @@ class FileManager:
         """
         Find a file by its display name.
         
+        Tracked files are checked first, then the garbage collector's upload
+        index; the account is never listed.
+        
         Args:
             display_name: Display name to search for
             
         Returns:
             File object if found, None otherwise
         """
-        files = self.list_uploaded_files()
-        for file in files:
-            if file.display_name == display_name:
-                return file
-        return None
+        with self._lock:
+            for file in self.uploaded_files:
+                if file.display_name == display_name:
+                    return file
+        
+        name = self.file_gc.find_file_name(display_name, self.transport)
+        if name is None:
+            return None
+        try:
+            return self.transport.get_file(name)
+        except Exception as e:
+            logger.debug(f"Indexed file {name} is no longer available: {str(e)}")
+            return None
     
     def get_tracked_file_count(self) -> int:
         """
@@ -160,10 +270,11 @@ class FileManager:
         Returns:
             Number of tracked files
         """
-        return len(self.uploaded_files)
+        with self._lock:
+            return len(self.uploaded_files)
     
     def __del__(self):
         """Clean up tracked files when object is destroyed."""
         if hasattr(self, 'uploaded_files') and self.uploaded_files:
-            logger.warning("FileManager being destroyed with tracked files, attempting cleanup")
-            self.cleanup_tracked_files()
\ No newline at end of file
+            logger.warning("FileManager being destroyed with tracked files, scheduling cleanup")
+            self.cleanup_tracked_files(wait=False)
\ No newline at end of file
@@ -0,0 +1,320 @@
+"""
+Cross-process API key health state.
+Shares cooldowns, rate-limit pauses, failure counters and per-minute usage
+between every MultiAPIManager (and every worker process) through a
+pluggable backend: in-memory, SQLite on local disk, or Redis.
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils.config import ProcessingConfig
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Fingerprint an API key so raw keys never leave the process."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def current_window(now: Optional[float] = None) -> int:
+    """Get the index of the current one-minute usage window."""
+    return int((now if now is not None else time.time()) // 60)
+
+
+class KeyStateBackend(ABC):
+    """Storage for shared key health and usage."""
+
+    @abstractmethod
+    def load(self, fingerprints: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Load the state of several keys (missing keys are omitted)."""
+        pass
+
+    @abstractmethod
+    def save(self, fingerprint: str, fields: Dict[str, Any]) -> None:
+        """Merge fields into a key's state."""
+        pass
+
+    @abstractmethod
+    def add_usage(self, fingerprint: str, requests: int, tokens: int,
+                  window: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Add usage to a key's current window.
+
+        Returns:
+            (requests, tokens) used in the window after the update
+        """
+        pass
+
+    @abstractmethod
+    def get_usage(self, fingerprint: str, window: Optional[int] = None) -> Tuple[int, int]:
+        """Get (requests, tokens) used by a key in a window."""
+        pass
+
+
+class InMemoryKeyStateBackend(KeyStateBackend):
+    """Process-local backend (state is not shared between processes)."""
+
+    def __init__(self):
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._usage: Dict[Tuple[str, int], Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, fingerprints: List[str]) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {fp: dict(self._state[fp]) for fp in fingerprints if fp in self._state}
+
+    def save(self, fingerprint: str, fields: Dict[str, Any]) -> None:
+        with self._lock:
+            self._state.setdefault(fingerprint, {}).update(fields)
+
+    def add_usage(self, fingerprint: str, requests: int, tokens: int,
+                  window: Optional[int] = None) -> Tuple[int, int]:
+        window = current_window() if window is None else window
+        with self._lock:
+            used_requests, used_tokens = self._usage.get((fingerprint, window), (0, 0))
+            totals = (used_requests + requests, used_tokens + tokens)
+            self._usage[(fingerprint, window)] = totals
+            # Drop old windows
+            for key in [k for k in self._usage if k[1] < window - 1]:
+                del self._usage[key]
+            return totals
+
+    def get_usage(self, fingerprint: str, window: Optional[int] = None) -> Tuple[int, int]:
+        window = current_window() if window is None else window
+        with self._lock:
+            return self._usage.get((fingerprint, window), (0, 0))
+
+
+class SQLiteKeyStateBackend(KeyStateBackend):
+    """SQLite backend shared by all processes on one machine."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Initialize the backend.
+
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = Path(db_path or ProcessingConfig.KEY_STATE_PATH)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS key_state ("
+                "fingerprint TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS key_usage ("
+                "fingerprint TEXT NOT NULL, window INTEGER NOT NULL, "
+                "requests INTEGER NOT NULL DEFAULT 0, tokens INTEGER NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (fingerprint, window))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=10, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def load(self, fingerprints: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not fingerprints:
+            return {}
+        placeholders = ",".join("?" for _ in fingerprints)
+        rows = self._connect().execute(
+            f"SELECT fingerprint, data FROM key_state WHERE fingerprint IN ({placeholders})",
+            list(fingerprints)
+        ).fetchall()
+        return {fp: json.loads(data) for fp, data in rows}
+
+    def save(self, fingerprint: str, fields: Dict[str, Any]) -> None:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT data FROM key_state WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+            data = json.loads(row[0]) if row else {}
+            data.update(fields)
+            conn.execute(
+                "INSERT OR REPLACE INTO key_state (fingerprint, data, updated_at) VALUES (?, ?, ?)",
+                (fingerprint, json.dumps(data, ensure_ascii=False), time.time())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def add_usage(self, fingerprint: str, requests: int, tokens: int,
+                  window: Optional[int] = None) -> Tuple[int, int]:
+        window = current_window() if window is None else window
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO key_usage (fingerprint, window, requests, tokens) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(fingerprint, window) DO UPDATE SET "
+                "requests = requests + excluded.requests, tokens = tokens + excluded.tokens",
+                (fingerprint, window, requests, tokens)
+            )
+            conn.execute("DELETE FROM key_usage WHERE window < ?", (window - 1,))
+            row = conn.execute(
+                "SELECT requests, tokens FROM key_usage WHERE fingerprint = ? AND window = ?",
+                (fingerprint, window)
+            ).fetchone()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return (row[0], row[1]) if row else (0, 0)
+
+    def get_usage(self, fingerprint: str, window: Optional[int] = None) -> Tuple[int, int]:
+        window = current_window() if window is None else window
+        row = self._connect().execute(
+            "SELECT requests, tokens FROM key_usage WHERE fingerprint = ? AND window = ?",
+            (fingerprint, window)
+        ).fetchone()
+        return (row[0], row[1]) if row else (0, 0)
+
+
+class RedisKeyStateBackend(KeyStateBackend):
+    """Redis backend shared by every worker in the cluster."""
+
+    def __init__(self, url: Optional[str] = None, prefix: str = "jokbodude:keystate"):
+        """
+        Initialize the backend.
+
+        Args:
+            url: Redis URL (defaults to KEY_STATE_REDIS_URL / REDIS_URL)
+            prefix: Namespace for all keys written by this backend
+        """
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("The redis package is required for the Redis key-state backend") from e
+
+        self.url = url or ProcessingConfig.KEY_STATE_REDIS_URL
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(self.url, decode_responses=True, socket_connect_timeout=5)
+
+    def ping(self) -> None:
+        """Check that the server is reachable (the client only connects on first use)."""
+        self._redis.ping()
+
+    def _state_key(self, fingerprint: str) -> str:
+        return f"{self.prefix}:state:{fingerprint}"
+
+    def _usage_key(self, fingerprint: str, window: int) -> str:
+        return f"{self.prefix}:usage:{fingerprint}:{window}"
+
+    def load(self, fingerprints: List[str]) -> Dict[str, Dict[str, Any]]:
+        pipe = self._redis.pipeline()
+        for fp in fingerprints:
+            pipe.hgetall(self._state_key(fp))
+        result = {}
+        for fp, raw in zip(fingerprints, pipe.execute()):
+            if raw:
+                result[fp] = {k: json.loads(v) for k, v in raw.items()}
+        return result
+
+    def save(self, fingerprint: str, fields: Dict[str, Any]) -> None:
+        key = self._state_key(fingerprint)
+        pipe = self._redis.pipeline()
+        pipe.hset(key, mapping={k: json.dumps(v, ensure_ascii=False) for k, v in fields.items()})
+        pipe.expire(key, ProcessingConfig.KEY_STATE_TTL_SECONDS)
+        pipe.execute()
+
+    def add_usage(self, fingerprint: str, requests: int, tokens: int,
+                  window: Optional[int] = None) -> Tuple[int, int]:
+        window = current_window() if window is None else window
+        key = self._usage_key(fingerprint, window)
+        pipe = self._redis.pipeline()
+        pipe.hincrby(key, "requests", requests)
+        pipe.hincrby(key, "tokens", tokens)
+        pipe.expire(key, 120)
+        used_requests, used_tokens, _ = pipe.execute()
+        return int(used_requests), int(used_tokens)
+
+    def get_usage(self, fingerprint: str, window: Optional[int] = None) -> Tuple[int, int]:
+        window = current_window() if window is None else window
+        raw = self._redis.hgetall(self._usage_key(fingerprint, window))
+        return int(raw.get("requests", 0)), int(raw.get("tokens", 0))
+
+
+# Global backend instance
+_global_backend: Optional[KeyStateBackend] = None
+_backend_lock = threading.Lock()
+
+
+def create_key_state_backend(kind: Optional[str] = None) -> KeyStateBackend:
+    """
+    Create a key-state backend.
+
+    With the fake API backend, state always goes to a separate SQLite file
+    (never the configured Redis), so injected errors can't pause or throttle
+    the real keys.
+
+    Args:
+        kind: "memory", "sqlite", "redis" or "auto" (Redis when a URL is configured
+            and the redis package is installed, otherwise SQLite)
+
+    Returns:
+        KeyStateBackend instance
+    """
+    kind = (kind or ProcessingConfig.KEY_STATE_BACKEND).lower()
+
+    if ProcessingConfig.GEMINI_BACKEND == "fake" and kind != "memory":
+        # Fake keys share fingerprints with real ones; keep their state apart
+        db_path = Path(ProcessingConfig.KEY_STATE_PATH)
+        return SQLiteKeyStateBackend(str(db_path.with_name(f"{db_path.stem}.fake{db_path.suffix}")))
+
+    if kind == "auto":
+        kind = "redis" if ProcessingConfig.KEY_STATE_REDIS_URL else "sqlite"
+        if kind == "redis":
+            try:
+                backend = RedisKeyStateBackend()
+                backend.ping()
+                return backend
+            except Exception as e:
+                logger.warning(f"Redis key-state backend unavailable, falling back to SQLite: {str(e)}")
+                kind = "sqlite"
+
+    if kind == "memory":
+        return InMemoryKeyStateBackend()
+    if kind == "redis":
+        return RedisKeyStateBackend()
+    if kind == "sqlite":
+        return SQLiteKeyStateBackend()
+    raise ValueError(f"Unknown key-state backend: {kind}")
+
+
+def get_key_state_backend() -> KeyStateBackend:
+    """
+    Get the global key-state backend instance.
+
+    Returns:
+        Global KeyStateBackend instance
+    """
+    global _global_backend
+
+    with _backend_lock:
+        if _global_backend is None:
+            try:
+                _global_backend = create_key_state_backend()
+            except Exception as e:
+                logger.warning(f"Shared key state unavailable, using in-memory state: {str(e)}")
+                _global_backend = InMemoryKeyStateBackend()
+            logger.info(f"Using {type(_global_backend).__name__} for API key state")
+
+    return _global_backend
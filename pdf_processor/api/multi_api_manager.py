@@ -5,12 +5,17 @@ Provides load balancing, failure tracking, and automatic failover.
 
 import time
 import random
-from typing import List, Dict, Any, Optional, Callable
+from typing import List, Dict, Any, Optional, Callable, Tuple
 from datetime import datetime, timedelta
 import threading
-import google.generativeai as genai
+from collections import deque
 
 from .client import GeminiAPIClient
+from .transport import create_transport
+from .rate_limiter import KeyRateLimiter, get_default_limits, parse_retry_after
+from .key_state import KeyStateBackend, get_key_state_backend, key_fingerprint, current_window
+from .scheduler import TaskScheduler
+from ..utils.config import ProcessingConfig
 from ..utils.logging import get_logger
 from ..utils.exceptions import APIError, ContentGenerationError
 
@@ -23,6 +28,7 @@ class APIKeyStatus:
     def __init__(self, api_key: str, index: int):
         self.api_key = api_key
         self.index = index
+        self.fingerprint = key_fingerprint(api_key)
         self.is_available = True
         self.consecutive_failures = 0
         self.total_requests = 0
@@ -30,13 +36,90 @@ class APIKeyStatus:
         self.last_used = None
         self.cooldown_until = None
         self.last_error = None
+        self.consecutive_rate_limits = 0
+        self.total_rate_limits = 0
+        
+        # Live load signals
+        self.in_flight = 0
+        self.ewma_latency: Optional[float] = None
+        self._recent_outcomes: deque = deque()  # (timestamp, was_rate_limited)
+    
+    def begin_request(self):
+        """Mark a request as dispatched to this key."""
+        self.in_flight += 1
+    
+    def end_request(self, latency: Optional[float] = None, rate_limited: bool = False):
+        """
+        Mark a request as finished and fold its latency into the EWMA.
+        
+        Args:
+            latency: Request duration in seconds (None if it failed without a useful timing)
+            rate_limited: Whether the request was rejected with a 429
+        """
+        self.in_flight = max(0, self.in_flight - 1)
+        if latency is not None:
+            alpha = ProcessingConfig.LATENCY_EWMA_ALPHA
+            if self.ewma_latency is None:
+                self.ewma_latency = latency
+            else:
+                self.ewma_latency = alpha * latency + (1 - alpha) * self.ewma_latency
+        
+        now = time.monotonic()
+        self._recent_outcomes.append((now, rate_limited))
+        self._prune_outcomes(now)
+    
+    def _prune_outcomes(self, now: float):
+        window = ProcessingConfig.RATE_LIMIT_WINDOW_SECONDS
+        while self._recent_outcomes and now - self._recent_outcomes[0][0] > window:
+            self._recent_outcomes.popleft()
+    
+    def get_recent_rate_limit_ratio(self) -> float:
+        """Get the fraction of recent requests rejected with 429."""
+        self._prune_outcomes(time.monotonic())
+        if not self._recent_outcomes:
+            return 0.0
+        return sum(1 for _, limited in self._recent_outcomes if limited) / len(self._recent_outcomes)
+    
+    def get_load_score(self, default_latency: float) -> float:
+        """
+        Estimate how long a new request would take on this key (lower is better).
+        
+        Combines outstanding requests, smoothed latency and recent 429 rate.
+        
+        Args:
+            default_latency: Latency assumed for keys without observations
+        """
+        latency = self.ewma_latency if self.ewma_latency is not None else default_latency
+        penalty = 1 + ProcessingConfig.RATE_LIMIT_SCORE_PENALTY * self.get_recent_rate_limit_ratio()
+        return (self.in_flight + 1) * latency * penalty
         
     def record_success(self):
         """Record a successful API call."""
         self.total_requests += 1
         self.consecutive_failures = 0
+        self.consecutive_rate_limits = 0
         self.last_used = datetime.now()
         self.last_error = None
+    
+    def record_rate_limited(self, error: str):
+        """
+        Record a 429 response.
+        
+        Rate limits are handled by pausing the key's limiter rather than the
+        10-minute failure cooldown, unless they keep recurring (e.g. a daily quota).
+        """
+        self.total_requests += 1
+        self.total_failures += 1
+        self.total_rate_limits += 1
+        self.consecutive_rate_limits += 1
+        self.last_used = datetime.now()
+        self.last_error = error
+        
+        if self.consecutive_rate_limits >= ProcessingConfig.MAX_CONSECUTIVE_RATE_LIMITS:
+            self.cooldown_until = datetime.now() + timedelta(minutes=10)
+            self.is_available = False
+            logger.warning(f"API key {self.index} keeps hitting rate limits, "
+                           f"entering cooldown until {self.cooldown_until}")
         
     def record_failure(self, error: str):
         """Record a failed API call."""
@@ -52,6 +135,43 @@ class APIKeyStatus:
             self.is_available = False
             logger.warning(f"API key {self.index} entering cooldown until {self.cooldown_until}")
     
+    def to_shared_state(self) -> Dict[str, Any]:
+        """Get the fields of this key's health shared with other processes."""
+        return {
+            "cooldown_until": self.cooldown_until.timestamp() if self.cooldown_until else None,
+            "consecutive_failures": self.consecutive_failures,
+            "consecutive_rate_limits": self.consecutive_rate_limits,
+            "last_error": self.last_error
+        }
+    
+    def apply_shared_state(self, state: Dict[str, Any]):
+        """
+        Merge health state published by other processes.
+        
+        Cooldowns are adopted if they end later than the local one; failure
+        counters take the larger of the local and shared values.
+        
+        Args:
+            state: Shared state as returned by the key-state backend
+        """
+        cooldown = state.get("cooldown_until")
+        if cooldown and cooldown <= time.time():
+            # Counters from before an expired cooldown are stale
+            return
+        if cooldown:
+            shared_until = datetime.fromtimestamp(cooldown)
+            if self.cooldown_until is None or shared_until > self.cooldown_until:
+                if self.cooldown_until is None:
+                    logger.warning(f"API key {self.index} is cooling down in another worker "
+                                   f"until {shared_until}")
+                self.cooldown_until = shared_until
+                self.is_available = False
+                self.last_error = state.get("last_error") or self.last_error
+        
+        self.consecutive_failures = max(self.consecutive_failures, state.get("consecutive_failures") or 0)
+        self.consecutive_rate_limits = max(self.consecutive_rate_limits,
+                                           state.get("consecutive_rate_limits") or 0)
+    
     def check_availability(self) -> bool:
         """Check if the API key is available for use."""
         if self.cooldown_until and datetime.now() < self.cooldown_until:
@@ -76,13 +196,17 @@ class APIKeyStatus:
 class MultiAPIManager:
     """Manages multiple API keys with load balancing and failover."""
     
-    def __init__(self, api_keys: List[str], model_config: Dict[str, Any]):
+    def __init__(self, api_keys: List[str], model_config: Dict[str, Any],
+                 rate_limits: Optional[List[Tuple[int, int]]] = None,
+                 key_state: Optional[KeyStateBackend] = None):
         """
         Initialize the multi-API manager.
         
         Args:
             api_keys: List of Gemini API keys
             model_config: Configuration for the Gemini model
+            rate_limits: Optional (rpm, tpm) per key; defaults to the model's limits
+            key_state: Backend sharing key health across processes (defaults to the global one)
         """
         self.api_keys = api_keys
         self.model_config = model_config
@@ -90,6 +214,22 @@ class MultiAPIManager:
         self.current_index = 0
         self._lock = threading.Lock()
         
+        # Durations of recent successful operations across all keys
+        self._latencies: deque = deque(maxlen=ProcessingConfig.LATENCY_HISTORY_SIZE)
+        
+        # Proactive per-key budgets
+        default_limits = get_default_limits(model_config.get('model_name'))
+        self.rate_limiters = [
+            KeyRateLimiter(*(rate_limits[i] if rate_limits and i < len(rate_limits) else default_limits))
+            for i in range(len(api_keys))
+        ]
+        
+        # Key health shared with every other manager and worker process
+        self.key_state = key_state if key_state is not None else get_key_state_backend()
+        self._applied_pauses = [0.0] * len(api_keys)
+        self._last_sync = 0.0
+        self._sync_shared_state(force=True)
+        
         # Create API clients for each key
         self.api_clients = []
         self.models = []
@@ -101,75 +241,314 @@ class MultiAPIManager:
             pass
 
         for i, api_key in enumerate(api_keys):
-            # Configure API for this key
-            genai.configure(api_key=api_key)
+            # Each key gets isolated SDK clients so parallel threads never share
+            # the process-global genai configuration
+            transport = create_transport(api_key)
             
-            # Create model
-            model = genai.GenerativeModel(**model_config)
+            # Create model bound to this key
+            model = transport.create_model(**model_config)
             self.models.append(model)
             
             # Create API client
-            client = GeminiAPIClient(model, api_key)
+            client = GeminiAPIClient(model, api_key, transport=transport)
             self.api_clients.append(client)
             
         logger.info(f"Initialized MultiAPIManager with {len(api_keys)} API keys")
     
-    def get_next_available_api(self) -> Optional[int]:
+    def get_next_available_api(self, estimated_tokens: Optional[int] = None) -> Optional[int]:
         """
-        Get the next available API index using round-robin with availability checking.
+        Get the available API key expected to finish a new request soonest.
+        
+        Keys are ranked by outstanding requests, EWMA latency and recent 429
+        rate (least-outstanding-requests dispatch); round-robin order breaks ties.
+        When estimated_tokens is given, only keys whose rate-limit budget can take
+        the request are considered, and the budget is reserved for the caller.
+        
+        Args:
+            estimated_tokens: Optional estimated input tokens of the request
         
         Returns:
             API index or None if no APIs available
         """
+        self._sync_shared_state()
         with self._lock:
-            # Try to find an available API starting from current index
-            attempts = 0
-            while attempts < len(self.api_keys):
-                # Check if current API is available
-                if self.api_statuses[self.current_index].check_availability():
-                    selected_index = self.current_index
-                    # Move to next index for next call
-                    self.current_index = (self.current_index + 1) % len(self.api_keys)
-                    return selected_index
-                
-                # Try next API
-                self.current_index = (self.current_index + 1) % len(self.api_keys)
-                attempts += 1
+            ranked = self._rank_available_apis()
+        
+        for index in ranked:
+            if estimated_tokens is not None:
+                if not self.rate_limiters[index].try_acquire(estimated_tokens):
+                    continue
+                # Shared-budget I/O happens outside the lock
+                if not self._reserve_shared_budget(index, estimated_tokens):
+                    self.rate_limiters[index].release(estimated_tokens)
+                    continue
+            with self._lock:
+                self.current_index = (index + 1) % len(self.api_keys)
+            return index
+        
+        # No available APIs
+        return None
+    
+    def _sync_shared_state(self, force: bool = False):
+        """
+        Pull key health published by other processes (caller must not hold the lock).
+        
+        The backend is read outside the lock, so lanes and status reports never
+        queue behind SQLite or Redis round trips.
+        
+        Args:
+            force: Sync even if the last sync was recent
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_sync < ProcessingConfig.KEY_STATE_SYNC_INTERVAL:
+                return
+            self._last_sync = now
+        
+        try:
+            states = self.key_state.load([s.fingerprint for s in self.api_statuses])
+        except Exception as e:
+            logger.warning(f"Failed to load shared key state: {str(e)}")
+            return
+        
+        with self._lock:
+            self._apply_shared_state(states)
+    
+    def _apply_shared_state(self, states: Dict[str, Dict[str, Any]]):
+        """Apply loaded key health (caller holds the lock)."""
+        for status in self.api_statuses:
+            state = states.get(status.fingerprint)
+            if not state:
+                continue
+            status.apply_shared_state(state)
             
-            # No available APIs
-            return None
+            paused_until = state.get("paused_until") or 0.0
+            if paused_until > self._applied_pauses[status.index]:
+                self._applied_pauses[status.index] = paused_until
+                remaining = paused_until - time.time()
+                if remaining > 0:
+                    self.rate_limiters[status.index].pause(remaining)
     
-    def get_best_api(self) -> Optional[int]:
+    def _snapshot_state(self, status: APIKeyStatus, **extra) -> Tuple[int, str, Dict[str, Any]]:
         """
-        Get the best performing API based on success rate.
+        Capture a key's health for publishing (caller holds the lock).
         
+        Args:
+            status: Key status to publish
+            extra: Additional fields to store (e.g. paused_until)
+            
         Returns:
-            API index or None if no APIs available
+            (index, fingerprint, fields) to pass to _publish_state once the lock is released
+        """
+        fields = status.to_shared_state()
+        fields.update(extra)
+        if "paused_until" in extra:
+            self._applied_pauses[status.index] = max(self._applied_pauses[status.index],
+                                                     extra["paused_until"] or 0.0)
+        return status.index, status.fingerprint, fields
+    
+    def _publish_state(self, snapshot: Optional[Tuple[int, str, Dict[str, Any]]]):
         """
+        Publish a key's health so other processes route around it (caller must not hold the lock).
+        
+        Args:
+            snapshot: Result of _snapshot_state (None publishes nothing)
+        """
+        if snapshot is None:
+            return
+        index, fingerprint, fields = snapshot
+        try:
+            self.key_state.save(fingerprint, fields)
+        except Exception as e:
+            logger.warning(f"Failed to publish state for API key {index}: {str(e)}")
+    
+    def _reserve_shared_budget(self, index: int, estimated_tokens: int) -> bool:
+        """
+        Count a request against the key's budget shared by all processes (caller must not hold the lock).
+        
+        If other workers already used up this minute's budget, the key is paused
+        locally until the window rolls over.
+        
+        Returns:
+            True if the request fits the shared budget
+        """
+        fingerprint = self.api_statuses[index].fingerprint
+        limiter = self.rate_limiters[index]
+        window = current_window()
+        try:
+            requests, tokens = self.key_state.add_usage(fingerprint, 1, estimated_tokens, window)
+        except Exception as e:
+            logger.warning(f"Failed to update shared usage for API key {index}: {str(e)}")
+            return True
+        
+        # A single oversized request is allowed through on an otherwise idle window
+        if requests <= limiter.rpm and (tokens <= limiter.tpm or requests == 1):
+            return True
+        
+        try:
+            self.key_state.add_usage(fingerprint, -1, -estimated_tokens, window)
+        except Exception:
+            pass
+        remaining = (window + 1) * 60 - time.time()
+        logger.debug(f"API key {index} budget used up by other workers, pausing for {remaining:.0f}s")
+        limiter.pause(remaining)
+        return False
+    
+    def try_reserve_api(self, api_index: int, estimated_tokens: Optional[int] = None) -> Optional[float]:
+        """
+        Try to reserve rate-limit budget on a specific API key.
+        
+        Args:
+            api_index: Index of the API key
+            estimated_tokens: Estimated input tokens (defaults to DEFAULT_REQUEST_TOKENS)
+            
+        Returns:
+            0.0 if the budget was reserved, seconds to wait before trying again
+            otherwise, or None if the key is cooling down
+        """
+        if estimated_tokens is None:
+            estimated_tokens = ProcessingConfig.DEFAULT_REQUEST_TOKENS
+        
+        self._sync_shared_state()
         with self._lock:
-            available_apis = [
-                (i, status) for i, status in enumerate(self.api_statuses)
-                if status.check_availability()
-            ]
+            if not self.api_statuses[api_index].check_availability():
+                return None
+        limiter = self.rate_limiters[api_index]
+        if limiter.try_acquire(estimated_tokens):
+            if self._reserve_shared_budget(api_index, estimated_tokens):
+                return 0.0
+            limiter.release(estimated_tokens)
+        # Never report zero so callers can't spin
+        return max(0.05, limiter.time_until_available(estimated_tokens))
+    
+    def _rank_available_apis(self) -> List[int]:
+        """Rank available keys by load score (caller holds the lock and synced shared state)."""
+        n = len(self.api_keys)
+        available = [s for s in self.api_statuses if s.check_availability()]
+        if not available:
+            return []
+        
+        # Unobserved keys are assumed to be as fast as the fastest observed one
+        observed = [s.ewma_latency for s in available if s.ewma_latency is not None]
+        default_latency = min(observed) if observed else 1.0
+        
+        available.sort(key=lambda s: (
+            s.get_load_score(default_latency),
+            (s.index - self.current_index) % n
+        ))
+        return [s.index for s in available]
+    
+    def acquire_api(self, estimated_tokens: Optional[int] = None,
+                    max_wait: Optional[float] = None) -> Optional[int]:
+        """
+        Wait for a key with rate-limit budget for the request.
+        
+        Args:
+            estimated_tokens: Estimated input tokens (defaults to DEFAULT_REQUEST_TOKENS)
+            max_wait: Maximum seconds to wait for budget
+            
+        Returns:
+            API index with reserved budget, or None if every key is cooling down
+            or no budget frees up within max_wait
+        """
+        if estimated_tokens is None:
+            estimated_tokens = ProcessingConfig.DEFAULT_REQUEST_TOKENS
+        if max_wait is None:
+            max_wait = ProcessingConfig.RATE_LIMIT_MAX_WAIT
+        deadline = time.monotonic() + max_wait
+        
+        while True:
+            api_index = self.get_next_available_api(estimated_tokens)
+            if api_index is not None:
+                return api_index
             
-            if not available_apis:
+            wait = self.time_until_budget(estimated_tokens)
+            remaining = deadline - time.monotonic()
+            if wait is None or remaining <= 0:
                 return None
             
-            # Sort by success rate (descending) and least recently used
-            available_apis.sort(
-                key=lambda x: (x[1].get_success_rate(), -x[1].total_requests),
-                reverse=True
-            )
+            # Small jitter so waiting threads don't stampede the same key
+            time.sleep(min(wait, remaining) + random.uniform(0, 0.1))
+    
+    def time_until_budget(self, estimated_tokens: int) -> Optional[float]:
+        """
+        Seconds until some available key has budget for a request.
+        
+        Returns:
+            Wait in seconds, or None if no key is available at all
+        """
+        with self._lock:
+            waits = [
+                self.rate_limiters[i].time_until_available(estimated_tokens)
+                for i, status in enumerate(self.api_statuses)
+                if status.check_availability()
+            ]
+        return min(waits) if waits else None
+    
+    def time_until_any_available(self) -> float:
+        """Seconds until the earliest cooldown ends."""
+        self._sync_shared_state()
+        with self._lock:
+            cooldowns = [s.cooldown_until for s in self.api_statuses if s.cooldown_until]
+        if not cooldowns:
+            return 0.0
+        return max(0.0, (min(cooldowns) - datetime.now()).total_seconds())
+    
+    def get_latency_percentile(self, percentile: float,
+                               min_samples: Optional[int] = None) -> Optional[float]:
+        """
+        Get a percentile of recently observed operation latency.
+        
+        Args:
+            percentile: Percentile as a fraction (e.g. 0.95)
+            min_samples: Minimum observations required (defaults to HEDGE_MIN_SAMPLES)
             
-            return available_apis[0][0]
+        Returns:
+            Latency in seconds, or None if there are too few observations
+        """
+        if min_samples is None:
+            min_samples = ProcessingConfig.HEDGE_MIN_SAMPLES
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples or len(samples) < min_samples:
+            return None
+        rank = min(len(samples) - 1, max(0, int(round(percentile * (len(samples) - 1)))))
+        return samples[rank]
     
-    def execute_with_failover(self, operation: Callable, max_retries: int = 3) -> Any:
+    def get_available_apis(self) -> List[int]:
+        """
+        Get all keys that are not cooling down, best first.
+        
+        Returns:
+            List of API indices
+        """
+        self._sync_shared_state()
+        with self._lock:
+            return self._rank_available_apis()
+    
+    def get_best_api(self) -> Optional[int]:
+        """
+        Get the best API key based on live latency, load and 429 signals.
+        
+        Returns:
+            API index or None if no APIs available
+        """
+        self._sync_shared_state()
+        with self._lock:
+            ranked = self._rank_available_apis()
+            return ranked[0] if ranked else None
+    
+    def execute_with_failover(self, operation: Callable, max_retries: int = 3,
+                              estimated_tokens: Optional[int] = None) -> Any:
         """
         Execute an operation with automatic failover to different API keys.
         
+        Work is only dispatched to keys with rate-limit budget for the request.
+        
         Args:
             operation: Function that takes (api_client, model) and returns result
             max_retries: Maximum retry attempts across all APIs
+            estimated_tokens: Estimated input tokens of the request
             
         Returns:
             Operation result
@@ -181,50 +560,115 @@ class MultiAPIManager:
         total_attempts = 0
         
         while total_attempts < max_retries:
-            # Get next available API
-            api_index = self.get_next_available_api()
+            # Get next API with available budget
+            api_index = self.acquire_api(estimated_tokens)
             
             if api_index is None:
-                # No available APIs, wait and retry
-                logger.warning("No available APIs, waiting 30 seconds...")
-                time.sleep(30)
                 total_attempts += 1
+                tokens = estimated_tokens or ProcessingConfig.DEFAULT_REQUEST_TOKENS
+                if self.time_until_budget(tokens) is not None:
+                    # acquire_api already waited out RATE_LIMIT_MAX_WAIT; don't sleep again
+                    errors.append(f"No rate-limit budget within {ProcessingConfig.RATE_LIMIT_MAX_WAIT:g}s")
+                    logger.warning("No API key had rate-limit budget in time")
+                    continue
+                
+                # Every key is cooling down; wait for the first one to come back
+                errors.append("All API keys are cooling down")
+                if total_attempts < max_retries:
+                    wait = min(30.0, max(1.0, self.time_until_any_available()))
+                    logger.warning(f"No available APIs, waiting {wait:.0f} seconds...")
+                    time.sleep(wait)
                 continue
             
-            api_client = self.api_clients[api_index]
-            model = self.models[api_index]
-            status = self.api_statuses[api_index]
-            
             try:
-                logger.info(f"Attempting operation with API key {api_index}")
-                
-                # Execute operation
-                result = operation(api_client, model)
-                
-                # Record success
-                status.record_success()
-                logger.info(f"Operation successful with API key {api_index}")
-                
-                return result
-                
+                return self.run_on_api(api_index, operation)
             except Exception as e:
-                error_msg = str(e)
-                logger.error(f"API key {api_index} failed: {error_msg}")
-                
-                # Record failure
-                status.record_failure(error_msg)
-                errors.append(f"API {api_index}: {error_msg}")
-                
-                # Check for specific errors that should trigger immediate failover
-                if "429" in error_msg or "quota" in error_msg.lower():
-                    logger.warning(f"API key {api_index} hit quota limit")
-                elif "403" in error_msg:
-                    logger.warning(f"API key {api_index} has permission issues")
-                
+                errors.append(f"API {api_index}: {str(e)}")
                 total_attempts += 1
         
         # All attempts failed
-        raise APIError(f"All API attempts failed after {total_attempts} tries. Errors: {'; '.join(errors)}")
+        raise APIError(f"All API attempts failed after {total_attempts} tries. "
+                       f"Errors: {'; '.join(errors) or 'no attempts were made'}")
+    
+    def run_on_api(self, api_index: int, operation: Callable,
+                   is_abandoned: Optional[Callable[[], bool]] = None) -> Any:
+        """
+        Run an operation once on a specific API key and record the outcome.
+        
+        The caller is responsible for reserving rate-limit budget beforehand.
+        
+        Args:
+            api_index: Index of the API key to use
+            operation: Function that takes (api_client, model) and returns result
+            is_abandoned: Optional check, made when the operation fails; if it returns
+                True (e.g. a losing hedge copy whose task already finished), the
+                failure is neither recorded against the key nor published
+            
+        Returns:
+            Operation result
+            
+        Raises:
+            Exception: Whatever the operation raised (after it has been recorded)
+        """
+        api_client = self.api_clients[api_index]
+        model = self.models[api_index]
+        status = self.api_statuses[api_index]
+        
+        with self._lock:
+            status.begin_request()
+        started_at = time.monotonic()
+        
+        try:
+            logger.info(f"Attempting operation with API key {api_index}")
+            
+            # Execute operation
+            result = operation(api_client, model)
+            
+            # Record success
+            snapshot = None
+            with self._lock:
+                latency = time.monotonic() - started_at
+                status.end_request(latency)
+                self._latencies.append(latency)
+                had_failures = status.consecutive_failures or status.consecutive_rate_limits
+                status.record_success()
+                if had_failures:
+                    snapshot = self._snapshot_state(status)
+            self._publish_state(snapshot)
+            logger.info(f"Operation successful with API key {api_index}")
+            
+            return result
+            
+        except Exception as e:
+            error_msg = str(e)
+            if is_abandoned is not None and is_abandoned():
+                # Its inputs may already be gone; the key isn't to blame
+                logger.info(f"Ignoring failure of abandoned request on API key {api_index}: {error_msg}")
+                with self._lock:
+                    status.end_request()
+                raise
+            logger.error(f"API key {api_index} failed: {error_msg}")
+            
+            # Count failures seen by other workers towards the cooldown
+            self._sync_shared_state(force=True)
+            
+            # Check for specific errors that should trigger immediate failover
+            with self._lock:
+                if "429" in error_msg or "quota" in error_msg.lower():
+                    retry_after = parse_retry_after(error_msg)
+                    logger.warning(f"API key {api_index} hit quota limit, pausing it for {retry_after:.0f}s")
+                    self.rate_limiters[api_index].pause(retry_after)
+                    status.end_request(rate_limited=True)
+                    status.record_rate_limited(error_msg)
+                    snapshot = self._snapshot_state(status, paused_until=time.time() + retry_after)
+                else:
+                    if "403" in error_msg:
+                        logger.warning(f"API key {api_index} has permission issues")
+                    status.end_request()
+                    status.record_failure(error_msg)
+                    snapshot = self._snapshot_state(status)
+            self._publish_state(snapshot)
+            raise
     
     def get_status_report(self) -> Dict[str, Any]:
         """Get a status report of all API keys."""
@@ -243,6 +687,11 @@ class MultiAPIManager:
                     "total_failures": status.total_failures,
                     "consecutive_failures": status.consecutive_failures,
                     "success_rate": f"{status.get_success_rate():.2%}",
+                    "rate_limited": status.total_rate_limits,
+                    "recent_rate_limit_ratio": f"{status.get_recent_rate_limit_ratio():.2%}",
+                    "in_flight": status.in_flight,
+                    "ewma_latency": round(status.ewma_latency, 2) if status.ewma_latency is not None else None,
+                    "rate_limit": self.rate_limiters[status.index].get_status(),
                     "last_error": status.last_error,
                     "cooldown_until": status.cooldown_until.isoformat() if status.cooldown_until else None
                 }
@@ -252,63 +701,67 @@ class MultiAPIManager:
     
     def reset_api_status(self, api_index: int):
         """Reset the status of a specific API key."""
+        snapshot = None
         with self._lock:
             if 0 <= api_index < len(self.api_statuses):
                 status = self.api_statuses[api_index]
                 status.consecutive_failures = 0
+                status.consecutive_rate_limits = 0
                 status.is_available = True
                 status.cooldown_until = None
+                snapshot = self._snapshot_state(status, paused_until=None)
                 logger.info(f"Reset status for API key {api_index}")
+        self._publish_state(snapshot)
     
     def distribute_tasks(self, tasks: List[Any], operation: Callable,
-                        parallel: bool = True, max_workers: int = 3) -> List[Any]:
+                        parallel: bool = True, max_workers: Optional[int] = 3,
+                        estimate_tokens: Optional[Callable[[Any], int]] = None,
+                        on_progress: Optional[Callable[[Any], None]] = None,
+                        hedge_percentile: Optional[float] = None) -> List[Any]:
         """
         Distribute tasks across multiple API keys.
         
+        In parallel mode tasks go through a work-stealing TaskScheduler: one
+        lane per healthy key pulls from a shared priority queue, and failed
+        tasks are requeued for another key instead of blocking a worker.
+        
         Args:
             tasks: List of tasks to process
             operation: Function that takes (task, api_client, model) and returns result
             parallel: Whether to process in parallel
-            max_workers: Maximum parallel workers
+            max_workers: Maximum parallel lanes (None for one per healthy key)
+            estimate_tokens: Optional function returning a task's estimated input tokens
+            on_progress: Optional callback invoked with each finished task's result
+            hedge_percentile: If set (parallel mode only), duplicate tasks running longer
+                than this latency percentile on an idle key and keep the first response
             
         Returns:
-            List of results
+            List of results in task order ({"error": ..., "task": task} for failed tasks)
         """
-        results = []
-        
         if parallel:
-            from concurrent.futures import ThreadPoolExecutor, as_completed
-            
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_task = {}
-                
-                for task in tasks:
-                    # Submit task with failover
-                    future = executor.submit(
-                        self.execute_with_failover,
-                        lambda api_client, model: operation(task, api_client, model)
-                    )
-                    future_to_task[future] = task
-                
-                # Collect results
-                for future in as_completed(future_to_task):
-                    task = future_to_task[future]
-                    try:
-                        result = future.result()
-                        results.append(result)
-                    except Exception as e:
-                        logger.error(f"Task failed: {str(e)}")
-                        results.append({"error": str(e), "task": task})
-        else:
-            # Sequential processing
-            for task in tasks:
+            scheduler = TaskScheduler(
+                self, operation, estimate_tokens=estimate_tokens,
+                max_workers=max_workers, on_progress=on_progress,
+                hedge_percentile=hedge_percentile
+            )
+            return scheduler.run(tasks)
+        
+        # Sequential processing
+        results = []
+        for task in tasks:
+            try:
+                result = self.execute_with_failover(
+                    lambda api_client, model, task=task: operation(task, api_client, model),
+                    estimated_tokens=estimate_tokens(task) if estimate_tokens else None
+                )
+            except Exception as e:
+                logger.error(f"Task failed: {str(e)}")
+                result = {"error": str(e), "task": task}
+            results.append(result)
+            if on_progress is not None:
                 try:
-                    result = self.execute_with_failover(
-                        lambda api_client, model: operation(task, api_client, model)
-                    )
-                    results.append(result)
-                except Exception as e:
-                    logger.error(f"Task failed: {str(e)}")
-                    results.append({"error": str(e), "task": task})
+                    on_progress(result)
+                except Exception:
+                    pass
         
         return results
@@ -0,0 +1,239 @@
+"""
+Token-bucket rate limiting for Gemini API keys.
+Tracks each key's requests-per-minute and tokens-per-minute budgets so work
+is only dispatched to keys that can accept it without hitting 429s.
+"""
+
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from .key_state import key_fingerprint
+from ..utils.config import ProcessingConfig
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at a fixed rate."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        """
+        Initialize the bucket (starts full).
+
+        Args:
+            capacity: Maximum number of tokens
+            refill_per_second: Tokens added per second
+        """
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def time_until_available(self, amount: float) -> float:
+        """Seconds until the bucket can serve the given amount."""
+        self._refill()
+        # Requests larger than the bucket are served once it is full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def consume(self, amount: float) -> None:
+        """Remove tokens (may go negative for oversized requests)."""
+        self._refill()
+        self.tokens -= amount
+
+    def refund(self, amount: float) -> None:
+        """Return unused tokens."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def drain(self) -> None:
+        """Empty the bucket."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class KeyRateLimiter:
+    """Requests-per-minute and tokens-per-minute budget for one API key."""
+
+    def __init__(self, rpm: int, tpm: int):
+        """
+        Initialize the limiter.
+
+        Args:
+            rpm: Requests per minute allowed for the key
+            tpm: Input tokens per minute allowed for the key
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = TokenBucket(rpm, rpm / 60.0)
+        self._tokens = TokenBucket(tpm, tpm / 60.0)
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def time_until_available(self, tokens: int) -> float:
+        """
+        Seconds until a request of the given size fits the budget.
+
+        Args:
+            tokens: Estimated input tokens of the request
+
+        Returns:
+            0.0 if the request can be sent now
+        """
+        with self._lock:
+            return self._time_until_available(tokens)
+
+    def _time_until_available(self, tokens: int) -> float:
+        pause = max(0.0, self._paused_until - time.monotonic())
+        return max(pause,
+                   self._requests.time_until_available(1),
+                   self._tokens.time_until_available(tokens))
+
+    def try_acquire(self, tokens: int) -> bool:
+        """
+        Reserve budget for a request if it fits right now.
+
+        Args:
+            tokens: Estimated input tokens of the request
+
+        Returns:
+            True if the budget was reserved
+        """
+        with self._lock:
+            if self._time_until_available(tokens) > 0:
+                return False
+            self._requests.consume(1)
+            self._tokens.consume(tokens)
+            return True
+
+    def release(self, tokens: int) -> None:
+        """
+        Return budget reserved by try_acquire for a request that was not sent.
+
+        Args:
+            tokens: Estimated input tokens that were reserved
+        """
+        with self._lock:
+            self._requests.refund(1)
+            self._tokens.refund(tokens)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stop dispatching to this key for a while (e.g. after a 429).
+
+        Args:
+            seconds: Pause duration
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._requests.drain()
+
+    def get_status(self) -> dict:
+        """Get a snapshot of the remaining budget."""
+        with self._lock:
+            self._requests._refill()
+            self._tokens._refill()
+            return {
+                "rpm_limit": self.rpm,
+                "tpm_limit": self.tpm,
+                "requests_available": int(max(0, self._requests.tokens)),
+                "tokens_available": int(max(0, self._tokens.tokens)),
+                "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 1)
+            }
+
+
+# Process-wide in-flight request slots, keyed by API key fingerprint
+_in_flight_slots: Dict[str, threading.BoundedSemaphore] = {}
+_in_flight_lock = threading.Lock()
+
+
+def get_in_flight_slots(api_key: Optional[str]) -> threading.BoundedSemaphore:
+    """
+    Get the semaphore capping concurrent requests on an API key.
+
+    Every client of the same key shares one semaphore, so nested parallel
+    work (pairs fanned out, each with its own chunks) still stays within
+    MAX_IN_FLIGHT_PER_KEY requests on that key.
+
+    Args:
+        api_key: API key (None or empty for the globally configured key)
+
+    Returns:
+        Shared semaphore for the key
+    """
+    key_fp = key_fingerprint(api_key or "")
+    with _in_flight_lock:
+        slots = _in_flight_slots.get(key_fp)
+        if slots is None:
+            slots = threading.BoundedSemaphore(max(1, ProcessingConfig.MAX_IN_FLIGHT_PER_KEY))
+            _in_flight_slots[key_fp] = slots
+        return slots
+
+
+def get_default_limits(model_name: Optional[str]) -> Tuple[int, int]:
+    """
+    Get the (rpm, tpm) limits for a model.
+
+    Environment overrides (GEMINI_RPM_LIMIT / GEMINI_TPM_LIMIT) take precedence
+    over the per-model defaults.
+
+    Args:
+        model_name: Gemini model name
+
+    Returns:
+        (requests per minute, tokens per minute)
+    """
+    name = (model_name or "").replace("models/", "")
+    rpm, tpm = ProcessingConfig.MODEL_RATE_LIMITS.get(name, ProcessingConfig.MODEL_RATE_LIMITS["default"])
+    if ProcessingConfig.RPM_LIMIT_OVERRIDE:
+        rpm = ProcessingConfig.RPM_LIMIT_OVERRIDE
+    if ProcessingConfig.TPM_LIMIT_OVERRIDE:
+        tpm = ProcessingConfig.TPM_LIMIT_OVERRIDE
+    return rpm, tpm
+
+
+def parse_retry_after(error_message: str, default: float = 60.0) -> float:
+    """
+    Extract the retry delay from a 429 error message.
+
+    Handles both "retry_delay { seconds: N }" and "retry in N s" styles.
+
+    Args:
+        error_message: Error text from the API
+        default: Delay to use when none is present
+
+    Returns:
+        Delay in seconds
+    """
+    match = re.search(r"seconds:\s*(\d+)", error_message) or \
+        re.search(r"retry in\s*([\d.]+)\s*s", error_message, re.IGNORECASE)
+    if match:
+        try:
+            return float(match.group(1))
+        except ValueError:
+            pass
+    return default
+
+
+def estimate_request_tokens(page_count: int, prompt: str = "") -> int:
+    """
+    Estimate the input tokens of a request.
+
+    Args:
+        page_count: Total PDF pages attached to the request
+        prompt: Prompt text
+
+    Returns:
+        Estimated input tokens
+    """
+    return page_count * ProcessingConfig.TOKENS_PER_PDF_PAGE + len(prompt) // 2
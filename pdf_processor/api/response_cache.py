@@ -0,0 +1,253 @@
+"""
+Local replay cache of Gemini generation responses.
+Keys on the prompt, the content hashes of attached files, the model and its
+generation config, so retried or resubmitted jobs reuse earlier responses.
+"""
+
+import json
+import sqlite3
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils.config import ProcessingConfig
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class CachedResponse:
+    """Generation response served from the cache."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.candidates = [SimpleNamespace(finish_reason="STOP")]
+        self.from_cache = True
+
+
+class ResponseCache:
+    """SQLite-backed response cache with TTL and size-bounded LRU eviction."""
+
+    def __init__(self, db_path: Optional[str] = None, ttl_seconds: Optional[float] = None,
+                 max_bytes: Optional[int] = None, max_files: Optional[int] = None):
+        """
+        Initialize the response cache.
+
+        Args:
+            db_path: Path of the SQLite database file
+            ttl_seconds: Entries older than this are treated as misses
+            max_bytes: Total response size kept before least-recently-used entries are evicted
+            max_files: Uploaded file hashes remembered before the least recently used are forgotten
+        """
+        self.db_path = Path(db_path or ProcessingConfig.RESPONSE_CACHE_PATH)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else ProcessingConfig.RESPONSE_CACHE_TTL_HOURS * 3600
+        self.max_bytes = max_bytes if max_bytes is not None else ProcessingConfig.RESPONSE_CACHE_MAX_MB * 1024 * 1024
+        self.max_files = max_files or ProcessingConfig.RESPONSE_CACHE_MAX_FILES
+        self.hits = 0
+        self.misses = 0
+
+        # Uploaded file name -> content hash, least recently used first
+        self._file_hashes: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=10, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def remember_file(self, file_name: str, content_hash: str) -> None:
+        """
+        Record the content hash of an uploaded file.
+
+        Args:
+            file_name: Remote file name (e.g. "files/abc123")
+            content_hash: SHA-256 of the uploaded bytes
+        """
+        with self._lock:
+            self._file_hashes[file_name] = content_hash
+            self._file_hashes.move_to_end(file_name)
+            # Forgotten files just make their requests uncacheable
+            while len(self._file_hashes) > self.max_files:
+                self._file_hashes.popitem(last=False)
+
+    def file_hash(self, file_name: Optional[str]) -> Optional[str]:
+        """Get the content hash recorded for an uploaded file."""
+        if not file_name:
+            return None
+        with self._lock:
+            content_hash = self._file_hashes.get(file_name)
+            if content_hash is not None:
+                self._file_hashes.move_to_end(file_name)
+            return content_hash
+
+    def make_key(self, content: Any, model_name: str,
+                 generation_config: Optional[Dict[str, Any]] = None,
+                 context: Optional[str] = None) -> Optional[str]:
+        """
+        Build the cache key for a generation request.
+
+        Args:
+            content: Prompt text and uploaded files, in request order
+            model_name: Model name
+            generation_config: Generation config of the model
+            context: Key of the cached context the request runs on, if any
+
+        Returns:
+            Cache key, or None if an attached file's content is unknown
+        """
+        parts = content if isinstance(content, (list, tuple)) else [content]
+        key_parts: List[Tuple[str, str]] = []
+        for part in parts:
+            if isinstance(part, str):
+                key_parts.append(("text", hashlib.sha256(part.encode("utf-8")).hexdigest()))
+            else:
+                content_hash = self.file_hash(getattr(part, "name", None))
+                if content_hash is None:
+                    return None
+                key_parts.append(("file", content_hash))
+
+        key_data: Dict[str, Any] = {
+            "parts": key_parts,
+            "model": model_name,
+            "generation_config": generation_config or {}
+        }
+        if context is not None:
+            key_data["context"] = context
+        payload = json.dumps(key_data, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get a cached response.
+
+        Args:
+            key: Key returned by make_key
+
+        Returns:
+            Response text or None on miss
+        """
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[1] > self.ttl_seconds:
+            if row is not None:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            with self._lock:
+                self.misses += 1
+            return None
+
+        conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        with self._lock:
+            self.hits += 1
+        return row[0]
+
+    def put(self, key: str, response_text: str) -> None:
+        """
+        Store a response and evict least-recently-used entries beyond the size bound.
+
+        Args:
+            key: Key returned by make_key
+            response_text: Complete response text
+        """
+        size = len(response_text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response_text, size, now, now)
+            )
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                evicted = 0
+                for old_key, old_size in conn.execute(
+                        "SELECT key, size FROM responses WHERE key != ? ORDER BY last_access", (key,)
+                ).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    total -= old_size
+                    evicted += 1
+                logger.debug(f"Evicted {evicted} cached responses")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, key: str) -> None:
+        """Remove a cached response."""
+        self._connect().execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        """Remove every cached response."""
+        self._connect().execute("DELETE FROM responses")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        count, total = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        with self._lock:
+            return {
+                "entries": count,
+                "bytes": total,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# Global response cache instance
+_global_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_global_response_cache() -> Optional[ResponseCache]:
+    """
+    Get the global response cache instance.
+
+    Returns:
+        Global ResponseCache instance, or None if caching is disabled
+    """
+    global _global_response_cache
+
+    if not ProcessingConfig.RESPONSE_CACHE_ENABLED:
+        return None
+
+    with _response_cache_lock:
+        if _global_response_cache is None:
+            db_path = Path(ProcessingConfig.RESPONSE_CACHE_PATH)
+            if ProcessingConfig.GEMINI_BACKEND == "fake":
+                # Keep fake responses out of the real cache
+                db_path = db_path.with_name(f"{db_path.stem}.fake{db_path.suffix}")
+            try:
+                _global_response_cache = ResponseCache(str(db_path))
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Response cache unavailable: {str(e)}")
+                return None
+            logger.info(f"Created response cache at {_global_response_cache.db_path}")
+
+    return _global_response_cache
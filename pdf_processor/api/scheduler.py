@@ -0,0 +1,387 @@
+"""
+Work-stealing task scheduler for multi-key processing.
+Tasks sit in one shared priority queue served by worker lanes bound to healthy
+API keys; idle lanes take the next task and failed tasks are requeued for
+another lane instead of sleeping in place. Optionally, idle lanes hedge
+straggling tasks by running a duplicate on their own key.
+"""
+
+import threading
+import time
+import weakref
+from typing import Any, Callable, List, Optional
+
+from ..utils.config import ProcessingConfig
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Schedulers that may still have losing hedge copies running
+_schedulers: "weakref.WeakSet[TaskScheduler]" = weakref.WeakSet()
+_schedulers_lock = threading.Lock()
+
+
+class _Job:
+    """A task waiting in (or taken from) the scheduler queue."""
+
+    def __init__(self, index: int, task: Any, tokens: Optional[int]):
+        self.index = index
+        self.task = task
+        self.tokens = tokens
+        self.attempts = 0
+        self.avoid_key: Optional[int] = None
+        self.same_key_after = 0.0
+        self.errors: List[str] = []
+        # Copies currently running, keyed by API index -> start time
+        self.running: dict = {}
+        self.hedged = False
+        self.done = False
+
+    def priority(self) -> tuple:
+        # Retries first so stragglers don't pile up at the tail, then largest first
+        return (-self.attempts, -(self.tokens or 0), self.index)
+
+
+class TaskScheduler:
+    """Runs tasks across API keys with one worker lane per healthy key."""
+
+    def __init__(self, api_manager, operation: Callable,
+                 estimate_tokens: Optional[Callable[[Any], Optional[int]]] = None,
+                 max_workers: Optional[int] = None,
+                 max_attempts: Optional[int] = None,
+                 on_progress: Optional[Callable[[Any], None]] = None,
+                 hedge_percentile: Optional[float] = None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            api_manager: MultiAPIManager owning the keys
+            operation: Function that takes (task, api_client, model) and returns result
+            estimate_tokens: Optional function returning a task's estimated input tokens
+            max_workers: Maximum lanes running at once, spread over the healthy keys
+                (defaults to one lane per healthy key); with fewer lanes than keys,
+                only that many keys are used at a time
+            max_attempts: Attempts per task before it is reported as failed
+            on_progress: Optional callback invoked with each finished task's result
+            hedge_percentile: If set, a task running longer than this percentile of
+                observed latency is duplicated on an idle key; the first response wins
+        """
+        self.api_manager = api_manager
+        self.operation = operation
+        self.estimate_tokens = estimate_tokens
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts or ProcessingConfig.MAX_RETRIES
+        self.on_progress = on_progress
+        self.hedge_percentile = hedge_percentile
+
+        self._cond = threading.Condition()
+        self._queue: List[_Job] = []
+        self._results: List[Any] = []
+        self._remaining = 0
+        self._live_lanes: dict = {}  # key index -> running lanes
+        self._running: List[_Job] = []
+        self._jobs: List[_Job] = []
+
+    def run(self, tasks: List[Any]) -> List[Any]:
+        """
+        Run all tasks and wait for them to finish.
+
+        Args:
+            tasks: Tasks to process
+
+        Returns:
+            Results in task order; failed tasks yield {"error": ..., "task": task}
+        """
+        self._queue = [_Job(i, task, self._estimate(task)) for i, task in enumerate(tasks)]
+        self._jobs = list(self._queue)
+        self._results = [None] * len(tasks)
+        self._remaining = len(tasks)
+        if not tasks:
+            return []
+
+        revivals = 0
+        while True:
+            self._start_lanes()
+
+            with self._cond:
+                while self._remaining and sum(self._live_lanes.values()):
+                    self._cond.wait()
+                if not self._remaining:
+                    break
+
+            # Every lane retired because its key went into cooldown
+            wait = self.api_manager.time_until_any_available()
+            if revivals >= self.max_attempts or wait > ProcessingConfig.RATE_LIMIT_MAX_WAIT:
+                self._fail_remaining("No available API keys")
+                break
+            revivals += 1
+            logger.warning(f"No available APIs, waiting {wait:.0f} seconds...")
+            time.sleep(max(wait, 1.0))
+
+        # Lanes still finishing a losing hedge exit on their own; their outcome is
+        # ignored, and wait_settled() lets callers keep the inputs until they're done
+        with _schedulers_lock:
+            _schedulers.add(self)
+        return self._results
+
+    def wait_settled(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until no copy of any task is still running (losing hedges included).
+
+        Args:
+            timeout: Maximum seconds to wait (None waits indefinitely)
+
+        Returns:
+            True if every copy finished, False if some were abandoned at the timeout
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not any(job.running for job in self._jobs), timeout)
+
+    def _estimate(self, task: Any) -> Optional[int]:
+        if self.estimate_tokens is None:
+            return None
+        try:
+            return self.estimate_tokens(task)
+        except Exception:
+            return None
+
+    def _start_lanes(self) -> None:
+        """Start lanes for healthy keys that have none running, up to max_workers."""
+        available = self.api_manager.get_available_apis()
+
+        threads = []
+        with self._cond:
+            healthy = [i for i in available if not self._live_lanes.get(i)]
+            slots = (self.max_workers or len(available)) - sum(self._live_lanes.values())
+            if not healthy or slots <= 0:
+                return
+            healthy = healthy[:slots]
+            per_key, extra = divmod(slots, len(healthy))
+            for position, key in enumerate(healthy):
+                # The first keys take the lanes that don't divide evenly
+                lanes = per_key + (1 if position < extra else 0)
+                self._live_lanes[key] = lanes
+                for lane_no in range(lanes):
+                    thread = threading.Thread(
+                        target=self._lane, args=(key,),
+                        name=f"gemini-lane-{key}-{lane_no}", daemon=True
+                    )
+                    threads.append(thread)
+        logger.info(f"Scheduling {self._remaining} tasks on {len(threads)} lanes "
+                    f"across {len(healthy)} API keys")
+        for thread in threads:
+            thread.start()
+
+    def _lane(self, key: int) -> None:
+        """Worker loop bound to one API key."""
+        try:
+            while True:
+                job, is_hedge = self._take(key)
+                if job is None:
+                    return
+
+                wait = self.api_manager.try_reserve_api(key, job.tokens)
+                if is_hedge and wait != 0:
+                    # Hedges are opportunistic; never wait for budget on their behalf
+                    self._cancel_hedge(job, key)
+                    if wait is None:
+                        return
+                    with self._cond:
+                        self._cond.wait(min(wait, 1.0))
+                    continue
+                if wait is None:
+                    # Key is cooling down; leave its work to the other lanes
+                    self._put_back(job, key)
+                    logger.info(f"API key {key} is unavailable, retiring its lane")
+                    return
+                if wait > 0:
+                    # Out of budget: let other lanes take the job meanwhile
+                    self._put_back(job, key)
+                    with self._cond:
+                        self._cond.wait(min(wait, 1.0))
+                    continue
+                if is_hedge:
+                    logger.info(f"Hedging straggling task {job.index} on API key {key}")
+
+                try:
+                    # Once another copy has answered, this one's failure says nothing about the key
+                    result = self.api_manager.run_on_api(
+                        key, lambda api_client, model: self.operation(job.task, api_client, model),
+                        is_abandoned=lambda: job.done
+                    )
+                except Exception as e:
+                    self._requeue_or_fail(job, key, e)
+                else:
+                    self._finish(job, result, key)
+        finally:
+            with self._cond:
+                self._live_lanes[key] -= 1
+                self._cond.notify_all()
+
+    def _take(self, key: int) -> tuple:
+        """
+        Take the next job this lane should run, blocking until one exists.
+
+        Returns:
+            (job, is_hedge), or (None, False) once all tasks are finished
+        """
+        with self._cond:
+            while self._remaining:
+                now = time.monotonic()
+                others_alive = any(n for k, n in self._live_lanes.items() if k != key)
+                eligible = [
+                    job for job in self._queue
+                    if job.avoid_key != key or (not others_alive and now >= job.same_key_after)
+                ]
+                if eligible:
+                    job = min(eligible, key=_Job.priority)
+                    self._queue.remove(job)
+                    job.running[key] = now
+                    self._running.append(job)
+                    return job, False
+
+                timeout = 1.0
+                hedge, hedge_wait = self._find_hedge(key, now)
+                if hedge is not None:
+                    hedge.hedged = True
+                    hedge.running[key] = now
+                    return hedge, True
+                if hedge_wait is not None:
+                    timeout = min(timeout, max(0.01, hedge_wait))
+
+                retry_times = [j.same_key_after - now for j in self._queue if j.avoid_key == key]
+                if retry_times and not others_alive:
+                    timeout = min(timeout, max(0.01, min(retry_times)))
+                self._cond.wait(timeout)
+            return None, False
+
+    def _find_hedge(self, key: int, now: float) -> tuple:
+        """
+        Find a straggling job to duplicate on this lane's key (caller holds the condition).
+
+        Returns:
+            (job or None, seconds until the next job becomes a straggler or None)
+        """
+        if self.hedge_percentile is None or self._queue:
+            return None, None
+        if self.api_manager.api_statuses[key].in_flight > 0:
+            return None, None
+        threshold = self.api_manager.get_latency_percentile(self.hedge_percentile)
+        if threshold is None:
+            return None, None
+
+        next_wait = None
+        for job in self._running:
+            if job.hedged or job.done or key in job.running:
+                continue
+            elapsed = now - min(job.running.values())
+            if elapsed >= threshold:
+                return job, None
+            wait = threshold - elapsed
+            next_wait = wait if next_wait is None else min(next_wait, wait)
+        return None, next_wait
+
+    def _cancel_hedge(self, job: _Job, key: int) -> None:
+        with self._cond:
+            job.running.pop(key, None)
+            job.hedged = False
+            self._cond.notify_all()
+
+    def _put_back(self, job: _Job, key: Optional[int] = None) -> None:
+        with self._cond:
+            if key is not None:
+                job.running.pop(key, None)
+            if job in self._running:
+                self._running.remove(job)
+            self._queue.append(job)
+            self._cond.notify_all()
+
+    def _requeue_or_fail(self, job: _Job, key: int, error: Exception) -> None:
+        """Requeue a failed job for another lane, or record it as failed."""
+        with self._cond:
+            job.running.pop(key, None)
+            job.errors.append(f"API {key}: {str(error)}")
+            if job.done or job.running:
+                # Another copy already won or is still running
+                self._cond.notify_all()
+                return
+            self._running.remove(job)
+            job.hedged = False
+            job.attempts += 1
+
+        if job.attempts >= self.max_attempts:
+            logger.error(f"Task failed: {str(error)}")
+            self._finish(job, {
+                "error": f"All API attempts failed after {job.attempts} tries. "
+                         f"Errors: {'; '.join(job.errors)}",
+                "task": job.task
+            })
+            return
+
+        # Other keys may retry immediately; this key only after a backoff
+        job.avoid_key = key
+        job.same_key_after = time.monotonic() + ProcessingConfig.BACKOFF_FACTOR ** job.attempts
+        self._put_back(job)
+
+    def _finish(self, job: _Job, result: Any, key: Optional[int] = None) -> None:
+        with self._cond:
+            if key is not None:
+                job.running.pop(key, None)
+            if job.done:
+                # A hedged copy already answered; drop the slower response
+                logger.info(f"Ignoring slower duplicate response for task {job.index}")
+                self._cond.notify_all()
+                return
+            job.done = True
+            if job in self._running:
+                self._running.remove(job)
+            if job.hedged:
+                logger.info(f"Task {job.index} answered first by API key {key}")
+            self._results[job.index] = result
+            self._remaining -= 1
+            self._cond.notify_all()
+
+        if self.on_progress is not None:
+            try:
+                self.on_progress(result)
+            except Exception as e:
+                logger.debug(f"Progress callback failed: {str(e)}")
+
+    def _fail_remaining(self, message: str) -> None:
+        with self._cond:
+            for job in self._queue:
+                errors = "; ".join(job.errors) if job.errors else message
+                self._results[job.index] = {"error": f"{message}. Errors: {errors}", "task": job.task}
+            self._remaining -= len(self._queue)
+            self._queue = []
+            self._cond.notify_all()
+
+
+def wait_for_stragglers(timeout: Optional[float] = None) -> bool:
+    """
+    Wait for losing hedge copies of finished runs, so their inputs can be freed.
+
+    Copies still running at the timeout are abandoned: they keep running, but
+    their outcome is ignored and never recorded against their key.
+
+    Args:
+        timeout: Maximum seconds to wait in total (defaults to HEDGE_DRAIN_TIMEOUT)
+
+    Returns:
+        True if every copy finished in time
+    """
+    if timeout is None:
+        timeout = ProcessingConfig.HEDGE_DRAIN_TIMEOUT
+    deadline = time.monotonic() + timeout
+    with _schedulers_lock:
+        schedulers = list(_schedulers)
+    settled = True
+    for scheduler in schedulers:
+        if scheduler.wait_settled(max(0.0, deadline - time.monotonic())):
+            with _schedulers_lock:
+                _schedulers.discard(scheduler)
+        else:
+            settled = False
+    if not settled:
+        logger.warning("Abandoning losing hedge copies that are still running")
+    return settled
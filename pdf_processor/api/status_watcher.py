@@ -0,0 +1,221 @@
+"""
+Shared PROCESSING-state watcher for uploaded Gemini files.
+One background thread per API key polls every in-flight upload on an
+adaptive schedule and wakes each waiter as soon as its file is ready.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from ..utils.config import ProcessingConfig
+from ..utils.exceptions import FileUploadError
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class _Watch:
+    """State for one in-flight upload."""
+
+    def __init__(self, file: Any, size_bytes: int, estimate: float):
+        self.file = file
+        self.size_bytes = size_bytes
+        self.estimate = estimate
+        self.started_at = time.monotonic()
+        self.next_poll = self.started_at
+        self.polls = 0
+        self.errors = 0
+        self.error: Optional[Exception] = None
+        self.done = threading.Event()
+
+
+class FileStatusWatcher:
+    """Tracks all in-flight uploads for one API key."""
+
+    def __init__(self, get_file: Callable[[str], Any],
+                 initial_interval: Optional[float] = None,
+                 max_interval: Optional[float] = None,
+                 backoff_factor: float = 1.5,
+                 seconds_per_mb: Optional[float] = None):
+        """
+        Initialize the watcher.
+
+        Args:
+            get_file: Callable returning the current file object for a file name (may raise)
+            initial_interval: Delay before the first poll, in seconds
+            max_interval: Upper bound for the polling interval, in seconds
+            backoff_factor: Growth factor applied to the interval after each poll
+            seconds_per_mb: Initial estimate of PROCESSING time per MB
+        """
+        self.get_file = get_file
+        self.initial_interval = initial_interval or ProcessingConfig.UPLOAD_POLL_INITIAL_INTERVAL
+        self.max_interval = max_interval or ProcessingConfig.UPLOAD_POLL_MAX_INTERVAL
+        self.backoff_factor = backoff_factor
+        self.seconds_per_mb = seconds_per_mb or ProcessingConfig.UPLOAD_PROCESSING_SECONDS_PER_MB
+        self._watches: Dict[str, _Watch] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def estimate_processing_time(self, size_bytes: int) -> float:
+        """
+        Estimate how long a file of the given size stays in PROCESSING.
+
+        Args:
+            size_bytes: File size in bytes
+
+        Returns:
+            Estimated seconds
+        """
+        return self.initial_interval + (size_bytes / (1024 * 1024)) * self.seconds_per_mb
+
+    def wait_until_active(self, file: Any, size_bytes: int = 0,
+                          timeout: Optional[float] = None) -> Any:
+        """
+        Block until an uploaded file leaves the PROCESSING state.
+
+        Args:
+            file: Uploaded file object
+            size_bytes: Size of the uploaded file (used for the poll schedule)
+            timeout: Maximum seconds to wait
+
+        Returns:
+            Latest file object
+
+        Raises:
+            FileUploadError: If polling fails repeatedly or the timeout expires
+        """
+        if file.state.name != "PROCESSING":
+            return file
+
+        if timeout is None:
+            timeout = ProcessingConfig.UPLOAD_PROCESSING_TIMEOUT
+
+        with self._cond:
+            watch = self._watches.get(file.name)
+            if watch is None:
+                watch = _Watch(file, size_bytes, self.estimate_processing_time(size_bytes))
+                # First poll when the file should be ready; a misestimate still leaves
+                # half the timeout for the backoff schedule
+                watch.next_poll = watch.started_at + min(watch.estimate, timeout / 2)
+                self._watches[file.name] = watch
+                self._ensure_started()
+                self._cond.notify_all()
+
+        if not watch.done.wait(timeout):
+            with self._cond:
+                self._watches.pop(file.name, None)
+            raise FileUploadError(f"Timed out waiting for {file.display_name} to finish processing")
+
+        if watch.error is not None:
+            raise FileUploadError(f"Failed to poll {file.display_name}: {str(watch.error)}")
+
+        return watch.file
+
+    def pending_count(self) -> int:
+        """Get the number of uploads still being watched."""
+        with self._cond:
+            return len(self._watches)
+
+    def _ensure_started(self) -> None:
+        """Start the polling thread if needed (caller holds the condition)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="gemini-status-watcher", daemon=True
+            )
+            self._thread.start()
+
+    def _next_delay(self, watch: _Watch) -> float:
+        """Compute the delay before the next poll of a watch (backing off after the first)."""
+        delay = min(self.max_interval, self.initial_interval * (self.backoff_factor ** watch.polls))
+        elapsed = time.monotonic() - watch.started_at
+        if elapsed < watch.estimate:
+            # Don't sleep past the point where the file is expected to be ready
+            delay = min(delay, max(self.initial_interval, watch.estimate - elapsed))
+        return delay
+
+    def _record_processing_time(self, watch: _Watch) -> None:
+        """Fold an observed PROCESSING duration into the per-MB estimate."""
+        size_mb = watch.size_bytes / (1024 * 1024)
+        if size_mb < 1:
+            return
+        observed = (time.monotonic() - watch.started_at) / size_mb
+        self.seconds_per_mb = 0.8 * self.seconds_per_mb + 0.2 * observed
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._watches:
+                    self._cond.wait()
+                now = time.monotonic()
+                due = [w for w in self._watches.values() if w.next_poll <= now]
+                if not due:
+                    wake_at = min(w.next_poll for w in self._watches.values())
+                    self._cond.wait(wake_at - now)
+                    continue
+
+            for watch in due:
+                self._poll(watch)
+
+    def _poll(self, watch: _Watch) -> None:
+        """Poll a single watch and wake its waiters when finished."""
+        name = watch.file.name
+        try:
+            latest = self.get_file(name)
+            watch.errors = 0
+        except Exception as e:
+            watch.errors += 1
+            logger.warning(f"Status poll failed for {watch.file.display_name} "
+                           f"(attempt {watch.errors}): {str(e)}")
+            if watch.errors >= ProcessingConfig.MAX_RETRIES:
+                watch.error = e
+                self._finish(watch)
+                return
+            latest = None
+
+        watch.polls += 1
+        if latest is not None:
+            watch.file = latest
+            if latest.state.name != "PROCESSING":
+                logger.debug(f"{latest.display_name} is {latest.state.name} after "
+                             f"{time.monotonic() - watch.started_at:.2f}s ({watch.polls} polls)")
+                if latest.state.name == "ACTIVE":
+                    self._record_processing_time(watch)
+                self._finish(watch)
+                return
+
+        logger.debug(f"Processing {watch.file.display_name}...")
+        with self._cond:
+            watch.next_poll = time.monotonic() + self._next_delay(watch)
+
+    def _finish(self, watch: _Watch) -> None:
+        with self._cond:
+            self._watches.pop(watch.file.name, None)
+        watch.done.set()
+
+
+# One watcher per API key
+_watchers: Dict[str, FileStatusWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def get_status_watcher(api_key: Optional[str], get_file: Callable[[str], Any]) -> FileStatusWatcher:
+    """
+    Get the shared status watcher for an API key.
+
+    Args:
+        api_key: API key the uploads belong to (None for the default key)
+        get_file: Callable used to poll file state if the watcher is created
+
+    Returns:
+        FileStatusWatcher for the key
+    """
+    fingerprint = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+    with _watchers_lock:
+        watcher = _watchers.get(fingerprint)
+        if watcher is None:
+            watcher = FileStatusWatcher(get_file)
+            _watchers[fingerprint] = watcher
+    return watcher
@@ -0,0 +1,320 @@
+"""
+Per-key transport for the Gemini API.
+Each transport owns its own SDK client objects, so threads using different
+API keys never race on the process-global genai.configure() state.
+"""
+
+import io
+import os
+import json
+import mimetypes
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from google.api_core import exceptions as api_exceptions
+
+import google.generativeai as genai
+from google.generativeai import caching
+from google.generativeai import client as genai_client
+from google.generativeai import protos
+from google.generativeai.types import file_types
+
+from ..utils.config import ProcessingConfig
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# REST endpoint of the Batch API (not wrapped by google-generativeai 0.8)
+BATCH_API_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+
+class GenAITransport:
+    """Gemini API access bound to a single API key."""
+
+    def __init__(self, api_key: Optional[str] = None):
+        """
+        Initialize the transport.
+
+        Args:
+            api_key: API key to bind to. When omitted, the globally configured
+                key is used (genai.configure / GOOGLE_API_KEY).
+        """
+        self.api_key = api_key
+        self._clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+        if api_key:
+            self._client_manager = genai_client._ClientManager()
+            self._client_manager.configure(api_key=api_key)
+        else:
+            self._client_manager = None
+
+    def _get_client(self, name: str) -> Any:
+        """Get (and lazily create) an SDK service client for this key."""
+        if self._client_manager is None:
+            return genai_client._client_manager.get_default_client(name)
+
+        with self._lock:
+            if name not in self._clients:
+                self._clients[name] = self._client_manager.get_default_client(name)
+            return self._clients[name]
+
+    def bind_model(self, model: Any) -> Any:
+        """
+        Route a GenerativeModel's requests through this transport's key.
+
+        Args:
+            model: GenerativeModel instance
+
+        Returns:
+            The same model instance
+        """
+        if self._client_manager is not None:
+            model._client = self._get_client("generative")
+        return model
+
+    def create_model(self, **model_config) -> Any:
+        """
+        Create a GenerativeModel bound to this transport's key.
+
+        Args:
+            model_config: Keyword arguments for genai.GenerativeModel
+
+        Returns:
+            Bound GenerativeModel instance
+        """
+        return self.bind_model(genai.GenerativeModel(**model_config))
+
+    def upload_file(self, file_path: Union[str, bytes, io.IOBase], display_name: Optional[str] = None,
+                    mime_type: Optional[str] = None) -> Any:
+        """
+        Upload a file.
+
+        Args:
+            file_path: Path to the file, or its content as bytes or a binary buffer
+            display_name: Optional display name
+            mime_type: Optional MIME type (guessed from the extension if omitted;
+                PDF for buffers)
+
+        Returns:
+            Uploaded file object
+        """
+        if isinstance(file_path, (bytes, bytearray, memoryview)):
+            file_path = io.BytesIO(file_path)
+        if isinstance(file_path, io.IOBase):
+            # Uploaded straight from memory, without a temp file
+            source = file_path
+            mime_type = mime_type or "application/pdf"
+        else:
+            source = Path(file_path)
+            if display_name is None:
+                display_name = source.name
+            if mime_type is None:
+                mime_type, _ = mimetypes.guess_type(str(source))
+
+        response = self._get_client("file").create_file(
+            path=source, mime_type=mime_type, display_name=display_name, resumable=True
+        )
+        return file_types.File(response)
+
+    def get_file(self, file_name: str) -> Any:
+        """Get a file by name."""
+        if "/" not in file_name:
+            file_name = f"files/{file_name}"
+        return file_types.File(self._get_client("file").get_file(name=file_name))
+
+    def delete_file(self, file_name: str) -> None:
+        """Delete a file by name."""
+        if "/" not in file_name:
+            file_name = f"files/{file_name}"
+        self._get_client("file").delete_file(request=protos.DeleteFileRequest(name=file_name))
+
+    def list_files(self, page_size: int = 100) -> List[Any]:
+        """List all files uploaded under this key."""
+        response = self._get_client("file").list_files(protos.ListFilesRequest(page_size=page_size))
+        return [file_types.File(proto) for proto in response]
+
+    def create_cached_content(self, model_name: str, system_instruction: Optional[str] = None,
+                              contents: Optional[List[Any]] = None, ttl_seconds: int = 3600,
+                              display_name: Optional[str] = None) -> Any:
+        """
+        Create a server-side cached context.
+
+        Args:
+            model_name: Model the context is created for (it can only be used with that model)
+            system_instruction: System instruction stored in the context
+            contents: Uploaded files stored in the context
+            ttl_seconds: Lifetime of the context
+            display_name: Optional display name
+
+        Returns:
+            CachedContent object
+        """
+        request = caching.CachedContent._prepare_create_request(
+            model=model_name,
+            display_name=display_name,
+            system_instruction=system_instruction,
+            contents=contents,
+            ttl=int(ttl_seconds)
+        )
+        response = self._get_client("cache").create_cached_content(request)
+        return caching.CachedContent._from_obj(response)
+
+    def delete_cached_content(self, name: str) -> None:
+        """Delete a cached context by name."""
+        self._get_client("cache").delete_cached_content(
+            request=protos.DeleteCachedContentRequest(name=name)
+        )
+
+    def create_cached_model(self, cached_content: Any,
+                            generation_config: Optional[Dict[str, Any]] = None,
+                            safety_settings: Optional[Any] = None) -> Any:
+        """
+        Create a GenerativeModel that runs on top of a cached context, bound to this key.
+
+        Args:
+            cached_content: CachedContent returned by create_cached_content
+            generation_config: Generation config of the model
+            safety_settings: Safety settings of the model
+
+        Returns:
+            Bound GenerativeModel instance
+        """
+        model = genai.GenerativeModel.from_cached_content(
+            cached_content, generation_config=generation_config, safety_settings=safety_settings
+        )
+        return self.bind_model(model)
+
+    def create_batch(self, model: Any, requests: List[Tuple[str, List[Any]]],
+                     display_name: Optional[str] = None) -> str:
+        """
+        Submit generation requests as one asynchronous batch job.
+
+        Args:
+            model: GenerativeModel whose name, generation config and safety settings are used
+            requests: (key, content) pairs; content is prompt text and uploaded files
+            display_name: Optional display name of the batch
+
+        Returns:
+            Batch name (e.g. "batches/abc123")
+        """
+        request_template: Dict[str, Any] = {}
+        generation_config = getattr(model, "_generation_config", None)
+        if generation_config:
+            request_template["generation_config"] = dict(generation_config)
+        safety_settings = getattr(model, "_safety_settings", None)
+        if safety_settings:
+            request_template["safety_settings"] = [
+                {"category": getattr(category, "name", str(category)),
+                 "threshold": getattr(threshold, "name", str(threshold))}
+                for category, threshold in safety_settings.items()
+            ]
+
+        inlined = []
+        for key, content in requests:
+            request = dict(request_template)
+            request["contents"] = [{"role": "user", "parts": self._rest_parts(content)}]
+            inlined.append({"request": request, "metadata": {"key": key}})
+
+        model_name = getattr(model, "model_name", "")
+        if "/" not in model_name:
+            model_name = f"models/{model_name}"
+        response = self._rest("POST", f"{model_name}:batchGenerateContent", {
+            "batch": {
+                "display_name": display_name or "jokbodude-batch",
+                "input_config": {"requests": {"requests": inlined}}
+            }
+        })
+        return response["name"]
+
+    def get_batch(self, batch_name: str) -> Dict[str, Any]:
+        """
+        Get the state of a batch job.
+
+        Args:
+            batch_name: Name returned by create_batch
+
+        Returns:
+            {"state": "BATCH_STATE_...", "done": bool, "results": {key: {"text", "finish_reason"}
+            or {"error"}}}; results are only filled in once the batch has succeeded
+        """
+        operation = self._rest("GET", batch_name)
+        metadata = operation.get("metadata", {})
+        state = metadata.get("state", "BATCH_STATE_UNSPECIFIED")
+
+        results: Dict[str, Dict[str, Any]] = {}
+        output = operation.get("response") or metadata.get("output") or {}
+        inlined = output.get("inlinedResponses", [])
+        if isinstance(inlined, dict):
+            inlined = inlined.get("inlinedResponses", [])
+        for position, entry in enumerate(inlined):
+            key = (entry.get("metadata") or {}).get("key", str(position))
+            if "error" in entry:
+                results[key] = {"error": entry["error"].get("message", str(entry["error"]))}
+                continue
+            candidates = (entry.get("response") or {}).get("candidates") or [{}]
+            parts = (candidates[0].get("content") or {}).get("parts") or []
+            results[key] = {
+                "text": "".join(part.get("text", "") for part in parts),
+                "finish_reason": candidates[0].get("finishReason", "FINISH_REASON_UNSPECIFIED")
+            }
+
+        if operation.get("error"):
+            state = "BATCH_STATE_FAILED"
+        return {"state": state, "done": bool(operation.get("done")), "results": results,
+                "error": (operation.get("error") or {}).get("message")}
+
+    def cancel_batch(self, batch_name: str) -> None:
+        """Cancel a batch job."""
+        self._rest("POST", f"{batch_name}:cancel", {})
+
+    @staticmethod
+    def _rest_parts(content: List[Any]) -> List[Dict[str, Any]]:
+        """Convert prompt text and uploaded files to REST content parts."""
+        parts = []
+        for part in content:
+            if isinstance(part, str):
+                parts.append({"text": part})
+            else:
+                parts.append({"file_data": {
+                    "file_uri": part.uri,
+                    "mime_type": getattr(part, "mime_type", None) or "application/pdf"
+                }})
+        return parts
+
+    def _rest(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Call the REST API with this transport's key, raising google.api_core exceptions."""
+        client_manager = self._client_manager or genai_client._client_manager
+        options = client_manager.client_config.get("client_options")
+        api_key = getattr(options, "api_key", None) or os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+
+        request = urllib.request.Request(
+            f"{BATCH_API_URL}/{path}",
+            data=json.dumps(body).encode("utf-8") if body is not None else None,
+            method=method,
+            headers={"x-goog-api-key": api_key or "", "Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                return json.loads(response.read().decode("utf-8") or "{}")
+        except urllib.error.HTTPError as e:
+            raise api_exceptions.from_http_status(e.code, e.read().decode("utf-8", errors="replace"))
+
+
+def create_transport(api_key: Optional[str] = None) -> Any:
+    """
+    Create the transport for the configured backend.
+
+    Args:
+        api_key: API key to bind to (None for the globally configured key)
+
+    Returns:
+        GenAITransport, or FakeGenAITransport when GEMINI_BACKEND=fake
+    """
+    if ProcessingConfig.GEMINI_BACKEND == "fake":
+        from .fake_backend import FakeGenAITransport
+        return FakeGenAITransport(api_key)
+    return GenAITransport(api_key)
@@ -0,0 +1,299 @@
+"""
+Content-addressed cache of files uploaded to the Gemini File API.
+Lets repeated analyses reuse a remote file handle instead of re-uploading.
+"""
+
+import os
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Any, Tuple
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from ..utils.config import ProcessingConfig
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Gemini keeps uploaded files for 48 hours; used when the API omits expiration_time
+DEFAULT_FILE_TTL = timedelta(hours=48)
+
+# Content hashes memoized by (path, size, mtime)
+_hash_memo: Dict[Tuple[str, int, int], str] = {}
+_hash_memo_lock = threading.Lock()
+
+
+def hash_file(file_path: str) -> str:
+    """
+    Compute the SHA-256 of a file's bytes, memoized by path, size and mtime.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Hex digest of the file content
+    """
+    stat = os.stat(file_path)
+    memo_key = (str(Path(file_path).resolve()), stat.st_size, stat.st_mtime_ns)
+
+    with _hash_memo_lock:
+        cached = _hash_memo.get(memo_key)
+    if cached:
+        return cached
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    content_hash = digest.hexdigest()
+
+    with _hash_memo_lock:
+        _hash_memo[memo_key] = content_hash
+    return content_hash
+
+
+def hash_bytes(data: bytes) -> str:
+    """
+    Compute the SHA-256 of an in-memory file's bytes.
+
+    Args:
+        data: File content
+
+    Returns:
+        Hex digest of the content (same as hash_file for the same bytes on disk)
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+class UploadCache:
+    """
+    Persistent cache mapping (file content, API key) to uploaded file names.
+
+    Retention is capped per API key by file count and total size; the least
+    recently used uploads beyond the cap are dropped from the cache, so the
+    next delete or garbage collection pass removes them from the server.
+    """
+
+    def __init__(self, cache_path: Optional[str] = None,
+                 safety_margin: Optional[timedelta] = None,
+                 max_files: Optional[int] = None, max_bytes: Optional[int] = None):
+        """
+        Initialize the upload cache.
+
+        Args:
+            cache_path: Path of the SQLite index database
+            safety_margin: Entries expiring within this margin are treated as misses
+            max_files: Uploads retained per API key
+            max_bytes: Total size of the uploads retained per API key
+        """
+        self.cache_path = Path(cache_path or ProcessingConfig.UPLOAD_CACHE_PATH)
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        if safety_margin is None:
+            safety_margin = timedelta(minutes=ProcessingConfig.UPLOAD_CACHE_SAFETY_MARGIN_MINUTES)
+        self.safety_margin = safety_margin
+        self.max_files = max_files or ProcessingConfig.UPLOAD_CACHE_MAX_FILES
+        self.max_bytes = max_bytes or ProcessingConfig.UPLOAD_CACHE_MAX_MB * 1024 * 1024
+        self._local = threading.local()
+
+        # SQLite serializes writers across every process sharing the index
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            "key TEXT PRIMARY KEY, name TEXT NOT NULL, key_fp TEXT NOT NULL, display_name TEXT, "
+            "size INTEGER NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS uploads_name ON uploads (name)")
+        conn.execute("CREATE INDEX IF NOT EXISTS uploads_lru ON uploads (key_fp, last_used)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.cache_path), timeout=10, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _key_fingerprint(api_key: Optional[str]) -> str:
+        """Fingerprint an API key so raw keys are never written to disk."""
+        key = api_key or os.getenv('GEMINI_API_KEY') or ""
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+    def hash_file(self, file_path: str) -> str:
+        """
+        Compute the SHA-256 of a file's bytes (see hash_file).
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            Hex digest of the file content
+        """
+        return hash_file(file_path)
+
+    def make_key(self, file_path: str, api_key: Optional[str] = None,
+                 content_hash: Optional[str] = None) -> str:
+        """
+        Build the cache key for a file uploaded under an API key.
+
+        Args:
+            file_path: Path to the file
+            api_key: API key the file will be uploaded with
+            content_hash: Content hash, if already known (e.g. of an in-memory buffer)
+
+        Returns:
+            Cache key string
+        """
+        content_hash = content_hash or self.hash_file(file_path)
+        return f"{content_hash}:{self._key_fingerprint(api_key)}"
+
+    def lookup(self, cache_key: str, safety_margin: Optional[timedelta] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get a cache entry that is not expired (taking the safety margin into account).
+
+        Args:
+            cache_key: Key returned by make_key
+            safety_margin: Time the file must still be kept for, if longer than the
+                cache's own margin (e.g. for a batch that can wait for hours)
+
+        Returns:
+            Entry dictionary or None on miss
+        """
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT name, display_name, expires_at FROM uploads WHERE key = ?", (cache_key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        name, display_name, expires_at = row
+        now = time.time()
+        if now + self.safety_margin.total_seconds() >= expires_at:
+            logger.debug(f"Upload cache entry expired: {display_name}")
+            conn.execute("DELETE FROM uploads WHERE key = ?", (cache_key,))
+            return None
+        if safety_margin is not None and now + safety_margin.total_seconds() >= expires_at:
+            # Still good for shorter uses; this caller uploads a fresh copy
+            logger.debug(f"Cached upload {display_name} expires too soon to reuse")
+            return None
+
+        conn.execute("UPDATE uploads SET last_used = ? WHERE key = ?", (now, cache_key))
+        return {
+            "name": name,
+            "display_name": display_name,
+            "expiration": datetime.fromtimestamp(expires_at, timezone.utc).isoformat()
+        }
+
+    def store(self, cache_key: str, file: Any, size_bytes: int = 0) -> None:
+        """
+        Record an uploaded file under a cache key, evicting beyond the key's cap.
+
+        Args:
+            cache_key: Key returned by make_key
+            file: Uploaded file object
+            size_bytes: Size of the uploaded content
+        """
+        expiration = getattr(file, "expiration_time", None)
+        if isinstance(expiration, datetime):
+            if expiration.tzinfo is None:
+                expiration = expiration.replace(tzinfo=timezone.utc)
+        else:
+            expiration = datetime.now(timezone.utc) + DEFAULT_FILE_TTL
+        display_name = getattr(file, "display_name", None)
+        key_fp = cache_key.rsplit(":", 1)[-1]
+
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO uploads (key, name, key_fp, display_name, size, expires_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cache_key, file.name, key_fp, display_name, size_bytes, expiration.timestamp(), now)
+            )
+            conn.execute("DELETE FROM uploads WHERE expires_at <= ?", (now,))
+            count, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM uploads WHERE key_fp = ?", (key_fp,)
+            ).fetchone()
+            evicted = []
+            if count > self.max_files or total > self.max_bytes:
+                for old_key, old_name, old_size in conn.execute(
+                        "SELECT key, name, size FROM uploads WHERE key_fp = ? AND key != ? "
+                        "ORDER BY last_used", (key_fp, cache_key)
+                ).fetchall():
+                    if count <= self.max_files and total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM uploads WHERE key = ?", (old_key,))
+                    evicted.append(old_name)
+                    count -= 1
+                    total -= old_size
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        logger.debug(f"Cached upload {file.name} ({display_name})")
+        if evicted:
+            logger.info(f"Upload cache full, no longer retaining {len(evicted)} uploads")
+
+    def invalidate(self, cache_key: str) -> None:
+        """Remove an entry from the cache."""
+        self._connect().execute("DELETE FROM uploads WHERE key = ?", (cache_key,))
+
+    def invalidate_name(self, file_name: str) -> None:
+        """Remove every entry that points at the given remote file name."""
+        self._connect().execute("DELETE FROM uploads WHERE name = ?", (file_name,))
+
+    def is_cached_name(self, file_name: str) -> bool:
+        """
+        Check whether a remote file is owned by the cache.
+
+        Cached files are retained until expiry or eviction instead of being deleted after use.
+        """
+        row = self._connect().execute(
+            "SELECT 1 FROM uploads WHERE name = ? AND expires_at > ? LIMIT 1",
+            (file_name, time.time() + self.safety_margin.total_seconds())
+        ).fetchone()
+        return row is not None
+
+    def clear(self) -> None:
+        """Drop all cache entries."""
+        self._connect().execute("DELETE FROM uploads")
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM uploads").fetchone()[0]
+
+
+# Global cache instance
+_global_upload_cache: Optional[UploadCache] = None
+_upload_cache_lock = threading.Lock()
+
+
+def get_global_upload_cache() -> Optional[UploadCache]:
+    """
+    Get the global upload cache instance.
+
+    Returns:
+        Global UploadCache instance, or None if caching is disabled
+    """
+    global _global_upload_cache
+
+    if not ProcessingConfig.UPLOAD_CACHE_ENABLED:
+        return None
+
+    with _upload_cache_lock:
+        if _global_upload_cache is None:
+            cache_path = Path(ProcessingConfig.UPLOAD_CACHE_PATH)
+            if ProcessingConfig.GEMINI_BACKEND == "fake":
+                # Fake uploads must never be offered to the real API
+                cache_path = cache_path.with_name(f"{cache_path.stem}.fake{cache_path.suffix}")
+            try:
+                _global_upload_cache = UploadCache(str(cache_path))
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Upload cache unavailable: {str(e)}")
+                return None
+            logger.info(f"Created upload cache at {_global_upload_cache.cache_path}")
+
+    return _global_upload_cache
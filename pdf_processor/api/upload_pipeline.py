@@ -0,0 +1,146 @@
+"""
+Background upload pipeline for Gemini file uploads.
+Overlaps uploads of upcoming files with content generation and defers
+deletes to the file garbage collector so neither sits on the critical path.
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from ..utils.config import ProcessingConfig
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+# Shared executor for all pipelines so short-lived analyzers don't leak threads
+_upload_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_upload_executor() -> ThreadPoolExecutor:
+    """
+    Get the shared upload executor.
+
+    Returns:
+        ThreadPoolExecutor used for background uploads
+    """
+    global _upload_executor
+
+    with _executor_lock:
+        if _upload_executor is None:
+            _upload_executor = ThreadPoolExecutor(
+                max_workers=ProcessingConfig.UPLOAD_PIPELINE_WORKERS,
+                thread_name_prefix="gemini-upload"
+            )
+    return _upload_executor
+
+
+class UploadPipeline:
+    """Prefetches uploads in the background and defers deletes."""
+
+    def __init__(self, api_client, file_manager, cache_margin: Optional[timedelta] = None):
+        """
+        Initialize the upload pipeline.
+
+        Args:
+            api_client: Gemini API client used for uploads
+            file_manager: File manager that tracks and deletes uploads
+            cache_margin: Time reused cached uploads must still be kept for
+                (defaults to the upload cache's safety margin)
+        """
+        self.api_client = api_client
+        self.file_manager = file_manager
+        self.cache_margin = cache_margin
+        self._pending: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, file_path: str, display_name: str) -> Future:
+        """
+        Start uploading a file in the background.
+
+        Repeated calls for the same (file_path, display_name) return the same future.
+
+        Args:
+            file_path: Path to the file
+            display_name: Display name for the upload
+
+        Returns:
+            Future resolving to the uploaded file object
+        """
+        key = (str(file_path), display_name)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                logger.debug(f"Prefetching upload: {display_name}")
+                future = get_upload_executor().submit(
+                    self.api_client.upload_file, file_path, display_name, cache_margin=self.cache_margin
+                )
+                self._pending[key] = future
+            return future
+
+    def acquire(self, file_path: str, display_name: str) -> Any:
+        """
+        Get the uploaded file, waiting on a prefetch or uploading inline.
+
+        Args:
+            file_path: Path to the file
+            display_name: Display name for the upload
+
+        Returns:
+            Uploaded file object (tracked by the file manager)
+
+        Raises:
+            FileUploadError: If the upload fails
+        """
+        with self._lock:
+            future = self._pending.pop((str(file_path), display_name), None)
+
+        if future is not None:
+            uploaded_file = future.result()
+        else:
+            uploaded_file = self.api_client.upload_file(file_path, display_name, cache_margin=self.cache_margin)
+
+        self.file_manager.track_file(uploaded_file, self.api_client.transport)
+        return uploaded_file
+
+    def release(self, file: Any) -> None:
+        """
+        Hand a file to the file garbage collector for deletion.
+
+        Args:
+            file: Uploaded file object
+        """
+        self.file_manager.schedule_delete(file)
+
+    def discard(self, file_path: str, display_name: str) -> None:
+        """
+        Drop a prefetch that will not be used, deleting the upload once it lands.
+
+        Args:
+            file_path: Path to the file
+            display_name: Display name used for the prefetch
+        """
+        with self._lock:
+            future = self._pending.pop((str(file_path), display_name), None)
+        if future is None:
+            return
+
+        def _release_when_done(f: Future) -> None:
+            try:
+                uploaded_file = f.result()
+            except Exception:
+                return
+            self.file_manager.track_file(uploaded_file, self.api_client.transport)
+            self.release(uploaded_file)
+
+        future.add_done_callback(_release_when_done)
+
+    def discard_all(self) -> None:
+        """Drop every outstanding prefetch."""
+        with self._lock:
+            keys = list(self._pending.keys())
+        for file_path, display_name in keys:
+            self.discard(file_path, display_name)
@@ -0,0 +1,113 @@
+"""
+Batch execution of analysis jobs.
+Collects every (prompt, files) request of a job, submits them as one Gemini
+batch job and hands each response back to its analyzer for parsing.
+"""
+
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+from ..api.client import GeminiAPIClient
+from ..api.file_manager import FileManager
+from ..api.upload_pipeline import UploadPipeline
+from ..utils.config import ProcessingConfig
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class BatchJob:
+    """Analysis requests of one job, run as a single batch."""
+
+    def __init__(self, api_client: GeminiAPIClient, file_manager: FileManager, display_name: str):
+        """
+        Initialize the batch job.
+
+        Args:
+            api_client: Gemini API client the batch is submitted with
+            file_manager: File manager tracking the uploads
+            display_name: Display name of the batch
+        """
+        self.api_client = api_client
+        # Reused uploads must outlive the batch, which can wait BATCH_TIMEOUT_HOURS for results
+        cfg = ProcessingConfig
+        self.upload_pipeline = UploadPipeline(api_client, file_manager, cache_margin=timedelta(
+            hours=cfg.BATCH_TIMEOUT_HOURS, minutes=cfg.UPLOAD_CACHE_SAFETY_MARGIN_MINUTES
+        ))
+        self.display_name = display_name
+        self._requests: List[Tuple[str, str, List[Tuple[str, str]], Callable[[str], Dict[str, Any]]]] = []
+
+    def __len__(self) -> int:
+        return len(self._requests)
+
+    def add(self, key: str, prompt: str, files: List[Tuple[str, str]],
+            on_response: Callable[[str], Dict[str, Any]]) -> None:
+        """
+        Add a request to the batch.
+
+        Args:
+            key: Unique key of the request
+            prompt: Analysis prompt
+            files: (file_path, display_name) tuples attached after the prompt, in order
+            on_response: Converts the response text into the request's result
+        """
+        self._requests.append((key, prompt, list(files), on_response))
+
+    def run(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Upload the files, run the batch and convert every response.
+
+        Each distinct file is uploaded once, however many requests attach it.
+
+        Returns:
+            Mapping of request key to result ({"error": ...} for failed requests)
+
+        Raises:
+            APIError: If the batch as a whole fails
+        """
+        unique_files = list(dict.fromkeys(spec for _, _, files, _ in self._requests for spec in files))
+        uploaded: Dict[Tuple[str, str], Any] = {}
+        results: Dict[str, Dict[str, Any]] = {}
+
+        try:
+            for file_path, display_name in unique_files:
+                self.upload_pipeline.prefetch(file_path, display_name)
+            for spec in unique_files:
+                try:
+                    uploaded[spec] = self.upload_pipeline.acquire(*spec)
+                except Exception as e:
+                    logger.error(f"Failed to upload {spec[1]} for batch: {str(e)}")
+
+            batch_requests = []
+            for key, prompt, files, _ in self._requests:
+                missing = [spec[1] for spec in files if spec not in uploaded]
+                if missing:
+                    results[key] = {"error": f"Upload failed: {missing[0]}"}
+                    continue
+                batch_requests.append((key, [prompt] + [uploaded[spec] for spec in files]))
+
+            outputs = {}
+            if batch_requests:
+                outputs = self.api_client.generate_batch(batch_requests, display_name=self.display_name)
+
+            for key, _, _, on_response in self._requests:
+                if key in results:
+                    continue
+                output = outputs.get(key)
+                if output is None or isinstance(output, Exception):
+                    results[key] = {"error": str(output or "No response")}
+                    continue
+                try:
+                    results[key] = on_response(output)
+                except Exception as e:
+                    logger.error(f"Failed to process batch response {key}: {str(e)}")
+                    results[key] = {"error": str(e)}
+        finally:
+            # Drop uploads that never completed and defer deletes of the rest
+            for spec in unique_files:
+                if spec in uploaded:
+                    self.upload_pipeline.release(uploaded[spec])
+                else:
+                    self.upload_pipeline.discard(*spec)
+
+        return results
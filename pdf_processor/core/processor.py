@@ -7,18 +7,23 @@ import random
 import string
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, List, Optional, Union
+from typing import Callable, Dict, Any, List, Optional, Union
 import json
 import shutil
+from functools import partial
 
 import os
 from ..api.client import GeminiAPIClient
 from ..api.file_manager import FileManager
 from ..api.multi_api_manager import MultiAPIManager
+from ..api.scheduler import wait_for_stragglers
 from ..analyzers.lesson_centric import LessonCentricAnalyzer
 from ..analyzers.jokbo_centric import JokboCentricAnalyzer
 from ..analyzers.multi_api_analyzer import MultiAPIAnalyzer
+from ..parsers.result_merger import ResultMerger
 from ..pdf.cache import get_global_cache, clear_global_cache
+from .batch import BatchJob
+from ..utils.config import ProcessingConfig
 from ..utils.logging import get_logger
 from ..utils.exceptions import PDFProcessorError
 
@@ -28,15 +33,19 @@ logger = get_logger(__name__)
 class PDFProcessor:
     """Main orchestrator for PDF processing tasks."""
     
-    def __init__(self, model, session_id: Optional[str] = None):
+    def __init__(self, model, session_id: Optional[str] = None,
+                 batch_mode: Optional[bool] = None):
         """
         Initialize the PDF processor.
         
         Args:
             model: Gemini model instance
             session_id: Optional session ID for tracking
+            batch_mode: Run analyses as one asynchronous batch job
+                (defaults to BATCH_MODE)
         """
         self.model = model
+        self.batch_mode = ProcessingConfig.BATCH_MODE if batch_mode is None else batch_mode
         self.api_client = GeminiAPIClient(model)
         self.file_manager = FileManager()
         
@@ -86,6 +95,9 @@ class PDFProcessor:
         Returns:
             Analysis results
         """
+        if self.batch_mode:
+            return self.analyze_lesson_centric_batch(jokbo_paths, lesson_path)
+        
         logger.info(f"Starting lesson-centric analysis: {len(jokbo_paths)} jokbos, 1 lesson")
         
         results = self.lesson_analyzer.analyze_multiple_jokbos(jokbo_paths, lesson_path)
@@ -109,6 +121,9 @@ class PDFProcessor:
         Returns:
             Analysis results
         """
+        if self.batch_mode:
+            return self.analyze_jokbo_centric_batch(lesson_paths, jokbo_path)
+        
         logger.info(f"Starting jokbo-centric analysis: {len(lesson_paths)} lessons, 1 jokbo")
         
         return self.jokbo_analyzer.analyze_multiple_lessons(lesson_paths, jokbo_path)
@@ -130,6 +145,11 @@ class PDFProcessor:
         Returns:
             Analysis results
         """
+        if self.batch_mode:
+            return self._run_batch_multi_api(
+                api_keys, partial(self.analyze_lesson_centric_batch, jokbo_paths, lesson_path)
+            )
+        
         logger.info(f"Starting multi-API lesson-centric analysis with {len(api_keys)} keys")
         
         # Create multi-API manager
@@ -141,26 +161,18 @@ class PDFProcessor:
         
         # If lesson file is large, split into chunks and distribute chunks across APIs per jokbo
         from ..pdf.operations import PDFOperations
-        chunks = PDFOperations.split_pdf_for_chunks(lesson_path)
+        chunks = PDFOperations.split_pdf_for_chunks(lesson_path, model_name=self._model_name())
         if len(chunks) > 1:
-            aggregated_results: List[Dict[str, Any]] = []
-            # Extract chunk files once
-            chunk_paths: List[tuple] = []
-            for _, start_page, end_page in chunks:
-                chunk_path = PDFOperations.extract_pages(lesson_path, start_page, end_page)
-                chunk_paths.append((chunk_path, start_page, end_page))
-            try:
-                for jokbo_path in jokbo_paths:
-                    # For lesson-centric chunking, the file being chunked is the lesson,
-                    # and the center (pre-uploaded) file is the jokbo.
-                    result = multi_analyzer.analyze_with_chunk_retry(
-                        "lesson-centric", lesson_path, jokbo_path, chunk_paths
-                    )
-                    aggregated_results.append(result)
-                results = aggregated_results
-            finally:
-                for chunk_path, _, _ in chunk_paths:
-                    Path(chunk_path).unlink(missing_ok=True)
+            # Materialize chunk files once and share them across jokbos
+            chunk_paths = PDFOperations.materialize_chunks(lesson_path, chunks)
+            results = []
+            for jokbo_path in jokbo_paths:
+                # For lesson-centric chunking, the file being chunked is the lesson,
+                # and the center (pre-uploaded) file is the jokbo.
+                result = multi_analyzer.analyze_with_chunk_retry(
+                    "lesson-centric", lesson_path, jokbo_path, chunk_paths
+                )
+                results.append(result)
         else:
             # Distribute jokbos across APIs without chunking
             file_pairs = [(jokbo_path, lesson_path) for jokbo_path in jokbo_paths]
@@ -189,6 +201,11 @@ class PDFProcessor:
         Returns:
             Analysis results
         """
+        if self.batch_mode:
+            return self._run_batch_multi_api(
+                api_keys, partial(self.analyze_jokbo_centric_batch, lesson_paths, jokbo_path)
+            )
+        
         logger.info(f"Starting multi-API jokbo-centric analysis with {len(api_keys)} keys")
         
         # Create multi-API manager
@@ -203,12 +220,11 @@ class PDFProcessor:
         chunked_lessons = []
         
         for lesson_path in lesson_paths:
-            chunks = PDFOperations.split_pdf_for_chunks(lesson_path)
+            chunks = PDFOperations.split_pdf_for_chunks(lesson_path, model_name=self._model_name())
             if len(chunks) > 1:
                 # This lesson needs chunking
                 logger.info(f"Lesson {Path(lesson_path).name} will be processed in {len(chunks)} chunks")
-                for chunk_info in chunks:
-                    chunked_lessons.append((lesson_path, chunk_info))
+                chunked_lessons.append((lesson_path, chunks))
             else:
                 # Process as single file
                 chunked_lessons.append((lesson_path, None))
@@ -236,37 +252,155 @@ class PDFProcessor:
     def _process_chunked_lessons_multi_api(self, chunked_lessons: List[tuple],
                                           jokbo_path: str, multi_analyzer: MultiAPIAnalyzer) -> List[Dict[str, Any]]:
         """Process lessons that need chunking with multi-API support."""
+        from ..pdf.operations import PDFOperations
         results = []
         
-        for lesson_path, chunk_info in chunked_lessons:
-            if chunk_info is None:
+        for lesson_path, chunks in chunked_lessons:
+            if chunks is None:
                 # Single file
                 result = multi_analyzer.analyze_jokbo_centric(lesson_path, jokbo_path)
                 results.append(result)
             else:
-                # Process chunks
-                from ..pdf.operations import PDFOperations
-                chunks = PDFOperations.split_pdf_for_chunks(lesson_path)
-                
-                # Extract chunk files
-                chunk_paths = []
-                for _, start_page, end_page in chunks:
-                    chunk_path = PDFOperations.extract_pages(lesson_path, start_page, end_page)
-                    chunk_paths.append((chunk_path, start_page, end_page))
+                # Process the lesson's chunks, planned once above
+                chunk_paths = PDFOperations.materialize_chunks(lesson_path, chunks)
                 
-                try:
-                    # Analyze chunks with retry on different APIs
-                    result = multi_analyzer.analyze_with_chunk_retry(
-                        "jokbo-centric", lesson_path, jokbo_path, chunk_paths
-                    )
-                    results.append(result)
-                finally:
-                    # Clean up chunk files
-                    for chunk_path, _, _ in chunk_paths:
-                        Path(chunk_path).unlink(missing_ok=True)
+                # Analyze chunks with retry on different APIs
+                result = multi_analyzer.analyze_with_chunk_retry(
+                    "jokbo-centric", lesson_path, jokbo_path, chunk_paths
+                )
+                results.append(result)
         
         return results
     
+    # Batch mode
+    def _run_batch_multi_api(self, api_keys: List[str],
+                             run_batch: Callable[..., Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Run a batch job on the best of the given keys instead of the global key.
+        
+        Batch jobs are not subject to per-minute limits, so one key is enough;
+        its outcome is recorded against that key like any other request.
+        
+        Args:
+            api_keys: List of API keys to choose from
+            run_batch: Batch method, called with api_client=<client of the chosen key>
+            
+        Returns:
+            Analysis results
+        """
+        api_manager = MultiAPIManager(api_keys, self._get_model_config())
+        api_index = api_manager.get_best_api()
+        if api_index is None:
+            raise PDFProcessorError("No API key is available to submit the batch")
+        logger.info(f"Submitting batch with API key {api_index} of {len(api_keys)}")
+        return api_manager.run_on_api(api_index, lambda api_client, model: run_batch(api_client=api_client))
+    
+    def analyze_lesson_centric_batch(self, jokbo_paths: List[str], lesson_path: str,
+                                     api_client: Optional[GeminiAPIClient] = None) -> Dict[str, Any]:
+        """
+        Analyze multiple jokbos against a single lesson as one batch job.
+        
+        Every (jokbo, lesson chunk) request is submitted together; results are
+        merged exactly like the interactive path once the batch completes.
+        
+        Args:
+            jokbo_paths: List of jokbo file paths
+            lesson_path: Path to lesson file
+            api_client: Client to submit the batch with (defaults to the processor's)
+            
+        Returns:
+            Analysis results
+        """
+        logger.info(f"Starting batch lesson-centric analysis: {len(jokbo_paths)} jokbos, 1 lesson")
+        
+        lesson_parts = self._split_lesson_for_batch(lesson_path)
+        job = BatchJob(api_client or self.api_client, self.file_manager, f"{self.session_id} lesson-centric")
+        
+        for j, jokbo_path in enumerate(jokbo_paths):
+            jokbo_filename = Path(jokbo_path).name
+            prompt = self.lesson_analyzer.build_prompt(jokbo_filename)
+            for k, (part_path, chunk_info) in enumerate(lesson_parts):
+                job.add(
+                    f"{j}:{k}", prompt,
+                    [(part_path, f"강의자료_{Path(part_path).name}"), (jokbo_path, f"족보_{jokbo_filename}")],
+                    partial(self.lesson_analyzer.process_response, jokbo_path=jokbo_path,
+                            lesson_path=part_path, chunk_info=chunk_info)
+                )
+        responses = job.run()
+        
+        results = []
+        for j in range(len(jokbo_paths)):
+            chunk_results = [responses[f"{j}:{k}"] for k in range(len(lesson_parts))]
+            if len(chunk_results) == 1:
+                results.append(chunk_results[0])
+            else:
+                results.append(ResultMerger.merge_chunk_results(chunk_results, "lesson-centric"))
+        
+        return self._merge_lesson_centric_results(results)
+    
+    def analyze_jokbo_centric_batch(self, lesson_paths: List[str], jokbo_path: str,
+                                    api_client: Optional[GeminiAPIClient] = None) -> Dict[str, Any]:
+        """
+        Analyze multiple lessons against a single jokbo as one batch job.
+        
+        Args:
+            lesson_paths: List of lesson file paths
+            jokbo_path: Path to jokbo file
+            api_client: Client to submit the batch with (defaults to the processor's)
+            
+        Returns:
+            Analysis results
+        """
+        logger.info(f"Starting batch jokbo-centric analysis: {len(lesson_paths)} lessons, 1 jokbo")
+        
+        jokbo_filename = Path(jokbo_path).name
+        job = BatchJob(api_client or self.api_client, self.file_manager, f"{self.session_id} jokbo-centric")
+        lesson_parts: List[List[tuple]] = []
+        
+        for i, lesson_path in enumerate(lesson_paths):
+            parts = self._split_lesson_for_batch(lesson_path)
+            lesson_parts.append(parts)
+            for k, (part_path, chunk_info) in enumerate(parts):
+                job.add(
+                    f"{i}:{k}", self.jokbo_analyzer.build_prompt(Path(part_path).name),
+                    [(jokbo_path, f"족보_{jokbo_filename}"), (part_path, f"강의자료_{Path(part_path).name}")],
+                    partial(self.jokbo_analyzer.process_response, lesson_path=part_path,
+                            jokbo_path=jokbo_path, chunk_info=chunk_info)
+                )
+        responses = job.run()
+        
+        lesson_results = []
+        for i, lesson_path in enumerate(lesson_paths):
+            chunk_results = [responses[f"{i}:{k}"] for k in range(len(lesson_parts[i]))]
+            if len(chunk_results) == 1:
+                result = chunk_results[0]
+            else:
+                result = ResultMerger.merge_chunk_results(chunk_results, "jokbo-centric")
+            self.jokbo_analyzer._save_intermediate_result(i, lesson_path, result)
+            lesson_results.append(result)
+        
+        return self.jokbo_analyzer._merge_lesson_results(lesson_results, jokbo_path)
+    
+    def _split_lesson_for_batch(self, lesson_path: str) -> List[tuple]:
+        """
+        Split a lesson into the parts that are analyzed separately.
+        
+        Returns:
+            [(part_path, chunk_info)]; chunk_info is None when the lesson is analyzed
+            whole (chunk files belong to the chunk store)
+        """
+        from ..pdf.operations import PDFOperations
+        chunks = PDFOperations.split_pdf_for_chunks(lesson_path, model_name=self._model_name())
+        if len(chunks) <= 1:
+            return [(lesson_path, None)]
+        
+        return [(chunk_path, (start_page, end_page))
+                for chunk_path, start_page, end_page in PDFOperations.materialize_chunks(lesson_path, chunks)]
+    
+    def _model_name(self) -> Optional[str]:
+        """Get the model name chunks are planned for."""
+        return getattr(self.model, "model_name", None)
+    
     def _get_model_config(self) -> Dict[str, Any]:
         """Get the model configuration from the current model.
 
@@ -344,8 +478,12 @@ class PDFProcessor:
         """Clean up session directory and files."""
         logger.info(f"Cleaning up session {self.session_id}")
         
-        # Clean up uploaded files
+        # Losing hedge copies may still be using this session's uploads
+        wait_for_stragglers()
+        
+        # Queue remaining uploads and let all background deletes finish
         self.file_manager.cleanup_tracked_files()
+        self.file_manager.flush_deletes()
         
         # Clean up session directory
         if self.session_dir.exists():
@@ -368,6 +506,6 @@ class PDFProcessor:
         """Clean up resources when object is destroyed."""
         # Clean up tracked files
         if hasattr(self, 'file_manager'):
-            self.file_manager.cleanup_tracked_files()
+            self.file_manager.cleanup_tracked_files(wait=False)
         
         # Note: We don't clear the global PDF cache here as it might be used by other instances
@@ -7,6 +7,7 @@ import json
 import re
 from typing import Dict, Any, List, Optional
 
+from .stream_parser import recover_completed_elements
 from ..utils.logging import get_logger
 from ..utils.exceptions import JSONParsingError
 
@@ -38,6 +39,11 @@ class ResponseParser:
             logger.warning(f"JSON parsing error: {str(e)}")
             logger.info("Attempting partial parsing...")
             
+            # Keep every array element that was closed before the text broke off
+            recovered = recover_completed_elements(response_text)
+            if not recovered.get("error") and ResponseParser.validate_response_structure(recovered, mode):
+                return recovered
+            
             # Attempt partial parsing based on mode
             if mode == "jokbo-centric":
                 partial_result = ResponseParser._parse_partial_jokbo(response_text)
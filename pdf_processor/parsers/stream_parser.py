@@ -0,0 +1,230 @@
+"""
+Incremental JSON parser for streamed Gemini responses.
+Emits each element of the top-level result arrays (jokbo_pages /
+related_slides) as soon as it closes, so consumers can start before the
+response finishes and a truncated stream keeps everything completed so far.
+"""
+
+import json
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Top-level arrays whose elements are emitted individually
+RESULT_ARRAY_KEYS = ("jokbo_pages", "related_slides")
+
+
+class StreamingJSONParser:
+    """Scans JSON text chunk by chunk and emits completed array elements."""
+
+    def __init__(self, array_keys: Iterable[str] = RESULT_ARRAY_KEYS,
+                 on_element: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        """
+        Initialize the parser.
+
+        Args:
+            array_keys: Keys of the top-level arrays to stream
+            on_element: Optional callback invoked with (key, element) for each completed element
+        """
+        self.array_keys = set(array_keys)
+        self.on_element = on_element
+        self.elements: Dict[str, List[Any]] = {}
+
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_string: Optional[str] = None
+        self._pending_key: Optional[str] = None
+        self._active_key: Optional[str] = None
+        self._array_depth = 0
+        self._element_start = -1
+        self._complete = False
+        # (key, start, end) text spans of the streamed arrays, brackets included
+        self._array_spans: List[Tuple[str, int, int]] = []
+        self._array_start = -1
+        # Set when a streamed array holds something that wasn't emitted as an element
+        self._lossy = False
+
+    @property
+    def text(self) -> str:
+        """Full text received so far."""
+        return self._text
+
+    @property
+    def complete(self) -> bool:
+        """Whether the top-level JSON value has been closed."""
+        return self._complete
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Consume the next chunk of response text.
+
+        Args:
+            chunk: Text chunk
+
+        Returns:
+            (key, element) pairs completed by this chunk
+        """
+        if not chunk:
+            return []
+        self._text += chunk
+        completed = []
+
+        text = self._text
+        for i in range(self._pos, len(text)):
+            char = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        # Candidate key of the top-level object
+                        try:
+                            self._last_string = json.loads(text[self._string_start:i + 1])
+                        except json.JSONDecodeError:
+                            self._last_string = None
+                continue
+
+            if (self._active_key and len(self._stack) == self._array_depth
+                    and char not in " \t\r\n,{[]"):
+                # A scalar directly inside a streamed array is never emitted
+                self._lossy = True
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == ":" and len(self._stack) == 1:
+                self._pending_key = self._last_string
+            elif char == "," and len(self._stack) == 1:
+                self._pending_key = None
+            elif char in "{[":
+                if not self._stack and char != "{":
+                    continue
+                self._stack.append(char)
+                depth = len(self._stack)
+                if char == "[" and depth == 2 and self._pending_key in self.array_keys:
+                    self._active_key = self._pending_key
+                    self._array_depth = depth
+                    self._array_start = i
+                    self.elements.setdefault(self._active_key, [])
+                elif self._active_key and depth == self._array_depth + 1:
+                    self._element_start = i
+            elif char in "}]":
+                if not self._stack:
+                    continue
+                depth = len(self._stack)
+                self._stack.pop()
+                if self._active_key and depth == self._array_depth + 1 and self._element_start >= 0:
+                    element = self._decode(text[self._element_start:i + 1])
+                    self._element_start = -1
+                    if element is not None:
+                        completed.append((self._active_key, element))
+                    else:
+                        self._lossy = True
+                elif self._active_key and depth == self._array_depth:
+                    self._array_spans.append((self._active_key, self._array_start, i))
+                    self._active_key = None
+                if not self._stack:
+                    self._complete = True
+
+        self._pos = len(text)
+
+        for key, element in completed:
+            self.elements[key].append(element)
+            if self.on_element is not None:
+                try:
+                    self.on_element(key, element)
+                except Exception as e:
+                    logger.warning(f"Stream element handler failed for {key}: {str(e)}")
+        return completed
+
+    @staticmethod
+    def _decode(fragment: str) -> Optional[Any]:
+        try:
+            return json.loads(fragment)
+        except json.JSONDecodeError as e:
+            logger.debug(f"Skipping malformed streamed element: {str(e)}")
+            return None
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        Build the final result once the stream has ended.
+
+        Returns:
+            The fully parsed response if it is valid JSON; otherwise the elements
+            completed before the stream was cut off, marked as partial
+        """
+        start = self._text.find("{")
+        if self._complete and start != -1:
+            try:
+                return self._assemble(start, self._text.rfind("}") + 1)
+            except json.JSONDecodeError:
+                pass
+
+        if not any(self.elements.values()):
+            return {"error": "No complete elements in streamed response", "partial": True}
+
+        result: Dict[str, Any] = {key: list(items) for key, items in self.elements.items()}
+        result["partial"] = True
+        total = sum(len(items) for items in self.elements.values())
+        logger.info(f"Recovered {total} completed elements from truncated response")
+        return result
+
+    def _assemble(self, start: int, end: int) -> Dict[str, Any]:
+        """
+        Build the complete response from the streamed elements.
+
+        Only the text outside the streamed arrays is decoded here; the arrays
+        are filled with the elements already parsed while streaming (unless
+        some of their content wasn't emitted as elements).
+
+        Raises:
+            json.JSONDecodeError: If the response is not valid JSON
+        """
+        if self._lossy:
+            # Some array content only exists in the text; decode all of it
+            return json.loads(self._text[start:end])
+        parts = []
+        pos = start
+        for _, span_start, span_end in self._array_spans:
+            parts.append(self._text[pos:span_start])
+            parts.append("[]")
+            pos = span_end + 1
+        parts.append(self._text[pos:end])
+        result = json.loads("".join(parts))
+        for key, _, _ in self._array_spans:
+            result[key] = list(self.elements.get(key, []))
+        return result
+
+
+class StreamedText(str):
+    """Text of a streamed response that carries the parser it was streamed through."""
+
+    def __new__(cls, text: str, parser: StreamingJSONParser):
+        obj = super().__new__(cls, text)
+        obj.parser = parser
+        return obj
+
+
+def recover_completed_elements(response_text: str) -> Dict[str, Any]:
+    """
+    Parse a (possibly truncated) response by replaying it through the streaming parser.
+
+    Args:
+        response_text: Response text
+
+    Returns:
+        Parsed result (see StreamingJSONParser.finish)
+    """
+    parser = StreamingJSONParser()
+    parser.feed(response_text)
+    return parser.finish()
@@ -1,55 +1,192 @@
 """
 Thread-safe PDF caching module.
 Provides efficient caching of PDF objects to avoid repeated file operations.
+Documents are kept in an LRU bounded by document count and estimated memory,
+and are handed out as refcounted leases so eviction never closes a document
+that is still in use.
 """
 
+import os
 import threading
-from typing import Dict, Optional, Any
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 from pathlib import Path
 import pymupdf as fitz
 import weakref
 
+from ..utils.config import ProcessingConfig
 from ..utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Rough memory MuPDF keeps per page of an open document (page tree, xref entries)
+PAGE_OVERHEAD_BYTES = 16 * 1024
+
+
+class _CacheEntry:
+    """An open document and its lease bookkeeping."""
+    
+    def __init__(self, pdf: Any, signature: Tuple[int, int], size_bytes: int):
+        self.pdf = pdf
+        self.signature = signature
+        self.size_bytes = size_bytes
+        self.leases = 0
+        # Set once the entry left the cache; the last lease closes the document
+        self.retired = False
+        # MuPDF documents must not be used from two threads at once
+        self.lock = threading.RLock()
+
 
 class PDFCache:
-    """Thread-safe cache for PDF objects."""
+    """Thread-safe LRU cache for PDF objects."""
     
-    def __init__(self):
-        """Initialize the PDF cache."""
-        self._cache: Dict[str, Any] = {}
-        self._page_counts: Dict[str, int] = {}
+    def __init__(self, max_documents: Optional[int] = None, max_bytes: Optional[int] = None):
+        """
+        Initialize the PDF cache.
+        
+        Args:
+            max_documents: Maximum number of open documents (defaults to PDF_CACHE_MAX_DOCUMENTS)
+            max_bytes: Maximum estimated memory of open documents (defaults to PDF_CACHE_MAX_MB)
+        """
+        self.max_documents = max(1, max_documents if max_documents is not None
+                                 else ProcessingConfig.PDF_CACHE_MAX_DOCUMENTS)
+        self.max_bytes = (max_bytes if max_bytes is not None
+                          else ProcessingConfig.PDF_CACHE_MAX_MB * 1024 * 1024)
+        # Open documents by resolved path, least recently used first
+        self._cache: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        # Page counts outlive evictions; keyed by (path, signature) so edits invalidate them
+        self._page_counts: Dict[Tuple[str, Tuple[int, int]], int] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
         self._lock = threading.Lock()
         self._finalizer = weakref.finalize(self, self._cleanup_all)
-        
-    def get_pdf(self, pdf_path: str) -> Any:
+    
+    @staticmethod
+    def _resolve(pdf_path: str) -> Tuple[str, Tuple[int, int]]:
+        """Get a PDF's cache key and signature (size, mtime), which changes when the file does."""
+        path = Path(pdf_path).resolve()
+        stat = os.stat(path)
+        return str(path), (stat.st_size, stat.st_mtime_ns)
+    
+    @contextmanager
+    def borrow(self, pdf_path: str) -> Iterator[Any]:
         """
-        Get a cached PDF object or create a new one.
+        Lease a cached PDF object, opening it if needed.
+        
+        The document stays open (it is never evicted) until the lease ends, and
+        the lease holds the document's lock, since MuPDF documents are not safe
+        to use from two threads at once. Don't keep the document or its pages
+        after the with block.
         
         Args:
             pdf_path: Path to the PDF file
-            
-        Returns:
+        
+        Yields:
             PDF object (fitz.Document)
         """
-        pdf_path = str(Path(pdf_path).resolve())
+        entry = self._acquire(pdf_path)
+        try:
+            with entry.lock:
+                yield entry.pdf
+        finally:
+            self._release(entry)
+    
+    def _acquire(self, pdf_path: str) -> _CacheEntry:
+        """Take a lease on a document, opening and caching it on a miss."""
+        key, signature = self._resolve(pdf_path)
         
         with self._lock:
-            if pdf_path not in self._cache:
-                logger.debug(f"Opening new PDF: {pdf_path}")
-                try:
-                    pdf = fitz.open(pdf_path)
-                    self._cache[pdf_path] = pdf
-                    self._page_counts[pdf_path] = len(pdf)
-                except Exception as e:
-                    logger.error(f"Failed to open PDF {pdf_path}: {str(e)}")
-                    raise
+            entry = self._cache.get(key)
+            if entry is not None and entry.signature == signature:
+                self._hits += 1
+                entry.leases += 1
+                self._cache.move_to_end(key)
+                logger.debug(f"Using cached PDF: {key}")
+                return entry
+            self._misses += 1
+        
+        # Open outside the lock so other documents stay available meanwhile
+        logger.debug(f"Opening new PDF: {key}")
+        try:
+            pdf = fitz.open(key)
+        except Exception as e:
+            logger.error(f"Failed to open PDF {key}: {str(e)}")
+            raise
+        new_entry = _CacheEntry(pdf, signature, signature[0] + len(pdf) * PAGE_OVERHEAD_BYTES)
+        
+        to_close: List[Any] = []
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry.signature == signature:
+                # Another thread opened it first
+                to_close.append(new_entry.pdf)
             else:
-                logger.debug(f"Using cached PDF: {pdf_path}")
-                
-            return self._cache[pdf_path]
+                if entry is not None:
+                    # The file changed since it was cached
+                    to_close.extend(self._retire(key))
+                entry = new_entry
+                self._cache[key] = entry
+                self._bytes += entry.size_bytes
+                self._remember_page_count(key, signature, len(entry.pdf))
+            entry.leases += 1
+            to_close.extend(self._evict())
+        
+        self._close_all(to_close)
+        return entry
+    
+    def _release(self, entry: _CacheEntry) -> None:
+        """End a lease, closing the document if it was retired meanwhile."""
+        to_close: List[Any] = []
+        with self._lock:
+            entry.leases -= 1
+            if entry.leases == 0:
+                if entry.retired:
+                    to_close.append(entry.pdf)
+                else:
+                    to_close.extend(self._evict())
+        self._close_all(to_close)
+    
+    def _retire(self, key: str) -> List[Any]:
+        """
+        Remove an entry from the cache (caller holds the lock).
+        
+        Returns:
+            Documents the caller must close (none if the entry is still leased)
+        """
+        entry = self._cache.pop(key)
+        self._bytes -= entry.size_bytes
+        entry.retired = True
+        return [entry.pdf] if entry.leases == 0 else []
+    
+    def _evict(self) -> List[Any]:
+        """
+        Evict least recently used unleased documents while over the limits
+        (caller holds the lock).
+        
+        Returns:
+            Documents the caller must close
+        """
+        to_close: List[Any] = []
+        for key in list(self._cache):
+            if len(self._cache) <= self.max_documents and self._bytes <= self.max_bytes:
+                break
+            if self._cache[key].leases == 0:
+                to_close.extend(self._retire(key))
+                self._evictions += 1
+                logger.debug(f"Evicted PDF from cache: {key}")
+        return to_close
+    
+    @staticmethod
+    def _close_all(pdfs: List[Any]) -> None:
+        """Close documents that left the cache."""
+        for pdf in pdfs:
+            try:
+                pdf.close()
+            except Exception as e:
+                logger.warning(f"Error closing PDF: {str(e)}")
     
     def get_page_count(self, pdf_path: str) -> int:
         """
@@ -57,52 +194,63 @@ class PDFCache:
         
         Args:
             pdf_path: Path to the PDF file
-            
+        
         Returns:
             Number of pages in the PDF
         """
-        pdf_path = str(Path(pdf_path).resolve())
+        key, signature = self._resolve(pdf_path)
+        
+        with self._lock:
+            page_count = self._page_counts.get((key, signature))
+            if page_count is not None:
+                self._hits += 1
+                return page_count
         
+        # If not in cache, open PDF to get page count
+        with self.borrow(pdf_path) as pdf:
+            page_count = len(pdf)
         with self._lock:
-            if pdf_path not in self._page_counts:
-                # If not in cache, open PDF to get page count
-                pdf = self.get_pdf(pdf_path)
-                self._page_counts[pdf_path] = len(pdf)
-                
-            return self._page_counts[pdf_path]
+            self._remember_page_count(key, signature, page_count)
+        return page_count
+    
+    def _remember_page_count(self, key: str, signature: Tuple[int, int], page_count: int) -> None:
+        """Record a page count (caller holds the lock)."""
+        if len(self._page_counts) >= 4096:
+            self._page_counts.clear()
+        self._page_counts[(key, signature)] = page_count
     
     def close_pdf(self, pdf_path: str) -> None:
         """
         Close and remove a PDF from cache.
         
+        A document that is still leased is removed now and closed when its
+        last lease ends.
+        
         Args:
             pdf_path: Path to the PDF file
         """
         pdf_path = str(Path(pdf_path).resolve())
         
         with self._lock:
-            if pdf_path in self._cache:
-                try:
-                    self._cache[pdf_path].close()
-                    logger.debug(f"Closed PDF: {pdf_path}")
-                except Exception as e:
-                    logger.warning(f"Error closing PDF {pdf_path}: {str(e)}")
-                finally:
-                    del self._cache[pdf_path]
-                    self._page_counts.pop(pdf_path, None)
+            to_close = self._retire(pdf_path) if pdf_path in self._cache else []
+        self._close_all(to_close)
+        if to_close:
+            logger.debug(f"Closed PDF: {pdf_path}")
     
     def clear(self) -> None:
-        """Clear all cached PDFs."""
+        """Clear all cached PDFs (leased ones close when their leases end)."""
         with self._lock:
-            self._cleanup_all()
-            self._cache.clear()
+            to_close: List[Any] = []
+            for key in list(self._cache):
+                to_close.extend(self._retire(key))
             self._page_counts.clear()
+        self._close_all(to_close)
     
     def _cleanup_all(self) -> None:
         """Internal method to close all PDFs."""
-        for pdf_path, pdf in list(self._cache.items()):
+        for pdf_path, entry in list(self._cache.items()):
             try:
-                pdf.close()
+                entry.pdf.close()
                 logger.debug(f"Cleaned up PDF: {pdf_path}")
             except Exception as e:
                 logger.warning(f"Error during cleanup of {pdf_path}: {str(e)}")
@@ -123,7 +271,13 @@ class PDFCache:
         with self._lock:
             return {
                 "cached_pdfs": len(self._cache),
-                "total_pages": sum(self._page_counts.values()),
+                "total_pages": sum(self._page_counts.get((key, entry.signature), 0)
+                                   for key, entry in self._cache.items()),
+                "leased_pdfs": sum(1 for entry in self._cache.values() if entry.leases),
+                "estimated_bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
                 "pdf_paths": list(self._cache.keys())
             }
 
@@ -146,7 +300,7 @@ def get_global_cache() -> PDFCache:
         if _global_cache is None:
             _global_cache = PDFCache()
             logger.info("Created global PDF cache")
-            
+    
     return _global_cache
 
 
@@ -157,4 +311,4 @@ def clear_global_cache() -> None:
     with _cache_lock:
         if _global_cache is not None:
             _global_cache.clear()
-            logger.info("Cleared global PDF cache")
\ No newline at end of file
+            logger.info("Cleared global PDF cache")
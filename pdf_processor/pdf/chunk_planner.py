@@ -0,0 +1,264 @@
+"""
+Token-aware chunk planning for large PDFs.
+Estimates each page's token cost from its text, images and size, and packs
+consecutive pages into chunks up to a per-model token budget. The budget
+shrinks when responses are truncated at MAX_TOKENS and recovers slowly while
+responses complete.
+"""
+
+import json
+import math
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .metadata_index import get_metadata_index
+from ..utils.config import ProcessingConfig
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Page area (in points) that costs one rendered page; larger pages cost proportionally more
+REFERENCE_PAGE_AREA = 595 * 842  # A4
+
+
+def _model_key(model_name: Optional[str]) -> str:
+    """Normalize a model name ("models/gemini-2.5-pro" -> "gemini-2.5-pro")."""
+    return (model_name or "").replace("models/", "") or "default"
+
+
+def estimate_page_tokens(width: float, height: float, text_chars: int, image_count: int) -> int:
+    """
+    Estimate the tokens a page costs in a request.
+
+    Args:
+        width: Page width in points
+        height: Page height in points
+        text_chars: Length of the page's extracted text
+        image_count: Number of images on the page
+
+    Returns:
+        Estimated tokens (rendered page scaled by area, plus text and images)
+    """
+    cfg = ProcessingConfig
+    area_factor = min(4.0, max(1.0, (width * height) / REFERENCE_PAGE_AREA))
+    tokens = cfg.TOKENS_PER_PDF_PAGE * area_factor
+    tokens += text_chars / cfg.CHUNK_CHARS_PER_TOKEN
+    tokens += min(image_count, cfg.CHUNK_MAX_IMAGES_PER_PAGE) * cfg.CHUNK_TOKENS_PER_IMAGE
+    return int(tokens)
+
+
+class ChunkPlanner:
+    """Plans page ranges of a PDF so each chunk fits the model's token budget."""
+
+    def __init__(self, state_path: Optional[str] = None):
+        """
+        Initialize the planner.
+
+        Args:
+            state_path: JSON file the learned budget scales are kept in
+        """
+        self.state_path = Path(state_path or ProcessingConfig.CHUNK_PLANNER_STATE_PATH)
+        # Per-model budget multiplier learned from truncations (1.0 = configured budget)
+        self._scales: Dict[str, float] = {}
+        self._saved_scales: Dict[str, float] = {}
+        # Page costs memoized by content hash
+        self._page_costs: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def get_page_costs(self, pdf_path: str) -> List[int]:
+        """
+        Get the estimated token cost of every page of a PDF.
+
+        Args:
+            pdf_path: Path to the PDF file
+
+        Returns:
+            Estimated tokens per page, in page order
+
+        Raises:
+            PDFParsingError: If the PDF cannot be read
+        """
+        metadata = get_metadata_index().get(pdf_path)
+        with self._lock:
+            cached = self._page_costs.get(metadata.content_hash)
+        if cached is not None:
+            return cached
+
+        costs = [
+            estimate_page_tokens(width, height, text_chars, image_count)
+            for (width, height), text_chars, image_count
+            in zip(metadata.page_sizes, metadata.text_lengths, metadata.image_counts)
+        ]
+
+        with self._lock:
+            if len(self._page_costs) >= 256:
+                self._page_costs.clear()
+            self._page_costs[metadata.content_hash] = costs
+        return costs
+
+    def get_budget(self, model_name: Optional[str] = None) -> int:
+        """
+        Get the current per-chunk token budget of a model.
+
+        Args:
+            model_name: Gemini model name
+
+        Returns:
+            Configured budget scaled by what truncations have taught
+        """
+        cfg = ProcessingConfig
+        name = _model_key(model_name)
+        if cfg.CHUNK_TOKEN_BUDGET_OVERRIDE:
+            base = cfg.CHUNK_TOKEN_BUDGET_OVERRIDE
+        else:
+            base = cfg.CHUNK_TOKEN_BUDGETS.get(name, cfg.CHUNK_TOKEN_BUDGETS["default"])
+        with self._lock:
+            scale = self._scales.get(name, 1.0)
+        return max(1, int(base * scale))
+
+    def plan(self, pdf_path: str, model_name: Optional[str] = None) -> List[Tuple[str, int, int]]:
+        """
+        Split a PDF into consecutive page ranges that each fit the token budget.
+
+        Uses as few chunks as the budget and CHUNK_MAX_PAGES allow and balances
+        the cost between them, so there is no small tail chunk.
+
+        Args:
+            pdf_path: Path to the PDF file
+            model_name: Gemini model the chunks are sent to
+
+        Returns:
+            List of tuples (pdf_path, start_page, end_page)
+        """
+        costs = self.get_page_costs(pdf_path)
+        total_pages = len(costs)
+        if total_pages == 0:
+            return [(str(pdf_path), 1, 0)]
+
+        budget = self.get_budget(model_name)
+        max_pages = max(1, ProcessingConfig.CHUNK_MAX_PAGES)
+        total_cost = sum(costs)
+
+        count = max(math.ceil(total_cost / budget), math.ceil(total_pages / max_pages), 1)
+        while True:
+            ranges = self._split_balanced(costs, count)
+            if count >= total_pages or all(
+                sum(costs[start - 1:end]) <= budget and end - start + 1 <= max_pages
+                for start, end in ranges
+            ):
+                break
+            count += 1
+
+        logger.debug(f"Planned {len(ranges)} chunks for {Path(pdf_path).name} "
+                     f"({total_pages} pages, ~{total_cost} tokens, budget {budget})")
+        return [(str(pdf_path), start, end) for start, end in ranges]
+
+    @staticmethod
+    def _split_balanced(costs: List[int], count: int) -> List[Tuple[int, int]]:
+        """Cut pages into count consecutive ranges of roughly equal cost (1-based, inclusive)."""
+        count = min(count, len(costs))
+        target = sum(costs) / count
+        ranges: List[Tuple[int, int]] = []
+        start = 0
+        running = 0.0
+        for i, cost in enumerate(costs):
+            running += cost
+            remaining_chunks = count - len(ranges) - 1
+            remaining_pages = len(costs) - i - 1
+            # Cut once this chunk reaches its share, keeping a page for every later chunk
+            if remaining_chunks and (running >= target * (len(ranges) + 1)
+                                     or remaining_pages == remaining_chunks):
+                ranges.append((start + 1, i + 1))
+                start = i + 1
+        ranges.append((start + 1, len(costs)))
+        return ranges
+
+    def record_truncation(self, model_name: Optional[str] = None) -> None:
+        """
+        Shrink a model's budget after a response was cut off at MAX_TOKENS.
+
+        Args:
+            model_name: Gemini model that truncated
+        """
+        name = _model_key(model_name)
+        with self._lock:
+            scale = max(ProcessingConfig.CHUNK_BUDGET_MIN_SCALE,
+                        self._scales.get(name, 1.0) * ProcessingConfig.CHUNK_BUDGET_DECREASE)
+            self._scales[name] = scale
+            self._save_if_changed()
+        logger.info(f"Chunk token budget for {name} lowered to {scale:.0%} after a truncated response")
+
+    def record_complete(self, model_name: Optional[str] = None) -> None:
+        """
+        Let a model's budget recover after a complete response.
+
+        Args:
+            model_name: Gemini model that responded
+        """
+        name = _model_key(model_name)
+        with self._lock:
+            scale = self._scales.get(name)
+            if scale is None or scale >= 1.0:
+                return
+            self._scales[name] = min(1.0, scale + ProcessingConfig.CHUNK_BUDGET_RECOVERY)
+            self._save_if_changed()
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get the learned budget scale of every model that was adjusted."""
+        with self._lock:
+            return dict(self._scales)
+
+    def _load(self) -> None:
+        """Load learned scales from disk, ignoring unreadable files."""
+        if not self.state_path.exists():
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._scales = {str(k): float(v) for k, v in data.get("scales", {}).items()}
+            self._saved_scales = dict(self._scales)
+        except Exception as e:
+            logger.warning(f"Failed to load chunk planner state {self.state_path}: {str(e)}")
+
+    def _save_if_changed(self) -> None:
+        """Persist the scales once one has moved noticeably (caller holds the lock)."""
+        if all(abs(scale - self._saved_scales.get(name, 1.0)) < 0.05
+               for name, scale in self._scales.items()):
+            return
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.state_path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"scales": self._scales}, f, indent=2)
+            os.replace(tmp_path, self.state_path)
+            self._saved_scales = dict(self._scales)
+        except Exception as e:
+            logger.warning(f"Failed to save chunk planner state {self.state_path}: {str(e)}")
+
+
+# Global planner instance
+_global_chunk_planner: Optional[ChunkPlanner] = None
+_chunk_planner_lock = threading.Lock()
+
+
+def get_chunk_planner() -> ChunkPlanner:
+    """
+    Get the global chunk planner.
+
+    Returns:
+        Global ChunkPlanner instance
+    """
+    global _global_chunk_planner
+
+    with _chunk_planner_lock:
+        if _global_chunk_planner is None:
+            state_path = Path(ProcessingConfig.CHUNK_PLANNER_STATE_PATH)
+            if ProcessingConfig.GEMINI_BACKEND == "fake":
+                # Simulated truncations must not shrink real budgets
+                state_path = state_path.with_name(f"{state_path.stem}.fake{state_path.suffix}")
+            _global_chunk_planner = ChunkPlanner(str(state_path))
+    return _global_chunk_planner
@@ -0,0 +1,252 @@
+"""
+Content-addressed store of chunk PDFs.
+Materializes every chunk of a source PDF in one pass (one open, one range
+copy per chunk) into files keyed by (source content hash, page range), so
+repeated jobs and repeated pairs reuse the same chunk files. With
+CHUNK_IN_MEMORY the chunks are kept as in-memory buffers instead and only
+spill to disk once the buffers exceed CHUNK_MEMORY_MAX_MB.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pymupdf as fitz
+
+from .cache import get_global_cache
+from ..api.upload_cache import hash_file
+from ..utils.config import ProcessingConfig
+from ..utils.exceptions import PDFParsingError
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class ChunkStore:
+    """Directory of chunk PDFs keyed by source content hash and page range."""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None,
+                 in_memory: Optional[bool] = None, max_memory_bytes: Optional[int] = None):
+        """
+        Initialize the store.
+
+        Args:
+            cache_dir: Directory the chunk files are kept in
+            max_bytes: Size above which the least recently used chunks are pruned
+            in_memory: Keep new chunks as in-memory buffers (defaults to CHUNK_IN_MEMORY)
+            max_memory_bytes: Buffer size above which the oldest buffers spill to disk
+        """
+        self.cache_dir = Path(cache_dir or ProcessingConfig.CHUNK_CACHE_DIR)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes if max_bytes is not None else ProcessingConfig.CHUNK_CACHE_MAX_MB * 1024 * 1024
+        self.in_memory = ProcessingConfig.CHUNK_IN_MEMORY if in_memory is None else in_memory
+        self.max_memory_bytes = (max_memory_bytes if max_memory_bytes is not None
+                                 else ProcessingConfig.CHUNK_MEMORY_MAX_MB * 1024 * 1024)
+        # In-memory chunks by chunk path, least recently used first
+        self._buffers: "OrderedDict[str, bytes]" = OrderedDict()
+        self._buffer_bytes = 0
+        # Buffers being written to disk, still readable until their file exists
+        self._spilling: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._written = 0
+        self._reused = 0
+        self._spilled = 0
+
+    def chunk_path(self, content_hash: str, start_page: int, end_page: int) -> Path:
+        """Get the file a chunk of a source is stored in."""
+        return self.cache_dir / f"{content_hash[:32]}_{start_page}-{end_page}.pdf"
+
+    def materialize(self, pdf_path: str, chunks: List[Tuple[str, int, int]]) -> List[Tuple[str, int, int]]:
+        """
+        Make sure every chunk of a PDF exists as a file or in-memory buffer.
+
+        Missing chunks are written in one pass over the source; chunks already
+        in the store are reused as they are. The chunks belong to the store and
+        must not be deleted by callers. A chunk held in memory has no file at
+        its path; read it with get_buffer (GeminiAPIClient.upload_file does).
+
+        Args:
+            pdf_path: Path to the source PDF
+            chunks: (pdf_path, start_page, end_page) tuples from split_pdf_for_chunks
+
+        Returns:
+            (chunk_path, start_page, end_page) tuples in chunk order
+
+        Raises:
+            PDFParsingError: If the source cannot be read or a chunk cannot be written
+        """
+        content_hash = hash_file(pdf_path)
+        targets = [(self.chunk_path(content_hash, start, end), start, end) for _, start, end in chunks]
+        missing = [(path, start, end) for path, start, end in targets
+                   if not self._touch_buffer(str(path)) and not path.exists()]
+
+        if missing:
+            try:
+                with get_global_cache().borrow(pdf_path) as src_pdf:
+                    total_pages = len(src_pdf)
+                    for path, start, end in missing:
+                        if start < 1 or end < start or end > total_pages:
+                            raise ValueError(f"Invalid page range {start}-{end} (total pages: {total_pages})")
+                        data = self._render_chunk(src_pdf, start, end)
+                        if self.in_memory:
+                            self._add_buffer(str(path), data)
+                        else:
+                            self._write_file(path, data)
+            except Exception as e:
+                logger.error(f"Failed to materialize chunks of {pdf_path}: {str(e)}")
+                raise PDFParsingError(f"Chunk extraction failed: {str(e)}")
+
+        # Refresh the rest so pruning keeps chunks that are in use
+        now = time.time()
+        for path, _, _ in targets:
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+
+        with self._lock:
+            self._written += len(missing)
+            self._reused += len(targets) - len(missing)
+        logger.debug(f"Materialized {len(targets)} chunks of {Path(pdf_path).name} "
+                     f"({len(missing)} written, {len(targets) - len(missing)} reused)")
+
+        self.prune()
+        return [(str(path), start, end) for path, start, end in targets]
+
+    def get_buffer(self, chunk_path: str) -> Optional[bytes]:
+        """
+        Get the bytes of a chunk held in memory.
+
+        Args:
+            chunk_path: Chunk path returned by materialize
+
+        Returns:
+            Chunk PDF bytes, or None if the chunk is not in memory (read its file)
+        """
+        chunk_path = str(chunk_path)
+        with self._lock:
+            data = self._buffers.get(chunk_path)
+            return data if data is not None else self._spilling.get(chunk_path)
+
+    @staticmethod
+    def _render_chunk(src_pdf: "fitz.Document", start_page: int, end_page: int) -> bytes:
+        """Copy a page range into a new PDF and serialize it."""
+        output = fitz.open()
+        try:
+            output.insert_pdf(src_pdf, from_page=start_page - 1, to_page=end_page - 1)
+            return output.tobytes(garbage=3, deflate=True)
+        finally:
+            output.close()
+
+    @staticmethod
+    def _write_file(path: Path, data: bytes) -> None:
+        """Write a chunk file atomically, so readers never see a partial file."""
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    def _touch_buffer(self, chunk_path: str) -> bool:
+        """Mark an in-memory chunk as recently used; False if it isn't in memory."""
+        with self._lock:
+            if chunk_path not in self._buffers:
+                return False
+            self._buffers.move_to_end(chunk_path)
+            return True
+
+    def _add_buffer(self, chunk_path: str, data: bytes) -> None:
+        """Keep a chunk in memory, spilling the oldest buffers to disk past the threshold."""
+        spill = []
+        with self._lock:
+            self._buffers[chunk_path] = data
+            self._buffer_bytes += len(data)
+            # The newest buffer spills too if it alone exceeds the threshold
+            while self._buffers and self._buffer_bytes > self.max_memory_bytes:
+                old_path, old_data = self._buffers.popitem(last=False)
+                self._buffer_bytes -= len(old_data)
+                self._spilling[old_path] = old_data
+                spill.append((old_path, old_data))
+        try:
+            for old_path, old_data in spill:
+                self._write_file(Path(old_path), old_data)
+        finally:
+            with self._lock:
+                for old_path, _ in spill:
+                    self._spilling.pop(old_path, None)
+                self._spilled += len(spill)
+        if spill:
+            logger.debug(f"Spilled {len(spill)} chunk buffers to {self.cache_dir}")
+
+    def prune(self) -> int:
+        """
+        Delete least recently used chunks while the store is over its size limit.
+
+        Chunks used within CHUNK_CACHE_MIN_AGE_SECONDS are kept, since a running
+        job may still be uploading them.
+
+        Returns:
+            Number of chunk files deleted
+        """
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob("*.pdf"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return 0
+
+        cutoff = time.time() - ProcessingConfig.CHUNK_CACHE_MIN_AGE_SECONDS
+        deleted = 0
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes or mtime > cutoff:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            deleted += 1
+        if deleted:
+            logger.info(f"Pruned {deleted} chunk files from {self.cache_dir}")
+        return deleted
+
+    def get_stats(self) -> dict:
+        """Get store statistics."""
+        with self._lock:
+            return {
+                "written": self._written,
+                "reused": self._reused,
+                "spilled": self._spilled,
+                "buffers": len(self._buffers),
+                "buffer_bytes": self._buffer_bytes
+            }
+
+
+# Global store instance
+_global_chunk_store: Optional[ChunkStore] = None
+_chunk_store_lock = threading.Lock()
+
+
+def get_chunk_store() -> ChunkStore:
+    """
+    Get the global chunk store.
+
+    Returns:
+        Global ChunkStore instance
+    """
+    global _global_chunk_store
+
+    with _chunk_store_lock:
+        if _global_chunk_store is None:
+            _global_chunk_store = ChunkStore()
+            logger.info(f"Created chunk store at {_global_chunk_store.cache_dir}")
+    return _global_chunk_store
@@ -0,0 +1,390 @@
+"""
+Persistent index of PDF metadata keyed by file content hash.
+Page counts, page sizes, per-page text and image counts are extracted once
+per distinct file and served from SQLite (and an in-process memo) afterwards,
+so progress setup, chunk planning and validation don't reparse the same PDFs
+on every job. Question layouts (where each question starts, with coordinates)
+are indexed the same way, on demand; see question_layout.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pymupdf as fitz
+
+from .cache import get_global_cache
+from .chunk_store import get_chunk_store
+from .question_layout import QuestionLayout, QuestionStart, scan_question_layout
+from ..api.upload_cache import hash_bytes, hash_file
+from ..utils.config import ProcessingConfig
+from ..utils.exceptions import PDFParsingError
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Bump when the extracted fields change so stale rows are rebuilt
+INDEX_VERSION = 2
+LAYOUT_VERSION = 1
+
+
+class PDFMetadata:
+    """Metadata of one PDF (everything but page text, which is read on demand)."""
+
+    def __init__(self, content_hash: str, page_sizes: List[Tuple[float, float]],
+                 text_lengths: List[int], image_counts: List[int]):
+        self.content_hash = content_hash
+        self.page_sizes = page_sizes
+        self.text_lengths = text_lengths
+        self.image_counts = image_counts
+
+    @property
+    def page_count(self) -> int:
+        """Number of pages."""
+        return len(self.page_sizes)
+
+
+class PDFMetadataIndex:
+    """SQLite-backed metadata index with an in-process memo of recent documents."""
+
+    def __init__(self, db_path: Optional[str] = None, max_documents: Optional[int] = None):
+        """
+        Initialize the index.
+
+        Args:
+            db_path: Path of the SQLite database file
+            max_documents: Documents kept before the least recently used are dropped
+        """
+        self.db_path = Path(db_path or ProcessingConfig.PDF_METADATA_INDEX_PATH)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_documents = (max_documents if max_documents is not None
+                              else ProcessingConfig.PDF_METADATA_INDEX_MAX_DOCUMENTS)
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+
+        # Content hash -> metadata / question layout, least recently used first
+        self._memo: "OrderedDict[str, PDFMetadata]" = OrderedDict()
+        self._layouts: "OrderedDict[str, QuestionLayout]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(documents)").fetchall()]
+        if "question_pages" in columns:
+            # Version 1 schema; its rows are rebuilt on demand like any outdated row
+            conn.execute("DROP TABLE documents")
+            conn.execute("DROP TABLE IF EXISTS pages")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "content_hash TEXT PRIMARY KEY, version INTEGER NOT NULL, page_count INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "content_hash TEXT NOT NULL, page_num INTEGER NOT NULL, width REAL NOT NULL, "
+            "height REAL NOT NULL, text TEXT NOT NULL, text_length INTEGER NOT NULL, "
+            "image_count INTEGER NOT NULL, PRIMARY KEY (content_hash, page_num))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS question_layouts ("
+            "content_hash TEXT PRIMARY KEY, version INTEGER NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS question_starts ("
+            "content_hash TEXT NOT NULL, position INTEGER NOT NULL, number TEXT NOT NULL, "
+            "page_num INTEGER NOT NULL, y0 REAL NOT NULL, y1 REAL NOT NULL, "
+            "PRIMARY KEY (content_hash, position))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS documents_lru ON documents (last_access)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=10, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def get(self, pdf_path: str) -> PDFMetadata:
+        """
+        Get a PDF's metadata, extracting and storing it on first sight.
+
+        Args:
+            pdf_path: Path to the PDF file
+
+        Returns:
+            PDFMetadata of the file's current content
+
+        Raises:
+            PDFParsingError: If the PDF cannot be read
+        """
+        # Chunks kept in memory have no file at their path
+        data = get_chunk_store().get_buffer(pdf_path)
+        content_hash = hash_bytes(data) if data is not None else hash_file(pdf_path)
+
+        with self._lock:
+            metadata = self._memo.get(content_hash)
+            if metadata is not None:
+                self._memo.move_to_end(content_hash)
+                self.hits += 1
+                return metadata
+
+        metadata = self._load(content_hash)
+        if metadata is None:
+            metadata = self._build(pdf_path, content_hash, data)
+
+        with self._lock:
+            self._memo[content_hash] = metadata
+            while len(self._memo) > 256:
+                self._memo.popitem(last=False)
+        return metadata
+
+    def get_page_count(self, pdf_path: str) -> int:
+        """Get a PDF's page count."""
+        return self.get(pdf_path).page_count
+
+    def get_page_text(self, pdf_path: str, page_num: int) -> str:
+        """
+        Get the text of a page.
+
+        Args:
+            pdf_path: Path to the PDF file
+            page_num: Page number (1-based)
+
+        Returns:
+            Text content of the page
+
+        Raises:
+            ValueError: If the page does not exist
+        """
+        metadata = self.get(pdf_path)
+        if page_num < 1 or page_num > metadata.page_count:
+            raise ValueError(f"Invalid page number {page_num}")
+        query = "SELECT text FROM pages WHERE content_hash = ? AND page_num = ?"
+        row = self._connect().execute(query, (metadata.content_hash, page_num)).fetchone()
+        if row is None:
+            # Pruned from disk while memoized
+            self._build(pdf_path, metadata.content_hash, get_chunk_store().get_buffer(pdf_path))
+            row = self._connect().execute(query, (metadata.content_hash, page_num)).fetchone()
+        return row[0] if row is not None else ""
+
+    def get_question_layout(self, pdf_path: str) -> QuestionLayout:
+        """
+        Get where every question of a PDF starts, scanning the layout on first sight.
+
+        Args:
+            pdf_path: Path to the PDF file
+
+        Returns:
+            QuestionLayout of the file's current content
+
+        Raises:
+            PDFParsingError: If the PDF cannot be read
+        """
+        metadata = self.get(pdf_path)
+        content_hash = metadata.content_hash
+
+        with self._lock:
+            layout = self._layouts.get(content_hash)
+            if layout is not None:
+                self._layouts.move_to_end(content_hash)
+                return layout
+
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT version FROM question_layouts WHERE content_hash = ?", (content_hash,)
+        ).fetchone()
+        if row is not None and row[0] == LAYOUT_VERSION:
+            starts = [
+                QuestionStart(number, page_num, y0, y1)
+                for number, page_num, y0, y1 in conn.execute(
+                    "SELECT number, page_num, y0, y1 FROM question_starts "
+                    "WHERE content_hash = ? ORDER BY position",
+                    (content_hash,)
+                ).fetchall()
+            ]
+            layout = QuestionLayout(starts, metadata.page_count)
+        else:
+            layout = self._build_layout(pdf_path, content_hash, get_chunk_store().get_buffer(pdf_path))
+
+        with self._lock:
+            self._layouts[content_hash] = layout
+            while len(self._layouts) > 256:
+                self._layouts.popitem(last=False)
+        return layout
+
+    @staticmethod
+    @contextmanager
+    def _open(pdf_path: str, data: Optional[bytes] = None) -> Iterator[Any]:
+        """Open a PDF from its in-memory buffer, or lease it from the document cache."""
+        if data is None:
+            with get_global_cache().borrow(pdf_path) as pdf:
+                yield pdf
+        else:
+            with fitz.open(stream=data, filetype="pdf") as pdf:
+                yield pdf
+
+    def _build_layout(self, pdf_path: str, content_hash: str,
+                      data: Optional[bytes] = None) -> QuestionLayout:
+        """Scan a document's question layout and store it."""
+        try:
+            with self._open(pdf_path, data) as pdf:
+                layout = scan_question_layout(pdf)
+        except Exception as e:
+            logger.error(f"Failed to scan question layout of {pdf_path}: {str(e)}")
+            raise PDFParsingError(f"Cannot scan question layout: {str(e)}")
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM question_starts WHERE content_hash = ?", (content_hash,))
+            conn.executemany(
+                "INSERT INTO question_starts (content_hash, position, number, page_num, y0, y1) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(content_hash, position) + start.to_tuple() for position, start in enumerate(layout.starts)]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO question_layouts (content_hash, version, created_at) VALUES (?, ?, ?)",
+                (content_hash, LAYOUT_VERSION, time.time())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        logger.info(f"Indexed question layout of {Path(pdf_path).name}: {len(layout.starts)} questions")
+        return layout
+
+    def _load(self, content_hash: str) -> Optional[PDFMetadata]:
+        """Read a document's metadata from disk (None on miss or outdated row)."""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT version, page_count FROM documents WHERE content_hash = ?",
+            (content_hash,)
+        ).fetchone()
+        if row is None or row[0] != INDEX_VERSION:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        pages = conn.execute(
+            "SELECT width, height, text_length, image_count FROM pages "
+            "WHERE content_hash = ? ORDER BY page_num",
+            (content_hash,)
+        ).fetchall()
+        if len(pages) != row[1]:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        conn.execute("UPDATE documents SET last_access = ? WHERE content_hash = ?", (time.time(), content_hash))
+        with self._lock:
+            self.hits += 1
+        return PDFMetadata(
+            content_hash,
+            [(width, height) for width, height, _, _ in pages],
+            [text_length for _, _, text_length, _ in pages],
+            [image_count for _, _, _, image_count in pages]
+        )
+
+    def _build(self, pdf_path: str, content_hash: str, data: Optional[bytes] = None) -> PDFMetadata:
+        """Extract a document's metadata and store it."""
+        rows: List[Tuple[Any, ...]] = []
+        try:
+            with self._open(pdf_path, data) as pdf:
+                for index, page in enumerate(pdf):
+                    page_num = index + 1
+                    text = page.get_text("text")
+                    rect = page.rect
+                    rows.append((content_hash, page_num, rect.width, rect.height, text,
+                                 len(text.strip()), len(page.get_images(full=False))))
+        except Exception as e:
+            logger.error(f"Failed to index PDF {pdf_path}: {str(e)}")
+            raise PDFParsingError(f"Cannot index PDF file: {str(e)}")
+
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM pages WHERE content_hash = ?", (content_hash,))
+            conn.executemany(
+                "INSERT INTO pages (content_hash, page_num, width, height, text, text_length, image_count) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO documents "
+                "(content_hash, version, page_count, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (content_hash, INDEX_VERSION, len(rows), now, now)
+            )
+            self._prune(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        with self._lock:
+            self.builds += 1
+        logger.debug(f"Indexed {Path(pdf_path).name}: {len(rows)} pages")
+        return PDFMetadata(
+            content_hash,
+            [(width, height) for _, _, width, height, _, _, _ in rows],
+            [text_length for *_, text_length, _ in rows],
+            [image_count for *_, image_count in rows]
+        )
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """Drop least recently used documents beyond max_documents (inside a transaction)."""
+        stale = conn.execute(
+            "SELECT content_hash FROM documents ORDER BY last_access DESC LIMIT -1 OFFSET ?",
+            (self.max_documents,)
+        ).fetchall()
+        for (content_hash,) in stale:
+            conn.execute("DELETE FROM pages WHERE content_hash = ?", (content_hash,))
+            conn.execute("DELETE FROM question_starts WHERE content_hash = ?", (content_hash,))
+            conn.execute("DELETE FROM question_layouts WHERE content_hash = ?", (content_hash,))
+            conn.execute("DELETE FROM documents WHERE content_hash = ?", (content_hash,))
+        if stale:
+            logger.debug(f"Pruned {len(stale)} documents from the PDF metadata index")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics."""
+        conn = self._connect()
+        count = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        layouts = conn.execute("SELECT COUNT(*) FROM question_layouts").fetchone()[0]
+        with self._lock:
+            return {
+                "documents": count,
+                "question_layouts": layouts,
+                "hits": self.hits,
+                "misses": self.misses,
+                "builds": self.builds
+            }
+
+
+# Global index instance
+_global_metadata_index: Optional[PDFMetadataIndex] = None
+_metadata_index_lock = threading.Lock()
+
+
+def get_metadata_index() -> PDFMetadataIndex:
+    """
+    Get the global PDF metadata index.
+
+    Returns:
+        Global PDFMetadataIndex instance
+    """
+    global _global_metadata_index
+
+    with _metadata_index_lock:
+        if _global_metadata_index is None:
+            _global_metadata_index = PDFMetadataIndex()
+            logger.info(f"Created PDF metadata index at {_global_metadata_index.db_path}")
+    return _global_metadata_index
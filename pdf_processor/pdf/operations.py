@@ -8,11 +8,18 @@ from pathlib import Path
 from typing import List, Tuple, Optional, Dict, Any
 import pymupdf as fitz
 
+from .cache import get_global_cache
+from .metadata_index import get_metadata_index
+from .question_layout import QuestionLayout
+from ..utils.config import ProcessingConfig
 from ..utils.logging import get_logger
 from ..utils.exceptions import PDFParsingError, FileNotFoundError
 
 logger = get_logger(__name__)
 
+# Space kept above a question's first line when cropping it
+QUESTION_CROP_PADDING = 6.0
+
 
 class PDFOperations:
     """Handles all PDF manipulation operations."""
@@ -33,30 +40,64 @@ class PDFOperations:
             PDFParsingError: If PDF cannot be opened
         """
         pdf_path = Path(pdf_path)
+        data = None
         if not pdf_path.exists():
-            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+            # Chunks kept in memory have no file at their path
+            from .chunk_store import get_chunk_store
+            data = get_chunk_store().get_buffer(str(pdf_path))
+            if data is None:
+                raise FileNotFoundError(f"PDF file not found: {pdf_path}")
             
         try:
-            with fitz.open(str(pdf_path)) as pdf:
-                return len(pdf)
+            if data is not None:
+                with fitz.open(stream=data, filetype="pdf") as pdf:
+                    return len(pdf)
+            return get_global_cache().get_page_count(str(pdf_path))
         except Exception as e:
             logger.error(f"Failed to open PDF {pdf_path}: {str(e)}")
             raise PDFParsingError(f"Cannot open PDF file: {str(e)}")
     
     @staticmethod
-    def split_pdf_for_chunks(pdf_path: str, max_pages: int = 40) -> List[Tuple[str, int, int]]:
+    def _pdf_exists(pdf_path: Path) -> bool:
+        """Check for a PDF on disk or, for chunks kept in memory, in the chunk store."""
+        if pdf_path.exists():
+            return True
+        from .chunk_store import get_chunk_store
+        return get_chunk_store().get_buffer(str(pdf_path)) is not None
+    
+    @staticmethod
+    def split_pdf_for_chunks(pdf_path: str, max_pages: Optional[int] = None,
+                             model_name: Optional[str] = None) -> List[Tuple[str, int, int]]:
         """
         Split PDF into chunks for processing.
         
+        With ADAPTIVE_CHUNKING (and no explicit max_pages) pages are packed up to
+        the model's token budget by the chunk planner; otherwise chunks have a
+        fixed page count.
+        
         Args:
             pdf_path: Path to the PDF file
-            max_pages: Maximum pages per chunk
+            max_pages: Fixed maximum pages per chunk (bypasses the planner)
+            model_name: Gemini model the chunks are sent to (selects the token budget)
             
         Returns:
             List of tuples (pdf_path, start_page, end_page)
         """
         pdf_path = Path(pdf_path)
-        total_pages = PDFOperations.get_page_count(str(pdf_path))
+        
+        if not PDFOperations._pdf_exists(pdf_path):
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+        
+        if max_pages is None and ProcessingConfig.ADAPTIVE_CHUNKING:
+            from .chunk_planner import get_chunk_planner
+            chunks = get_chunk_planner().plan(str(pdf_path), model_name)
+            if len(chunks) > 1:
+                logger.info(f"Split {pdf_path.name} into {len(chunks)} chunks "
+                            f"({chunks[-1][2]} pages total, token-aware)")
+            return chunks
+        
+        max_pages = max_pages or ProcessingConfig.get_chunk_size()
+        total_pages = get_metadata_index().get_page_count(str(pdf_path))
         
         if total_pages <= max_pages:
             # Small enough to process as one chunk
@@ -91,7 +132,7 @@ class PDFOperations:
             PDFParsingError: If extraction fails
         """
         try:
-            with fitz.open(str(pdf_path)) as src_pdf:
+            with get_global_cache().borrow(pdf_path) as src_pdf:
                 # Validate page numbers
                 total_pages = len(src_pdf)
                 if start_page < 1 or start_page > total_pages:
@@ -99,12 +140,9 @@ class PDFOperations:
                 if end_page < start_page or end_page > total_pages:
                     raise ValueError(f"Invalid end page {end_page} (total pages: {total_pages})")
                 
-                # Create new PDF with selected pages
+                # Create new PDF with selected pages (0-based range, copied in one call)
                 output = fitz.open()
-                
-                # Convert to 0-based indexing
-                for page_num in range(start_page - 1, end_page):
-                    output.insert_pdf(src_pdf, from_page=page_num, to_page=page_num)
+                output.insert_pdf(src_pdf, from_page=start_page - 1, to_page=end_page - 1)
                 
                 # Determine output path
                 if output_path is None:
@@ -122,6 +160,26 @@ class PDFOperations:
             logger.error(f"Failed to extract pages from {pdf_path}: {str(e)}")
             raise PDFParsingError(f"Page extraction failed: {str(e)}")
     
+    @staticmethod
+    def materialize_chunks(pdf_path: str, chunks: List[Tuple[str, int, int]]) -> List[Tuple[str, int, int]]:
+        """
+        Get chunk files for a PDF, writing any missing ones in a single pass.
+        
+        Chunk files are shared through the chunk store (keyed by content hash
+        and page range) and must not be deleted by the caller. With
+        CHUNK_IN_MEMORY the chunks are in-memory buffers rather than files; they
+        are still passed around by path and uploaded from memory.
+        
+        Args:
+            pdf_path: Path to the source PDF
+            chunks: Chunks from split_pdf_for_chunks
+            
+        Returns:
+            List of tuples (chunk_path, start_page, end_page)
+        """
+        from .chunk_store import get_chunk_store
+        return get_chunk_store().materialize(pdf_path, chunks)
+    
     @staticmethod
     def get_page_text(pdf_path: str, page_num: int) -> str:
         """
@@ -135,13 +193,9 @@ class PDFOperations:
             Text content of the page
         """
         try:
-            with fitz.open(str(pdf_path)) as pdf:
-                if page_num < 1 or page_num > len(pdf):
-                    raise ValueError(f"Invalid page number {page_num}")
-                    
-                page = pdf[page_num - 1]  # Convert to 0-based
-                return page.get_text()
-                
+            # Served from the persistent metadata index after the first read
+            return get_metadata_index().get_page_text(str(pdf_path), page_num)
+            
         except Exception as e:
             logger.error(f"Failed to extract text from page {page_num}: {str(e)}")
             return ""
@@ -159,7 +213,7 @@ class PDFOperations:
             output = fitz.open()
             
             for pdf_path in pdf_paths:
-                with fitz.open(str(pdf_path)) as pdf:
+                with get_global_cache().borrow(pdf_path) as pdf:
                     output.insert_pdf(pdf)
             
             output.save(output_path)
@@ -183,7 +237,7 @@ class PDFOperations:
             True if valid PDF, False otherwise
         """
         try:
-            with fitz.open(str(pdf_path)) as pdf:
+            with get_global_cache().borrow(pdf_path) as pdf:
                 # Try to access first page to ensure it's readable
                 if len(pdf) > 0:
                     _ = pdf[0]
@@ -204,7 +258,7 @@ class PDFOperations:
             Dictionary containing page metadata
         """
         try:
-            with fitz.open(str(pdf_path)) as pdf:
+            with get_global_cache().borrow(pdf_path) as pdf:
                 if page_num < 1 or page_num > len(pdf):
                     raise ValueError(f"Invalid page number {page_num}")
                 
@@ -221,4 +275,127 @@ class PDFOperations:
                 
         except Exception as e:
             logger.error(f"Failed to get page metadata: {str(e)}")
-            return {}
\ No newline at end of file
+            return {}
+    
+    @staticmethod
+    def get_question_layout(pdf_path: str) -> QuestionLayout:
+        """
+        Get where every question of an exam PDF starts.
+        
+        The layout is scanned once per distinct file (at jokbo ingest) and
+        served from the persistent metadata index afterwards.
+        
+        Args:
+            pdf_path: Path to the jokbo PDF
+            
+        Returns:
+            QuestionLayout of the file
+        """
+        return get_metadata_index().get_question_layout(str(pdf_path))
+    
+    @staticmethod
+    def index_questions(pdf_path: str) -> List[Tuple[int, str]]:
+        """
+        Index the question numbers of an exam PDF.
+        
+        Args:
+            pdf_path: Path to the jokbo PDF
+            
+        Returns:
+            List of tuples (page, question_number) in reading order
+        """
+        layout = PDFOperations.get_question_layout(pdf_path)
+        return [(start.page, start.number) for start in layout.starts]
+    
+    @staticmethod
+    def split_by_question_groups(pdf_path: str, group_size: int = 20) -> List[Tuple[int, int, int, int]]:
+        """
+        Split an exam PDF into page ranges of consecutive questions.
+        
+        Args:
+            pdf_path: Path to the jokbo PDF
+            group_size: Questions per group
+            
+        Returns:
+            List of tuples (start_page, end_page, first_question, last_question)
+        """
+        groups = PDFOperations.get_question_layout(pdf_path).groups(group_size)
+        logger.debug(f"Grouped {Path(pdf_path).name} into {len(groups)} question range(s)")
+        return groups
+    
+    @staticmethod
+    def extract_question_region(pdf_path: str, page_start: int, next_question_start: Optional[int],
+                                question_number: Any, output_path: Optional[str] = None) -> str:
+        """
+        Extract one question into a new PDF, cropped to where it starts and ends.
+        
+        The question is located in the indexed layout (nearest to page_start);
+        its first page is cropped above the question and its last page below
+        the next question. Questions missing from the layout fall back to the
+        whole pages from page_start to next_question_start.
+        
+        Args:
+            pdf_path: Path to the jokbo PDF
+            page_start: Page the question starts on (1-based, a hint)
+            next_question_start: Page the next question starts on, if known
+            question_number: Question number
+            output_path: Optional output path (creates temp file if not provided)
+            
+        Returns:
+            Path to the extracted PDF file
+            
+        Raises:
+            PDFParsingError: If extraction fails
+        """
+        try:
+            layout = PDFOperations.get_question_layout(pdf_path)
+            start = layout.find(question_number, near_page=page_start or None)
+        except Exception as e:
+            logger.warning(f"Question layout unavailable for {pdf_path}: {str(e)}")
+            layout, start = None, None
+        
+        if start is None:
+            total_pages = PDFOperations.get_page_count(pdf_path)
+            first = min(max(1, int(page_start or 1)), total_pages)
+            last = min(max(first, int(next_question_start or first)), total_pages)
+            return PDFOperations.extract_pages(pdf_path, first, last, output_path)
+        
+        following = layout.next_start(start)
+        last = layout.end_page(start)
+        try:
+            with get_global_cache().borrow(pdf_path) as src_pdf:
+                output = fitz.open()
+                output.insert_pdf(src_pdf, from_page=start.page - 1, to_page=last - 1)
+                
+                # Crop in unrotated page coordinates (layout positions are relative to the cropbox)
+                first_page = output[0]
+                box = first_page.cropbox
+                top = box.y0 + max(0.0, start.y0 - QUESTION_CROP_PADDING)
+                bottom = box.y1
+                if following is not None and following.page == last:
+                    # The next question starts on this question's last page; cut above it
+                    if last > start.page:
+                        last_page = output[-1]
+                        last_box = last_page.cropbox
+                        last_page.set_cropbox(fitz.Rect(last_box.x0, last_box.y0,
+                                                        last_box.x1, last_box.y0 + following.y0))
+                    elif following.y0 > start.y0:
+                        # (higher up on the same page means a second column; keep the page whole)
+                        bottom = box.y0 + following.y0
+                if bottom - top > QUESTION_CROP_PADDING:
+                    first_page.set_cropbox(fitz.Rect(box.x0, top, box.x1, bottom))
+                
+                if output_path is None:
+                    temp_file = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
+                    output_path = temp_file.name
+                
+                output.save(output_path)
+                output.close()
+                
+                logger.debug(f"Extracted question {start.number} (pages {start.page}-{last}) "
+                             f"from {pdf_path} to {output_path}")
+                return output_path
+                
+        except Exception as e:
+            logger.error(f"Failed to extract question {question_number} from {pdf_path}: {str(e)}")
+            raise PDFParsingError(f"Question extraction failed: {str(e)}")
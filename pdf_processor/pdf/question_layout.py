@@ -0,0 +1,166 @@
+"""
+Question layout of exam (jokbo) PDFs.
+Finds where every numbered question starts (page and vertical span) from the
+text layout, once per file; the result is persisted by the PDF metadata index
+so cropping, grouping and end-page decisions are lookups afterwards.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# A question starts a line with "12." / "12번" / "문제 12." ("12)" is left out: answer choices use it)
+QUESTION_LINE = re.compile(r"^\s*(?:문제\s*)?(\d{1,3})\s*(?:\.(?!\d)|번)")
+
+# Accept the next question number at most this far past the previous one (missed numbers)
+MAX_NUMBER_GAP = 5
+
+# A question starting this close to the top of a page doesn't spill from the previous page
+TOP_MARGIN = 72.0
+
+
+class QuestionStart:
+    """Where a question starts: its page and the vertical span it covers there."""
+
+    def __init__(self, number: str, page: int, y0: float, y1: float):
+        self.number = number
+        self.page = page
+        # Top of the question's first line and the end of its region on this page
+        self.y0 = y0
+        self.y1 = y1
+
+    def to_tuple(self) -> Tuple[str, int, float, float]:
+        """Serialize for storage."""
+        return (self.number, self.page, self.y0, self.y1)
+
+
+class QuestionLayout:
+    """Question starts of one PDF, in reading order."""
+
+    def __init__(self, starts: List[QuestionStart], page_count: int):
+        self.starts = starts
+        self.page_count = page_count
+        self._by_number: Dict[str, List[int]] = {}
+        for position, start in enumerate(starts):
+            self._by_number.setdefault(start.number, []).append(position)
+
+    def find(self, question_number: Any, near_page: Optional[int] = None) -> Optional[QuestionStart]:
+        """
+        Find where a question starts.
+
+        Args:
+            question_number: Question number ("12", 12, "12번" all match)
+            near_page: Preferred page when the number occurs more than once
+
+        Returns:
+            The question's start, or None if it wasn't found
+        """
+        number = normalize_question_number(question_number)
+        positions = self._by_number.get(number) if number else None
+        if not positions:
+            return None
+        if near_page is None:
+            return self.starts[positions[0]]
+        return min((self.starts[p] for p in positions), key=lambda s: abs(s.page - near_page))
+
+    def next_start(self, start: QuestionStart) -> Optional[QuestionStart]:
+        """Get the question that follows a start in reading order."""
+        position = self.starts.index(start)
+        return self.starts[position + 1] if position + 1 < len(self.starts) else None
+
+    def pages_of(self, question_number: Any) -> List[int]:
+        """Get every page a question number starts on."""
+        number = normalize_question_number(question_number)
+        return sorted({self.starts[p].page for p in self._by_number.get(number, [])})
+
+    def end_page(self, start: QuestionStart) -> int:
+        """
+        Get the last page a question occupies.
+
+        A question runs until the next one starts; if that is at the top of a
+        later page, the question ends on the page before.
+
+        Args:
+            start: The question's start
+
+        Returns:
+            Last page (1-based)
+        """
+        following = self.next_start(start)
+        if following is None:
+            return start.page
+        if following.page > start.page and following.y0 <= TOP_MARGIN:
+            return following.page - 1
+        return following.page
+
+    def groups(self, group_size: int) -> List[Tuple[int, int, int, int]]:
+        """
+        Group consecutive questions into page ranges.
+
+        Args:
+            group_size: Questions per group
+
+        Returns:
+            (start_page, end_page, first_question, last_question) per group
+        """
+        starts = [s for s in self.starts if s.number.isdigit()]
+        if not starts:
+            return [(1, max(1, self.page_count), 1, group_size)]
+        groups = []
+        for i in range(0, len(starts), max(1, group_size)):
+            members = starts[i:i + group_size]
+            start_page = 1 if i == 0 else members[0].page
+            end_page = self.page_count if i + group_size >= len(starts) else self.end_page(members[-1])
+            groups.append((start_page, max(start_page, end_page), int(members[0].number), int(members[-1].number)))
+        return groups
+
+
+def normalize_question_number(value: Any) -> Optional[str]:
+    """Reduce "12", 12, "12번", "Q12" to "12" (None if there is no number)."""
+    match = re.search(r"\d+", str(value or ""))
+    return str(int(match.group(0))) if match else None
+
+
+def scan_question_layout(pdf: Any) -> QuestionLayout:
+    """
+    Find every question start in a document.
+
+    Line starts like "12." are candidates; a candidate is kept only if its
+    number continues the sequence (up to MAX_NUMBER_GAP ahead), which drops
+    numbered lists inside questions.
+
+    Args:
+        pdf: Open document (fitz.Document)
+
+    Returns:
+        QuestionLayout of the document
+    """
+    starts: List[QuestionStart] = []
+    last_number = 0
+    for index, page in enumerate(pdf):
+        page_starts: List[QuestionStart] = []
+        # Rotated pages report coordinates differently; keep whole pages for them
+        rotated = page.rotation != 0
+        for block in page.get_text("dict").get("blocks", []):
+            for line in block.get("lines", []):
+                text = "".join(span.get("text", "") for span in line.get("spans", []))
+                match = QUESTION_LINE.match(text)
+                if not match:
+                    continue
+                number = int(match.group(1))
+                if starts or page_starts:
+                    if not last_number < number <= last_number + MAX_NUMBER_GAP:
+                        continue
+                last_number = number
+                y0 = 0.0 if rotated else float(line["bbox"][1])
+                page_starts.append(QuestionStart(str(number), index + 1, y0, float(page.rect.height)))
+        for current, following in zip(page_starts, page_starts[1:]):
+            # In reading order; a following start higher up is in the next column
+            if following.y0 > current.y0:
+                current.y1 = following.y0
+        starts.extend(page_starts)
+    logger.debug(f"Found {len(starts)} question starts in {len(pdf)} pages")
+    return QuestionLayout(starts, len(pdf))
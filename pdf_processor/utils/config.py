@@ -16,8 +16,48 @@ class ProcessingConfig:
     # Chunk processing
     DEFAULT_CHUNK_SIZE = int(os.environ.get('MAX_PAGES_PER_CHUNK', '40'))
     
+    # Token-aware chunk planning (packs pages up to a per-model token budget)
+    ADAPTIVE_CHUNKING = os.environ.get('ADAPTIVE_CHUNKING', 'true').lower() in ('1', 'true', 'yes')
+    CHUNK_TOKEN_BUDGETS = {
+        "gemini-2.5-pro": 24_000,
+        "gemini-2.5-flash": 24_000,
+        "gemini-2.5-flash-lite": 16_000,
+        "default": 16_000,
+    }
+    CHUNK_TOKEN_BUDGET_OVERRIDE = int(os.environ.get('CHUNK_TOKEN_BUDGET', '0'))
+    CHUNK_MAX_PAGES = int(os.environ.get('CHUNK_MAX_PAGES', '100'))
+    CHUNK_CHARS_PER_TOKEN = 3.0
+    CHUNK_TOKENS_PER_IMAGE = 64
+    CHUNK_MAX_IMAGES_PER_PAGE = 8
+    CHUNK_BUDGET_DECREASE = 0.7
+    CHUNK_BUDGET_RECOVERY = 0.02
+    CHUNK_BUDGET_MIN_SCALE = 0.25
+    CHUNK_PLANNER_STATE_PATH = os.environ.get('CHUNK_PLANNER_STATE_PATH', 'output/cache/chunk_planner.json')
+    
+    # Chunk files, kept by (source content hash, page range) and reused across jobs
+    CHUNK_CACHE_DIR = os.environ.get('CHUNK_CACHE_DIR', 'output/cache/chunks')
+    CHUNK_CACHE_MAX_MB = int(os.environ.get('CHUNK_CACHE_MAX_MB', '2048'))
+    CHUNK_CACHE_MIN_AGE_SECONDS = 60 * 60
+    # Keep chunk PDFs in memory (uploaded straight from the buffer) up to this size, then spill to disk
+    CHUNK_IN_MEMORY = os.environ.get('CHUNK_IN_MEMORY', 'false').lower() in ('1', 'true', 'yes')
+    CHUNK_MEMORY_MAX_MB = int(os.environ.get('CHUNK_MEMORY_MAX_MB', '256'))
+    
+    # Open PDF documents shared by a process (least recently used ones close past either limit)
+    PDF_CACHE_MAX_DOCUMENTS = int(os.environ.get('PDF_CACHE_MAX_DOCUMENTS', '32'))
+    PDF_CACHE_MAX_MB = int(os.environ.get('PDF_CACHE_MAX_MB', '512'))
+    
+    # Page counts, sizes, text and question positions, extracted once per distinct file
+    PDF_METADATA_INDEX_PATH = os.environ.get('PDF_METADATA_INDEX_PATH', 'output/cache/pdf_metadata.sqlite3')
+    PDF_METADATA_INDEX_MAX_DOCUMENTS = int(os.environ.get('PDF_METADATA_INDEX_MAX_DOCUMENTS', '2000'))
+    
+    # Build output PDFs from per-question segments in a process pool (0 processes = one per CPU core)
+    PDF_ASSEMBLY_PARALLEL = os.environ.get('PDF_ASSEMBLY_PARALLEL', 'false').lower() in ('1', 'true', 'yes')
+    PDF_ASSEMBLY_PROCESSES = int(os.environ.get('PDF_ASSEMBLY_PROCESSES', '0'))
+    PDF_ASSEMBLY_MIN_SEGMENTS = int(os.environ.get('PDF_ASSEMBLY_MIN_SEGMENTS', '16'))
+    
     # Parallel processing
     DEFAULT_THREAD_WORKERS = 3
+    MAX_IN_FLIGHT_PER_KEY = int(os.environ.get('MAX_IN_FLIGHT_PER_KEY', '4'))
     
     # API retry
     MAX_RETRIES = 3
@@ -27,6 +67,96 @@ class ProcessingConfig:
     MIN_RELEVANCE_SCORE = 50
     MAX_CONNECTIONS_PER_QUESTION = 2
     
+    # Upload cache (reuse remote files across analyses until they expire)
+    UPLOAD_CACHE_ENABLED = os.environ.get('UPLOAD_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    UPLOAD_CACHE_PATH = os.environ.get('UPLOAD_CACHE_PATH', 'output/cache/uploads.sqlite3')
+    UPLOAD_CACHE_SAFETY_MARGIN_MINUTES = int(os.environ.get('UPLOAD_CACHE_SAFETY_MARGIN_MINUTES', '60'))
+    UPLOAD_CACHE_MAX_FILES = int(os.environ.get('UPLOAD_CACHE_MAX_FILES', '100'))
+    UPLOAD_CACHE_MAX_MB = int(os.environ.get('UPLOAD_CACHE_MAX_MB', '2048'))
+    
+    # Response replay cache (reuse responses for identical prompt + file content + model)
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    RESPONSE_CACHE_PATH = os.environ.get('RESPONSE_CACHE_PATH', 'output/cache/responses.sqlite3')
+    RESPONSE_CACHE_TTL_HOURS = float(os.environ.get('RESPONSE_CACHE_TTL_HOURS', '168'))
+    RESPONSE_CACHE_MAX_MB = int(os.environ.get('RESPONSE_CACHE_MAX_MB', '512'))
+    RESPONSE_CACHE_MAX_FILES = int(os.environ.get('RESPONSE_CACHE_MAX_FILES', '4096'))
+    
+    # Server-side context caching of the system prompt + pre-uploaded center file
+    CONTEXT_CACHE_ENABLED = os.environ.get('CONTEXT_CACHE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    CONTEXT_CACHE_TTL_MINUTES = int(os.environ.get('CONTEXT_CACHE_TTL_MINUTES', '60'))
+    
+    # Batch mode (submit a whole job as one asynchronous Gemini batch)
+    BATCH_MODE = os.environ.get('BATCH_MODE', 'false').lower() in ('1', 'true', 'yes')
+    BATCH_POLL_INTERVAL = float(os.environ.get('BATCH_POLL_INTERVAL', '30'))
+    BATCH_TIMEOUT_HOURS = float(os.environ.get('BATCH_TIMEOUT_HOURS', '24'))
+    
+    # Background garbage collection of uploaded files
+    FILE_GC_INDEX_PATH = os.environ.get('FILE_GC_INDEX_PATH', 'output/cache/remote_files.sqlite3')
+    FILE_GC_WORKERS = int(os.environ.get('FILE_GC_WORKERS', '8'))
+    FILE_GC_BATCH_SIZE = int(os.environ.get('FILE_GC_BATCH_SIZE', '32'))
+    FILE_GC_MAX_ATTEMPTS = 5
+    FILE_GC_INTERVAL = float(os.environ.get('FILE_GC_INTERVAL', '30'))
+    FILE_GC_ORPHAN_AGE_HOURS = float(os.environ.get('FILE_GC_ORPHAN_AGE_HOURS', '26'))
+    
+    # Background upload pipeline
+    UPLOAD_PIPELINE_WORKERS = int(os.environ.get('UPLOAD_PIPELINE_WORKERS', '4'))
+    
+    # Upload PROCESSING-state polling
+    UPLOAD_POLL_INITIAL_INTERVAL = float(os.environ.get('UPLOAD_POLL_INITIAL_INTERVAL', '0.25'))
+    UPLOAD_POLL_MAX_INTERVAL = float(os.environ.get('UPLOAD_POLL_MAX_INTERVAL', '5'))
+    UPLOAD_PROCESSING_SECONDS_PER_MB = float(os.environ.get('UPLOAD_PROCESSING_SECONDS_PER_MB', '0.5'))
+    UPLOAD_PROCESSING_TIMEOUT = float(os.environ.get('UPLOAD_PROCESSING_TIMEOUT', '600'))
+    
+    # Per-key rate limits: model name -> (requests per minute, tokens per minute)
+    MODEL_RATE_LIMITS = {
+        "gemini-2.5-pro": (150, 2_000_000),
+        "gemini-2.5-flash": (1000, 1_000_000),
+        "gemini-2.5-flash-lite": (4000, 4_000_000),
+        "default": (60, 1_000_000),
+    }
+    RPM_LIMIT_OVERRIDE = int(os.environ.get('GEMINI_RPM_LIMIT', '0'))
+    TPM_LIMIT_OVERRIDE = int(os.environ.get('GEMINI_TPM_LIMIT', '0'))
+    TOKENS_PER_PDF_PAGE = 258
+    DEFAULT_REQUEST_TOKENS = int(os.environ.get('DEFAULT_REQUEST_TOKENS', '20000'))
+    RATE_LIMIT_MAX_WAIT = float(os.environ.get('RATE_LIMIT_MAX_WAIT', '120'))
+    MAX_CONSECUTIVE_RATE_LIMITS = 5
+    
+    # Key selection signals
+    LATENCY_EWMA_ALPHA = 0.3
+    RATE_LIMIT_WINDOW_SECONDS = 300
+    RATE_LIMIT_SCORE_PENALTY = 4.0
+    LATENCY_HISTORY_SIZE = 200
+    
+    # Hedged requests: duplicate a straggling chunk on an idle key
+    HEDGE_REQUESTS_ENABLED = os.environ.get('HEDGE_REQUESTS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    HEDGE_LATENCY_PERCENTILE = float(os.environ.get('HEDGE_LATENCY_PERCENTILE', '0.95'))
+    HEDGE_MIN_SAMPLES = 5
+    # Session cleanup waits this long for losing hedge copies before deleting their inputs
+    HEDGE_DRAIN_TIMEOUT = float(os.environ.get('HEDGE_DRAIN_TIMEOUT', '120'))
+    
+    # Stream responses and parse result elements as they arrive
+    STREAM_RESPONSES = os.environ.get('STREAM_RESPONSES', 'false').lower() in ('1', 'true', 'yes')
+    
+    # API backend: "genai" (real Gemini) or "fake" (offline stand-in for load tests)
+    GEMINI_BACKEND = os.environ.get('GEMINI_BACKEND', 'genai').lower()
+    FAKE_GEMINI_SEED = int(os.environ.get('FAKE_GEMINI_SEED', '0'))
+    FAKE_GEMINI_REPLAY_DIR = os.environ.get('FAKE_GEMINI_REPLAY_DIR', 'output/debug')
+    FAKE_GEMINI_LATENCY_MEDIAN = float(os.environ.get('FAKE_GEMINI_LATENCY_MEDIAN', '2.0'))
+    FAKE_GEMINI_LATENCY_SIGMA = float(os.environ.get('FAKE_GEMINI_LATENCY_SIGMA', '0.5'))
+    FAKE_GEMINI_RATE_LIMIT_RATE = float(os.environ.get('FAKE_GEMINI_RATE_LIMIT_RATE', '0'))
+    FAKE_GEMINI_ERROR_RATE = float(os.environ.get('FAKE_GEMINI_ERROR_RATE', '0'))
+    FAKE_GEMINI_TRUNCATION_RATE = float(os.environ.get('FAKE_GEMINI_TRUNCATION_RATE', '0'))
+    FAKE_GEMINI_RPM = int(os.environ.get('FAKE_GEMINI_RPM', '0'))
+    FAKE_GEMINI_PROCESSING_SECONDS_PER_MB = float(os.environ.get('FAKE_GEMINI_PROCESSING_SECONDS_PER_MB', '0.2'))
+    FAKE_GEMINI_BATCH_SECONDS = float(os.environ.get('FAKE_GEMINI_BATCH_SECONDS', '5'))
+    
+    # Shared key health state ("auto" uses Redis when a URL is set, else SQLite)
+    KEY_STATE_BACKEND = os.environ.get('KEY_STATE_BACKEND', 'auto')
+    KEY_STATE_PATH = os.environ.get('KEY_STATE_PATH', 'output/cache/key_state.sqlite3')
+    KEY_STATE_REDIS_URL = os.environ.get('KEY_STATE_REDIS_URL') or os.environ.get('REDIS_URL', '')
+    KEY_STATE_TTL_SECONDS = 24 * 60 * 60
+    KEY_STATE_SYNC_INTERVAL = float(os.environ.get('KEY_STATE_SYNC_INTERVAL', '2'))
+    
     @classmethod
     def get_chunk_size(cls) -> int:
         """Get configured chunk size."""
@@ -0,0 +1,98 @@
+"""
+Bounded-concurrency task execution.
+Runs tasks on a thread pool with a cap on how many are in flight at once and
+returns their results in submission order, so callers can merge them as if
+the tasks had run sequentially.
+"""
+
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class BoundedExecutor:
+    """Runs tasks concurrently with at most max_in_flight running at a time."""
+
+    def __init__(self, max_in_flight: int, name: str = "worker"):
+        """
+        Initialize the executor.
+
+        Args:
+            max_in_flight: Maximum number of tasks running at once
+            name: Thread name prefix
+        """
+        self.max_in_flight = max(1, max_in_flight)
+        self.name = name
+
+    def run(self, tasks: Iterable[Callable[[], Any]],
+            on_result: Optional[Callable[[int, Any], None]] = None) -> List[Any]:
+        """
+        Run tasks and wait for all of them.
+
+        Tasks are pulled from the iterable lazily, one ahead of a free slot, so a
+        generator can prepare each task's inputs just before it is needed. If a
+        task raises, no further tasks are started, the running ones are allowed
+        to finish and the first error (in task order) is re-raised.
+
+        Args:
+            tasks: Zero-argument callables
+            on_result: Optional callback invoked with (index, result) as each task
+                completes (in completion order, from the calling thread)
+
+        Returns:
+            Results in task order
+        """
+        if self.max_in_flight == 1:
+            # Nothing to overlap: run inline and skip the pool
+            results = []
+            for i, task in enumerate(tasks):
+                result = task()
+                results.append(result)
+                if on_result is not None:
+                    on_result(i, result)
+            return results
+
+        futures: Dict[int, Future] = {}
+        finished: "queue.Queue[int]" = queue.Queue()
+        failed = False
+        running = 0
+
+        def _collect() -> None:
+            # Wait for one running task and report its result
+            nonlocal failed, running
+            index = finished.get()
+            running -= 1
+            future = futures[index]
+            if future.exception() is not None:
+                failed = True
+            elif on_result is not None:
+                on_result(index, future.result())
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix=self.name) as pool:
+            iterator = iter(tasks)
+            try:
+                for i, task in enumerate(iterator):
+                    # The next task is already prepared while it waits for a slot
+                    while not finished.empty() or (running >= self.max_in_flight and not failed):
+                        _collect()
+                    if failed:
+                        break
+                    futures[i] = pool.submit(task)
+                    futures[i].add_done_callback(lambda _, i=i: finished.put(i))
+                    running += 1
+            finally:
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    close()
+                while running:
+                    _collect()
+
+        for i in sorted(futures):
+            error = futures[i].exception()
+            if error is not None:
+                raise error
+        return [futures[i].result() for i in sorted(futures)]
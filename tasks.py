@@ -9,7 +9,7 @@ from celery.exceptions import Ignore, SoftTimeLimitExceeded
 from typing import Optional
 import threading
 import time
-from config import create_model, configure_api, API_KEYS
+from config import create_model, configure_api, API_KEYS, MODEL_NAMES
 import logging
 from pdf_processor.core.processor import PDFProcessor
 from pdf_creator import PDFCreator
@@ -30,7 +30,37 @@ class ModeStrategy:
     output_template: str      # e.g. "jokbo_centric_{stem}_all_lessons.pdf"
 
 
-def _compute_total_chunks(primary_paths: list[str], lesson_paths: list[str]) -> int:
+def _count_lesson_chunks(lesson_paths: list[str], model_type: Optional[str] = None) -> int:
+    """Sum the chunks of every lesson (a lesson that can't be planned counts as one).
+
+    Lessons are planned against the job model's token budget, as PDFProcessor
+    chunks them. Page data comes from the persistent PDF metadata index, so a
+    lesson seen in an earlier job is planned without reopening it.
+    """
+    model_name = MODEL_NAMES.get(model_type or MODEL_TYPE, MODEL_NAMES["pro"])
+    lesson_chunks = 0
+    for lp in lesson_paths:
+        try:
+            lesson_chunks += len(PDFOperations.split_pdf_for_chunks(lp, model_name=model_name))
+        except Exception:
+            lesson_chunks += 1
+    return lesson_chunks
+
+
+def _ingest_jokbo(jokbo_path: str) -> None:
+    """Index a jokbo's question layout once, as it is downloaded (best-effort).
+
+    Cropping, grouping and question end-page decisions later read the layout
+    from the persistent PDF metadata index instead of rescanning the file.
+    """
+    try:
+        PDFOperations.index_questions(jokbo_path)
+    except Exception as e:
+        logger.warning(f"Question layout indexing failed for {Path(jokbo_path).name}: {e}")
+
+
+def _compute_total_chunks(primary_paths: list[str], lesson_paths: list[str],
+                          model_type: Optional[str] = None) -> int:
     """Compute total chunks as: number of primaries × sum(chunks across lessons).
 
     Matches existing behavior in both jokbo- and lesson-centric modes where
@@ -38,10 +68,7 @@ def _compute_total_chunks(primary_paths: list[str], lesson_paths: list[str]) ->
     """
     try:
         prim_count = len(primary_paths)
-        lesson_chunks = 0
-        for lp in lesson_paths:
-            lesson_chunks += len(PDFOperations.split_pdf_for_chunks(lp))
-        return max(1, prim_count * max(1, lesson_chunks))
+        return max(1, prim_count * max(1, _count_lesson_chunks(lesson_paths, model_type)))
     except Exception:
         return 1
 
@@ -113,6 +140,7 @@ def run_analysis_task(job_id: str, model_type: Optional[str], multi_api: Optiona
                     pass
                 storage_manager.save_file_locally(key, local_path)
                 jokbo_paths.append(str(local_path))
+                _ingest_jokbo(str(local_path))
 
             lesson_paths: list[str] = []
             for key in lesson_keys:
@@ -127,16 +155,23 @@ def run_analysis_task(job_id: str, model_type: Optional[str], multi_api: Optiona
 
             primary_paths = jokbo_paths if strategy.primary_kind == "jokbo" else lesson_paths
 
+            # Honor explicit param, then metadata["model"], then env/default
+            try:
+                meta_model = None
+                if isinstance(metadata, dict):
+                    meta_model = metadata.get("model")
+            except Exception:
+                meta_model = None
+            selected_model = model_type or meta_model or MODEL_TYPE
+
             # Init chunk-based progress
             try:
                 # chunking based on lessons regardless of mode
-                total_chunks = _compute_total_chunks(primary_paths, lesson_paths)
+                total_chunks = _compute_total_chunks(primary_paths, lesson_paths, selected_model)
                 # Add a more descriptive preflight log for debugging
                 try:
                     prim_count = len(primary_paths)
-                    lesson_chunks = 0
-                    for lp in lesson_paths:
-                        lesson_chunks += len(PDFOperations.split_pdf_for_chunks(lp))
+                    lesson_chunks = _count_lesson_chunks(lesson_paths, selected_model)
                     logging.getLogger(__name__).info(
                         f"preflight: primaries={prim_count} × lesson_chunks={lesson_chunks} => total_chunks={total_chunks}"
                     )
@@ -148,14 +183,6 @@ def run_analysis_task(job_id: str, model_type: Optional[str], multi_api: Optiona
 
             # Configure API/model
             configure_api()
-            # Honor explicit param, then metadata["model"], then env/default
-            try:
-                meta_model = None
-                if isinstance(metadata, dict):
-                    meta_model = metadata.get("model")
-            except Exception:
-                meta_model = None
-            selected_model = model_type or meta_model or MODEL_TYPE
             model = create_model(selected_model)
 
             # Establish job-level token budget based on total_chunks × per-chunk cost
@@ -572,6 +599,7 @@ def run_jokbo_analysis(job_id: str, model_type: str = None, multi_api: Optional[
                     pass
                 storage_manager.save_file_locally(key, local_path)
                 jokbo_paths.append(str(local_path))
+                _ingest_jokbo(str(local_path))
             
             lesson_paths = []
             for key in lesson_keys:
@@ -587,9 +615,7 @@ def run_jokbo_analysis(job_id: str, model_type: str = None, multi_api: Optional[
             # Initialize chunk-based progress
             try:
                 total_jokbos = len(jokbo_paths)
-                lesson_chunks = 0
-                for lp in lesson_paths:
-                    lesson_chunks += len(PDFOperations.split_pdf_for_chunks(lp))
+                lesson_chunks = _count_lesson_chunks(lesson_paths, model_type)
                 total_chunks = max(1, total_jokbos * lesson_chunks)
                 storage_manager.init_progress(job_id, total_chunks, f"총 청크: {total_chunks}")
             except Exception:
@@ -795,6 +821,7 @@ def run_lesson_analysis(job_id: str, model_type: str = None, multi_api: Optional
                     pass
                 storage_manager.save_file_locally(key, local_path)
                 jokbo_paths.append(str(local_path))
+                _ingest_jokbo(str(local_path))
             
             lesson_paths = []
             for key in lesson_keys:
@@ -811,9 +838,7 @@ def run_lesson_analysis(job_id: str, model_type: str = None, multi_api: Optional
             try:
                 total_lessons = len(lesson_paths)
                 total_jokbos = len(jokbo_paths)
-                lesson_chunks = 0
-                for lp in lesson_paths:
-                    lesson_chunks += len(PDFOperations.split_pdf_for_chunks(lp))
+                lesson_chunks = _count_lesson_chunks(lesson_paths, model_type)
                 total_chunks = max(1, lesson_chunks * max(1, total_jokbos))
                 storage_manager.init_progress(job_id, total_chunks, f"총 청크: {total_chunks}")
             except Exception:
@@ -1099,6 +1124,7 @@ def generate_partial_jokbo(job_id: str, model_type: Optional[str] = None, multi_
                 local_path = jokbo_dir / name
                 sm.save_file_locally(key, local_path)
                 jokbo_paths.append(str(local_path))
+                _ingest_jokbo(str(local_path))
 
             lesson_paths: list[str] = []
             for key in lesson_keys:
@@ -1109,12 +1135,7 @@ def generate_partial_jokbo(job_id: str, model_type: Optional[str] = None, multi_
 
             # Initialize progress: total chunks = jokbo_count * sum(lesson_chunks)
             try:
-                lesson_chunks = 0
-                for lp in lesson_paths:
-                    try:
-                        lesson_chunks += len(PDFOperations.split_pdf_for_chunks(lp))
-                    except Exception:
-                        lesson_chunks += 1
+                lesson_chunks = _count_lesson_chunks(lesson_paths, model_type or metadata.get("model"))
                 total_chunks = max(1, len(jokbo_paths) * max(1, lesson_chunks))
                 sm.init_progress(job_id, total_chunks, "부분 족보 분석 시작")
             except Exception:
@@ -1156,37 +1177,6 @@ def generate_partial_jokbo(job_id: str, model_type: Optional[str] = None, multi_
             except Exception:
                 analysis = processor.analyze_partial_jokbo_multi_api(jokbo_paths, lesson_paths, api_keys=_API_KEYS)
 
-            # Build a cache for question-number -> pages index per jokbo, to avoid
-            # trusting model-reported page_start for final cropping.
-            qindex_cache: dict[str, dict[int, list[int]]] = {}
-            def _qindex_for(path: str) -> dict[int, list[int]]:
-                key = str(Path(path).resolve()) if path else path
-                if key in qindex_cache:
-                    return qindex_cache[key]
-                try:
-                    pairs = PDFOperations.index_questions(path)
-                except Exception:
-                    pairs = []
-                m: dict[int, list[int]] = {}
-                for p, qv in pairs or []:
-                    try:
-                        qn = int(qv)
-                        pg = int(p)
-                    except Exception:
-                        continue
-                    if qn <= 0 or pg <= 0:
-                        continue
-                    m.setdefault(qn, [])
-                    if pg not in m[qn]:
-                        m[qn].append(pg)
-                for k in list(m.keys()):
-                    try:
-                        m[k].sort()
-                    except Exception:
-                        pass
-                qindex_cache[key] = m
-                return m
-
             # Crop questions
             questions: list[dict[str, str]] = []
             for idx, q in enumerate(analysis.get("questions", []), 1):
@@ -1203,7 +1193,11 @@ def generate_partial_jokbo(job_id: str, model_type: Optional[str] = None, multi_
                     reported_ps = int(q.get("page_start") or 1)
                     sp = reported_ps
                     if qn_int > 0:
-                        pages = _qindex_for(str(src_path)).get(qn_int) or []
+                        # Question starts were indexed at ingest; don't trust the model's page_start
+                        try:
+                            pages = PDFOperations.get_question_layout(str(src_path)).pages_of(qn_int)
+                        except Exception:
+                            pages = []
                         if pages:
                             # Choose nearest to reported hint
                             try:
@@ -1339,6 +1333,7 @@ def run_exam_only(job_id: str, model_type: Optional[str] = None, multi_api: Opti
                 lp = jokbo_dir / name
                 sm.save_file_locally(k, lp)
                 jokbo_paths.append(str(lp))
+                _ingest_jokbo(str(lp))
 
             # Build chunks across all jokbos and initialize progress
             from pdf_processor.pdf.operations import PDFOperations as _PDFOps
@@ -1384,13 +1379,15 @@ def run_exam_only(job_id: str, model_type: Optional[str] = None, multi_api: Opti
             questions_acc: list[dict] = []
 
             # Always use Multi-API distribution (single-key mode removed)
-            # Extract chunk PDFs first to enable distribution
-            task_items: list[tuple[str, str, tuple[int, int], tuple[int, int, int, int]]] = []
-            tmp_paths: list[Path] = []
+            # Materialize chunk PDFs first (one pass per jokbo) to enable distribution
+            chunk_files: dict[tuple[str, int, int], str] = {}
+            for jp in dict.fromkeys(jp for jp, _ in all_chunks):
+                ranges = [(jp, s, e) for cjp, (s, e, _, _) in all_chunks if cjp == jp]
+                for cpath, s, e in _PDFOps.materialize_chunks(jp, ranges):
+                    chunk_files[(jp, s, e)] = cpath
+            task_items: list[tuple[str, str, tuple[int, int], tuple[int, int]]] = []
             for jp, (s, e, qs, qe) in all_chunks:
-                cpath = _PDFOps.extract_pages(jp, s, e)
-                tmp_paths.append(Path(cpath))
-                task_items.append((jp, cpath, (s, e), (qs, qe)))
+                task_items.append((jp, chunk_files[(jp, s, e)], (s, e), (qs, qe)))
 
             # Distribute across keys
             api_manager = MultiAPIManager(API_KEYS, {"model": selected_model})
@@ -1423,13 +1420,6 @@ def run_exam_only(job_id: str, model_type: Optional[str] = None, multi_api: Opti
                         qq = dict(q)
                         questions_acc.append(qq)
 
-            # Cleanup tmp chunk PDFs
-            for p in tmp_paths:
-                try:
-                    p.unlink(missing_ok=True)
-                except Exception:
-                    pass
-
             # Crop and assemble final PDF per jokbo (questions are page-referenced to original)
             creator = PDFCreator()
             # For each jokbo, assemble a consolidated PDF preserving order by page_start then question_number
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""청크 플래너의 비용 균등 분할(_split_balanced) 테스트"""
+
+from pdf_processor.pdf.chunk_planner import ChunkPlanner
+
+
+def _check_ranges(ranges, page_count, count):
+    """범위가 빈틈없이 이어지고 모든 페이지를 덮는지 확인"""
+    assert len(ranges) == min(count, page_count)
+    assert ranges[0][0] == 1
+    assert ranges[-1][1] == page_count
+    for (start, end), (next_start, _) in zip(ranges, ranges[1:]):
+        assert start <= end
+        assert next_start == end + 1
+    assert ranges[-1][0] <= ranges[-1][1]
+
+
+def test_uniform_costs_split_evenly():
+    """비용이 같은 페이지는 같은 크기로 나뉘는지 확인"""
+    ranges = ChunkPlanner._split_balanced([100] * 12, 3)
+    assert ranges == [(1, 4), (5, 8), (9, 12)]
+
+
+def test_single_chunk_covers_everything():
+    """청크 하나면 전체 페이지를 담는지 확인"""
+    assert ChunkPlanner._split_balanced([5, 50, 500], 1) == [(1, 3)]
+
+
+def test_count_is_capped_at_page_count():
+    """청크 수가 페이지 수보다 많으면 페이지당 하나로 제한되는지 확인"""
+    assert ChunkPlanner._split_balanced([10, 20, 30], 10) == [(1, 1), (2, 2), (3, 3)]
+
+
+def test_heavy_pages_get_their_own_chunks():
+    """무거운 페이지가 있으면 비용 기준으로 경계가 잡히는지 확인"""
+    costs = [1000, 1000] + [100] * 20
+    ranges = ChunkPlanner._split_balanced(costs, 2)
+    _check_ranges(ranges, len(costs), 2)
+    assert ranges[0] == (1, 2)
+
+
+def test_every_chunk_keeps_at_least_one_page():
+    """비용이 끝에 몰려 있어도 모든 청크에 페이지가 남는지 확인"""
+    costs = [1] * 5 + [10_000] * 3
+    for count in range(1, len(costs) + 1):
+        _check_ranges(ChunkPlanner._split_balanced(costs, count), len(costs), count)
+
+
+def test_balanced_within_one_page():
+    """각 청크 비용이 목표치에서 한 페이지 비용 이상 벗어나지 않는지 확인"""
+    costs = [300, 120, 80, 450, 90, 210, 330, 60, 500, 150, 240, 70]
+    count = 4
+    target = sum(costs) / count
+    ranges = ChunkPlanner._split_balanced(costs, count)
+    _check_ranges(ranges, len(costs), count)
+    for start, end in ranges:
+        assert abs(sum(costs[start - 1:end]) - target) <= max(costs)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
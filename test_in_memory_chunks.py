@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""메모리에만 있는 청크(CHUNK_IN_MEMORY)로 멀티 API 강의 중심 분석이 동작하는지 테스트"""
+
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pymupdf as fitz
+
+from pdf_processor.analyzers import multi_api_analyzer
+from pdf_processor.analyzers.lesson_centric import LessonCentricAnalyzer
+from pdf_processor.analyzers.multi_api_analyzer import MultiAPIAnalyzer
+from pdf_processor.pdf import chunk_planner, chunk_store, metadata_index
+from pdf_processor.pdf.chunk_planner import ChunkPlanner
+from pdf_processor.pdf.chunk_store import ChunkStore
+from pdf_processor.pdf.metadata_index import PDFMetadataIndex
+from pdf_processor.pdf.operations import PDFOperations
+
+
+class FakeManager:
+    """distribute_tasks만 흉내 내며 실패한 작업을 기록하는 가짜 매니저"""
+
+    api_keys = ["key-a", "key-b"]
+
+    def __init__(self):
+        self.failures = []
+
+    def distribute_tasks(self, tasks, operation, **kwargs):
+        results = []
+        for task in tasks:
+            try:
+                results.append(operation(task, "client", None))
+            except Exception as e:
+                self.failures.append(str(e))
+                results.append({"error": str(e), "task": task})
+        return results
+
+
+def _write_pdf(path, pages):
+    pdf = fitz.open()
+    for n in range(pages):
+        pdf.new_page().insert_text((72, 72), f"page {n + 1}")
+    pdf.save(str(path))
+    pdf.close()
+
+
+def test_lesson_centric_retry_with_in_memory_chunks():
+    """메모리 청크가 다시 분할되지 않고 페이지 번호가 원본 기준으로 맞춰지는지 확인"""
+    originals = (chunk_store._global_chunk_store, metadata_index._global_metadata_index,
+                 chunk_planner._global_chunk_planner, multi_api_analyzer.FileManager,
+                 LessonCentricAnalyzer._analyze_with_uploads)
+    with TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        chunk_store._global_chunk_store = ChunkStore(str(tmp / "chunks"), in_memory=True)
+        metadata_index._global_metadata_index = PDFMetadataIndex(str(tmp / "metadata.sqlite3"))
+        chunk_planner._global_chunk_planner = ChunkPlanner(str(tmp / "planner.json"))
+        multi_api_analyzer.FileManager = lambda: None
+        # 업로드와 생성 대신 청크의 첫 페이지를 가리키는 응답을 돌려줌
+        LessonCentricAnalyzer._analyze_with_uploads = lambda self, prompt, jokbo_path, lesson_path, *names: (
+            json.dumps({"related_slides": [{"lesson_page": 1, "related_jokbo_questions": []}]})
+        )
+        try:
+            lesson, jokbo = tmp / "lesson.pdf", tmp / "jokbo.pdf"
+            _write_pdf(lesson, 6)
+            _write_pdf(jokbo, 1)
+
+            chunks = PDFOperations.split_pdf_for_chunks(str(lesson), max_pages=2)
+            chunk_files = PDFOperations.materialize_chunks(str(lesson), chunks)
+            assert not any(Path(path).exists() for path, _, _ in chunk_files)
+
+            # 메모리 청크도 파일처럼 계획되고 색인됨
+            assert PDFOperations.split_pdf_for_chunks(chunk_files[0][0]) == [(chunk_files[0][0], 1, 2)]
+
+            manager = FakeManager()
+            analyzer = MultiAPIAnalyzer(manager, "test", tmp / "debug")
+            result = analyzer.analyze_with_chunk_retry("lesson-centric", str(lesson), str(jokbo), chunk_files)
+        finally:
+            (chunk_store._global_chunk_store, metadata_index._global_metadata_index,
+             chunk_planner._global_chunk_planner, multi_api_analyzer.FileManager,
+             LessonCentricAnalyzer._analyze_with_uploads) = originals
+
+    assert manager.failures == []
+    assert [slide["lesson_page"] for slide in result["related_slides"]] == [1, 3, 5]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
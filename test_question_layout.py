@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""족보 문제 레이아웃(QuestionLayout)의 문제 끝 페이지와 그룹 분할 테스트"""
+
+from pdf_processor.pdf.question_layout import (
+    TOP_MARGIN, QuestionLayout, QuestionStart, normalize_question_number
+)
+
+
+def _layout(starts, page_count):
+    """(번호, 페이지, 시작 y) 목록으로 레이아웃 생성"""
+    return QuestionLayout([QuestionStart(str(n), page, y0, 800.0) for n, page, y0 in starts], page_count)
+
+
+def test_end_page_same_page():
+    """다음 문제가 같은 페이지에서 시작하면 그 페이지에서 끝나는지 확인"""
+    layout = _layout([(1, 1, 100), (2, 1, 400), (3, 2, 100)], 3)
+    assert layout.end_page(layout.find(1)) == 1
+
+
+def test_end_page_spills_to_next_page():
+    """다음 문제가 다음 페이지 중간에서 시작하면 그 페이지까지 이어지는지 확인"""
+    layout = _layout([(1, 1, 100), (2, 2, 300)], 2)
+    assert layout.end_page(layout.find(1)) == 2
+
+
+def test_end_page_next_question_at_top():
+    """다음 문제가 다음 페이지 맨 위에서 시작하면 이전 페이지에서 끝나는지 확인"""
+    layout = _layout([(1, 1, 100), (2, 3, TOP_MARGIN - 10)], 3)
+    assert layout.end_page(layout.find(1)) == 2
+
+
+def test_end_page_last_question():
+    """마지막 문제는 시작 페이지에서 끝나는지 확인"""
+    layout = _layout([(1, 1, 100), (2, 2, 300)], 4)
+    assert layout.end_page(layout.find(2)) == 2
+
+
+def test_find_accepts_number_formats():
+    """"12", 12, "12번"이 모두 같은 문제를 찾는지 확인"""
+    layout = _layout([(11, 1, 100), (12, 2, 100)], 2)
+    assert normalize_question_number("12번") == "12"
+    assert layout.find("12").page == 2
+    assert layout.find(12).page == 2
+    assert layout.find("12번").page == 2
+    assert layout.find(99) is None
+
+
+def test_find_prefers_nearest_page():
+    """같은 번호가 여러 번 나오면 가까운 페이지를 고르는지 확인"""
+    layout = _layout([(1, 1, 100), (1, 5, 100)], 6)
+    assert layout.find(1, near_page=4).page == 5
+    assert layout.pages_of("1") == [1, 5]
+
+
+def test_groups_split_questions_into_page_ranges():
+    """문제를 묶어 그룹마다 페이지 범위를 계산하는지 확인 (홀수 문제는 페이지 맨 위에서 시작)"""
+    starts = [(n, (n + 1) // 2, 50 if n % 2 else 400) for n in range(1, 9)]
+    layout = _layout(starts, 4)
+    assert layout.groups(4) == [(1, 2, 1, 4), (3, 4, 5, 8)]
+
+
+def test_groups_first_starts_at_page_one_and_last_runs_to_end():
+    """첫 그룹은 1페이지부터, 마지막 그룹은 문서 끝까지 포함하는지 확인"""
+    layout = _layout([(1, 2, 300), (2, 3, 300), (3, 4, 300)], 6)
+    assert layout.groups(2) == [(1, 4, 1, 2), (4, 6, 3, 3)]
+
+
+def test_groups_without_questions():
+    """문제를 찾지 못하면 전체를 한 그룹으로 반환하는지 확인"""
+    assert _layout([], 5).groups(10) == [(1, 5, 1, 10)]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
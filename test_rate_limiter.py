@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""API 키별 토큰 버킷 레이트 리미터 테스트"""
+
+import time
+
+from pdf_processor.api.rate_limiter import KeyRateLimiter, TokenBucket, parse_retry_after
+
+
+def test_bucket_refills_at_its_rate():
+    """소비한 토큰이 초당 보충 속도에 맞춰 다시 채워지는지 확인"""
+    bucket = TokenBucket(capacity=10, refill_per_second=2)
+    assert bucket.time_until_available(10) == 0.0
+
+    bucket.consume(10)
+    wait = bucket.time_until_available(4)
+    assert 1.9 < wait <= 2.0
+
+    # 1초가 지난 것으로 만들면 2개가 보충됨
+    bucket.updated_at -= 1.0
+    assert 0.9 < bucket.time_until_available(4) <= 1.0
+
+
+def test_bucket_serves_oversized_request_when_full():
+    """용량보다 큰 요청은 버킷이 가득 찼을 때 처리되는지 확인"""
+    bucket = TokenBucket(capacity=10, refill_per_second=1)
+    assert bucket.time_until_available(25) == 0.0
+
+    bucket.consume(25)
+    assert bucket.tokens < 0
+    # 음수만큼 빚진 뒤 가득 찰 때까지 기다려야 함
+    assert bucket.time_until_available(25) > 10
+
+
+def test_bucket_refund_and_drain():
+    """환불은 용량을 넘지 않고 drain은 버킷을 비우는지 확인"""
+    bucket = TokenBucket(capacity=5, refill_per_second=1)
+    bucket.consume(3)
+    bucket.refund(10)
+    assert bucket.tokens == 5
+
+    bucket.drain()
+    assert bucket.tokens <= 0.0
+    assert bucket.time_until_available(1) > 0
+
+
+def test_limiter_enforces_requests_per_minute():
+    """RPM 예산을 다 쓰면 예약이 거부되고 release로 되돌아오는지 확인"""
+    limiter = KeyRateLimiter(rpm=3, tpm=1_000_000)
+    assert all(limiter.try_acquire(100) for _ in range(3))
+    assert not limiter.try_acquire(100)
+    assert limiter.time_until_available(100) > 0
+
+    limiter.release(100)
+    assert limiter.try_acquire(100)
+
+
+def test_limiter_enforces_tokens_per_minute():
+    """TPM 예산이 요청 크기를 기준으로 차감되는지 확인"""
+    limiter = KeyRateLimiter(rpm=100, tpm=1000)
+    assert limiter.try_acquire(800)
+    assert not limiter.try_acquire(300)
+    assert limiter.try_acquire(200)
+
+    status = limiter.get_status()
+    assert status["tokens_available"] == 0
+    assert status["requests_available"] == 98
+
+
+def test_limiter_pause_blocks_dispatch():
+    """429 이후 pause 동안에는 예약이 거부되는지 확인"""
+    limiter = KeyRateLimiter(rpm=100, tpm=100_000)
+    limiter.pause(5)
+    assert not limiter.try_acquire(1)
+    assert 4 < limiter.time_until_available(1) <= 5
+
+    limiter._paused_until = time.monotonic()
+    # pause가 요청 버킷도 비웠으므로 보충될 때까지 잠깐 기다려야 함
+    assert limiter.time_until_available(1) > 0
+
+
+def test_parse_retry_after():
+    """429 오류 메시지에서 재시도 대기 시간을 추출하는지 확인"""
+    assert parse_retry_after("429 Quota exceeded. retry_delay { seconds: 17 }") == 17.0
+    assert parse_retry_after("Please retry in 2.5s.") == 2.5
+    assert parse_retry_after("Resource exhausted", default=30.0) == 30.0
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""응답 캐시(ResponseCache)가 유효한 응답만 재사용하는지 테스트"""
+
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+
+from pdf_processor.api.client import GeminiAPIClient
+from pdf_processor.api.response_cache import ResponseCache
+
+
+VALID = json.dumps({"related_slides": [{"lesson_page": 1, "related_jokbo_questions": []}]})
+
+
+class ScriptedModel:
+    """정해진 응답을 차례로 돌려주는 가짜 모델"""
+
+    model_name = "test-model"
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.calls = 0
+
+    def generate_content(self, content):
+        self.calls += 1
+        return SimpleNamespace(text=self.texts.pop(0), candidates=[SimpleNamespace(finish_reason="STOP")])
+
+
+class StubTransport:
+    def bind_model(self, model):
+        return model
+
+
+def _client(model, cache):
+    return GeminiAPIClient(model, api_key="test", upload_cache=object(),
+                           transport=StubTransport(), response_cache=cache)
+
+
+def test_valid_response_is_replayed():
+    """유효한 응답은 저장되어 다음 요청에서 재사용되는지 확인"""
+    with TemporaryDirectory() as tmp:
+        cache = ResponseCache(str(Path(tmp) / "responses.sqlite3"))
+        model = ScriptedModel([VALID])
+        client = _client(model, cache)
+        assert client.generate_content(["prompt"]).text == VALID
+        assert client.generate_content(["prompt"]).text == VALID
+        assert model.calls == 1
+
+
+def test_unparseable_response_is_not_cached():
+    """파싱되지 않거나 구조가 맞지 않는 응답은 저장되지 않는지 확인"""
+    with TemporaryDirectory() as tmp:
+        cache = ResponseCache(str(Path(tmp) / "responses.sqlite3"))
+        model = ScriptedModel(['{"related_slides": [{"lesson_page": 1', '{"note": "refused"}', VALID])
+        client = _client(model, cache)
+        client.generate_content(["prompt"])
+        client.generate_content(["prompt"])
+        assert client.generate_content(["prompt"]).text == VALID
+        assert model.calls == 3
+        assert cache.get_stats()["entries"] == 1
+
+
+def test_stored_unusable_response_is_dropped():
+    """이미 저장된 잘못된 응답은 조회 시 삭제되고 다시 요청하는지 확인"""
+    with TemporaryDirectory() as tmp:
+        cache = ResponseCache(str(Path(tmp) / "responses.sqlite3"))
+        model = ScriptedModel([VALID])
+        client = _client(model, cache)
+        cache.put(client._response_cache_key(["prompt"]), "I can't help with that.")
+        assert client.generate_content(["prompt"]).text == VALID
+        assert model.calls == 1
+        assert client.generate_content(["prompt"]).text == VALID
+        assert model.calls == 1
+
+
+def test_file_hashes_are_bounded():
+    """기억하는 파일 해시 수가 max_files를 넘지 않는지 확인"""
+    with TemporaryDirectory() as tmp:
+        cache = ResponseCache(str(Path(tmp) / "responses.sqlite3"), max_files=3)
+        for n in range(5):
+            cache.remember_file(f"files/{n}", f"hash{n}")
+        assert cache.file_hash("files/0") is None
+        assert cache.file_hash("files/2") == "hash2"
+        # 최근에 사용한 파일은 남고 가장 오래된 파일이 밀려남
+        cache.remember_file("files/5", "hash5")
+        assert cache.file_hash("files/2") == "hash2"
+        assert cache.file_hash("files/3") is None
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
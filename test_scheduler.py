@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""작업 스케줄러(TaskScheduler)의 재배치와 헤지 동작 테스트"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+from pdf_processor.api.scheduler import TaskScheduler
+
+
+class FakeManager:
+    """스케줄러가 사용하는 MultiAPIManager 인터페이스만 흉내 낸 가짜 매니저"""
+
+    def __init__(self, key_count, latency_threshold=None):
+        self.api_statuses = [SimpleNamespace(in_flight=0) for _ in range(key_count)]
+        self.latency_threshold = latency_threshold
+        self.recorded_failures = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def get_available_apis(self):
+        return list(range(len(self.api_statuses)))
+
+    def try_reserve_api(self, key, tokens):
+        return 0
+
+    def time_until_any_available(self):
+        return 0.0
+
+    def get_latency_percentile(self, percentile):
+        return self.latency_threshold
+
+    def run_on_api(self, key, operation, is_abandoned=None):
+        with self._lock:
+            self.api_statuses[key].in_flight += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            return operation(key, None)
+        except Exception:
+            # 실제 매니저처럼 이미 끝난 작업의 실패는 키에 기록하지 않음
+            if is_abandoned is None or not is_abandoned():
+                with self._lock:
+                    self.recorded_failures.append(key)
+            raise
+        finally:
+            with self._lock:
+                self.api_statuses[key].in_flight -= 1
+                self.active -= 1
+
+
+def test_results_keep_task_order():
+    """결과가 작업 순서대로 반환되는지 확인"""
+    manager = FakeManager(key_count=3)
+
+    def operation(task, api_client, model):
+        time.sleep(0.01)
+        return task * 2
+
+    results = TaskScheduler(manager, operation).run(list(range(20)))
+    assert results == [i * 2 for i in range(20)]
+
+
+def test_max_workers_caps_lanes():
+    """max_workers가 키 개수보다 작으면 동시 실행 수를 제한하는지 확인"""
+    manager = FakeManager(key_count=5)
+
+    def operation(task, api_client, model):
+        time.sleep(0.02)
+        return task
+
+    TaskScheduler(manager, operation, max_workers=2).run(list(range(10)))
+    assert manager.peak <= 2
+
+
+def test_max_workers_uses_every_slot():
+    """max_workers가 키 개수로 나누어떨어지지 않아도 모든 레인이 시작되는지 확인"""
+    manager = FakeManager(key_count=2)
+    started = threading.Barrier(5, timeout=2.0)
+
+    def operation(task, api_client, model):
+        # 다섯 레인이 모두 동시에 실행 중이어야 통과
+        started.wait()
+        return task
+
+    results = TaskScheduler(manager, operation, max_workers=5).run(list(range(5)))
+    assert results == list(range(5))
+    assert manager.peak == 5
+
+
+def test_failed_task_is_requeued_on_another_key():
+    """실패한 작업이 다른 키의 레인으로 재배치되는지 확인"""
+    manager = FakeManager(key_count=2)
+    attempts = {}
+
+    def operation(task, api_client, model):
+        key = api_client
+        attempts.setdefault(task, []).append(key)
+        if len(attempts[task]) == 1:
+            raise RuntimeError("transient failure")
+        return task
+
+    results = TaskScheduler(manager, operation, max_attempts=3).run(list(range(4)))
+    assert results == list(range(4))
+    for keys in attempts.values():
+        assert len(keys) == 2
+        assert keys[0] != keys[1]
+
+
+def test_task_fails_after_max_attempts():
+    """모든 시도가 실패하면 오류 결과를 반환하는지 확인"""
+    manager = FakeManager(key_count=2)
+
+    def operation(task, api_client, model):
+        raise RuntimeError(f"boom {api_client}")
+
+    results = TaskScheduler(manager, operation, max_attempts=2).run(["a"])
+    assert "error" in results[0]
+    assert results[0]["task"] == "a"
+    assert "after 2 tries" in results[0]["error"]
+
+
+def test_straggler_is_hedged_and_loser_ignored():
+    """느린 작업이 유휴 키에서 헤지되고, 진 쪽의 실패는 기록되지 않는지 확인"""
+    manager = FakeManager(key_count=2, latency_threshold=0.05)
+    release = threading.Event()
+
+    def operation(task, api_client, model):
+        if task == "slow" and api_client == first_key[0]:
+            release.wait(2.0)
+            raise RuntimeError("lost the race")
+        return f"{task}@{api_client}"
+
+    first_key = []
+    original_run = manager.run_on_api
+
+    def run_on_api(key, operation, is_abandoned=None):
+        if not first_key:
+            first_key.append(key)
+        return original_run(key, operation, is_abandoned)
+
+    manager.run_on_api = run_on_api
+    scheduler = TaskScheduler(manager, operation, hedge_percentile=0.9)
+
+    started = time.monotonic()
+    results = scheduler.run(["slow"])
+    assert time.monotonic() - started < 1.0
+    assert results == [f"slow@{1 - first_key[0]}"]
+
+    release.set()
+    assert scheduler.wait_settled(timeout=2.0)
+    assert manager.recorded_failures == []
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""스트리밍 JSON 파서의 청크 경계 처리와 잘린 응답 복구 테스트"""
+
+import json
+import random
+
+from pdf_processor.parsers.stream_parser import StreamingJSONParser, recover_completed_elements
+
+
+RESPONSE = {
+    "related_slides": [
+        {
+            "lesson_page": 3,
+            "related_jokbo_questions": [
+                {"question_number": "12", "question_text": "괄호 {와 } 그리고 \"따옴표\"", "choices": ["①", "②"]},
+                {"question_number": "13", "question_text": "역슬래시 \\ 와 [대괄호]"}
+            ]
+        },
+        {"lesson_page": 7, "related_jokbo_questions": []},
+        {"lesson_page": 9, "related_jokbo_questions": [{"question_number": "20", "score": 0.8}]}
+    ],
+    "summary": {"total_related_slides": 3, "note": "끝"}
+}
+
+
+def _feed_in_chunks(text, sizes):
+    parser = StreamingJSONParser()
+    emitted = []
+    pos = 0
+    for size in sizes:
+        emitted.extend(parser.feed(text[pos:pos + size]))
+        pos += size
+    emitted.extend(parser.feed(text[pos:]))
+    return parser, emitted
+
+
+def test_elements_emitted_across_any_chunk_boundary():
+    """어떤 위치에서 청크가 잘려도 같은 요소가 같은 순서로 나오는지 확인"""
+    text = json.dumps(RESPONSE, ensure_ascii=False, indent=2)
+    rng = random.Random(7)
+    for _ in range(50):
+        sizes = [rng.randint(1, 12) for _ in range(len(text))]
+        parser, emitted = _feed_in_chunks(text, sizes)
+        assert [element for _, element in emitted] == RESPONSE["related_slides"]
+        assert parser.complete
+        assert parser.finish() == RESPONSE
+
+
+def test_single_character_chunks():
+    """한 글자씩 들어와도 결과가 원본과 같은지 확인"""
+    text = json.dumps(RESPONSE, ensure_ascii=False)
+    parser, emitted = _feed_in_chunks(text, [1] * len(text))
+    assert len(emitted) == 3
+    assert parser.finish() == RESPONSE
+
+
+def test_on_element_callback():
+    """완성된 요소마다 콜백이 호출되는지 확인"""
+    seen = []
+    parser = StreamingJSONParser(on_element=lambda key, element: seen.append((key, element["lesson_page"])))
+    parser.feed(json.dumps(RESPONSE))
+    assert seen == [("related_slides", 3), ("related_slides", 7), ("related_slides", 9)]
+
+
+def test_truncated_stream_keeps_completed_elements():
+    """응답이 잘리면 완성된 요소만 partial 결과로 복구하는지 확인"""
+    text = json.dumps(RESPONSE, ensure_ascii=False)
+    cut = text.index('"lesson_page": 9')
+    result = recover_completed_elements(text[:cut])
+    assert result["partial"] is True
+    assert [slide["lesson_page"] for slide in result["related_slides"]] == [3, 7]
+
+
+def test_truncated_before_any_element():
+    """완성된 요소가 하나도 없으면 오류를 반환하는지 확인"""
+    result = recover_completed_elements('{"related_slides": [{"lesson_page": 3, "related')
+    assert result["partial"] is True
+    assert "error" in result
+
+
+def test_malformed_element_falls_back_to_full_parse():
+    """배열 안에 요소로 나오지 않은 값이 있어도 전체 결과가 정확한지 확인"""
+    text = '{"jokbo_pages": [{"jokbo_page": 1}, 5, {"jokbo_page": 2}], "extra": true}'
+    parser = StreamingJSONParser()
+    parser.feed(text)
+    assert parser.finish() == json.loads(text)
+
+
+def test_streamed_responses_parse_concurrently():
+    """동시에 들어온 스트리밍 응답(같은 내용 포함)이 각자의 파서로 처리되는지 확인"""
+    from concurrent.futures import ThreadPoolExecutor
+    from pathlib import Path
+    from tempfile import TemporaryDirectory
+    from pdf_processor.analyzers.lesson_centric import LessonCentricAnalyzer
+    from pdf_processor.parsers.response_parser import ResponseParser
+    from pdf_processor.utils.config import ProcessingConfig
+
+    class StreamingClient:
+        def generate_content_stream(self, content, on_text):
+            text = content[0]
+            for i in range(0, len(text), 7):
+                on_text(text[i:i + 7])
+            return text
+
+    texts = [json.dumps({"related_slides": [{"lesson_page": n % 4}]}) for n in range(40)]
+    streamed = []
+    def full_parse(*args, **kwargs):
+        raise AssertionError("streamed response was parsed again")
+
+    original = ProcessingConfig.STREAM_RESPONSES, ResponseParser.parse_response
+    ProcessingConfig.STREAM_RESPONSES = True
+    ResponseParser.parse_response = staticmethod(full_parse)
+    try:
+        with TemporaryDirectory() as tmp:
+            analyzer = LessonCentricAnalyzer(StreamingClient(), None, "test", Path(tmp),
+                                             upload_pipeline=object(),
+                                             on_stream_element=lambda key, element: streamed.append(element))
+
+            # Every response arrives before any is parsed, as with concurrent chunks
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                responses = list(pool.map(lambda text: analyzer.generate_response_text([text]), texts))
+                results = list(pool.map(analyzer.parse_and_validate_response, responses))
+    finally:
+        ProcessingConfig.STREAM_RESPONSES, parse_response = original
+        ResponseParser.parse_response = staticmethod(parse_response)
+
+    assert responses == texts
+    assert results == [json.loads(text) for text in texts]
+    assert len(streamed) == len(texts)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
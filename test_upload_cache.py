@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""업로드 캐시(UploadCache)의 보관 한도와 프로세스 간 공유 테스트"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+
+from pdf_processor.api import file_gc
+from pdf_processor.api.file_gc import FileGarbageCollector, RemoteFileIndex
+from pdf_processor.api.upload_cache import UploadCache
+
+
+def _file(name):
+    return SimpleNamespace(name=name, display_name=name)
+
+
+def test_least_recently_used_uploads_are_evicted():
+    """키별 보관 개수를 넘으면 가장 오래 쓰지 않은 업로드부터 빠지는지 확인"""
+    with TemporaryDirectory() as tmp:
+        cache = UploadCache(str(Path(tmp) / "uploads.sqlite3"), max_files=2)
+        keys = [cache.make_key("x", "key-a", content_hash=f"h{n}") for n in range(3)]
+        cache.store(keys[0], _file("files/0"))
+        cache.store(keys[1], _file("files/1"))
+        assert cache.lookup(keys[0]) is not None
+        cache.store(keys[2], _file("files/2"))
+        assert cache.is_cached_name("files/0")
+        assert not cache.is_cached_name("files/1")
+        assert cache.is_cached_name("files/2")
+
+        # 다른 키의 업로드는 한도에 포함되지 않음
+        cache.store(cache.make_key("x", "key-b", content_hash="h0"), _file("files/b"))
+        assert len(cache) == 3
+
+
+def test_size_cap_evicts_uploads():
+    """보관 용량을 넘으면 업로드가 빠지는지 확인"""
+    with TemporaryDirectory() as tmp:
+        cache = UploadCache(str(Path(tmp) / "uploads.sqlite3"), max_bytes=100)
+        cache.store(cache.make_key("x", "k", content_hash="a"), _file("files/a"), 60)
+        cache.store(cache.make_key("x", "k", content_hash="b"), _file("files/b"), 60)
+        assert not cache.is_cached_name("files/a")
+        assert cache.is_cached_name("files/b")
+
+
+def test_longer_margin_misses_without_dropping_entry():
+    """배치처럼 오래 기다리는 요청은 곧 만료될 업로드를 재사용하지 않는지 확인"""
+    with TemporaryDirectory() as tmp:
+        cache = UploadCache(str(Path(tmp) / "uploads.sqlite3"), safety_margin=timedelta(hours=1))
+        key = cache.make_key("x", "k", content_hash="a")
+        file = _file("files/a")
+        file.expiration_time = datetime.now(timezone.utc) + timedelta(hours=10)
+        cache.store(key, file)
+        assert cache.lookup(key, timedelta(hours=25)) is None
+        assert cache.lookup(key)["name"] == "files/a"
+
+
+def test_concurrent_writers_keep_every_entry():
+    """같은 인덱스를 여러 인스턴스가 동시에 써도 항목이 사라지지 않는지 확인"""
+    with TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "uploads.sqlite3")
+        caches = [UploadCache(path, max_files=1000) for _ in range(4)]
+
+        def store_many(index, cache):
+            for n in range(25):
+                cache.store(cache.make_key("x", "k", content_hash=f"{index}-{n}"), _file(f"files/{index}-{n}"))
+
+        threads = [threading.Thread(target=store_many, args=(i, c)) for i, c in enumerate(caches)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(UploadCache(path)) == 100
+
+
+def test_evicted_release_is_swept():
+    """사용이 끝난 보관 업로드가 캐시에서 빠지면 GC가 삭제 대상으로 잡는지 확인"""
+    with TemporaryDirectory() as tmp:
+        cache = UploadCache(str(Path(tmp) / "uploads.sqlite3"), max_files=1)
+        gc = FileGarbageCollector(RemoteFileIndex(str(Path(tmp) / "remote.sqlite3")))
+        transport = SimpleNamespace(api_key="k")
+        gc._transports[gc._key_fp(transport)] = transport
+
+        kept, evicted = _file("files/kept"), _file("files/evicted")
+        for file in (evicted, kept):
+            gc.index.add(file.name, gc._key_fp(transport), file.display_name, 4102444800)
+        cache.store(cache.make_key("x", "k", content_hash="old"), evicted)
+        gc.release_retained(evicted)
+        cache.store(cache.make_key("x", "k", content_hash="new"), kept)
+        gc.release_retained(kept)
+
+        original = file_gc.get_global_upload_cache
+        file_gc.get_global_upload_cache = lambda: cache
+        try:
+            assert gc.sweep_orphans() == 1
+        finally:
+            file_gc.get_global_upload_cache = original
+        assert [name for name, _, _ in gc.index.pending()] == ["files/evicted"]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
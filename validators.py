@@ -3,7 +3,8 @@ Validation utilities for PDF processing
 """
 from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
-import pymupdf as fitz
+
+from pdf_processor.pdf.metadata_index import get_metadata_index
 
 
 class PDFValidator:
@@ -100,8 +101,7 @@ class PDFValidator:
         Returns:
             Total number of pages in the PDF
         """
-        with fitz.open(pdf_path) as doc:
-            return len(doc)
+        return get_metadata_index().get_page_count(pdf_path)
     
     @staticmethod
     def validate_chunk_boundaries(start_page: int, end_page: int, total_pages: int) -> Tuple[int, int]: